@@ -0,0 +1,108 @@
+"""Microbenchmark of the Interface frame rendering path.
+
+Times `Interface._build_frame` with frames decoded on the display thread,
+the complete rendering of a frame (build, blit and overlays), and, for
+reference, the same rendering as done by the Interface before frames were
+presented without copies: transposed to pygame's surfarray layout, copied
+with `blit_array`, and with the overlay text rendered anew for every frame.
+
+Usage::
+
+    python benchmarks/build_frame.py path/to/video.mp4 [--frames 300]
+
+The benchmark runs with SDL's dummy video driver, so no window is opened.
+"""
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import cv2
+import numpy as np
+import pygame
+
+from movement_detector import CvVideo, PixelChangeFD
+from md_interface.interface import Interface
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('video', help='Path of the video to render.')
+    parser.add_argument(
+        '--frames', type=int, default=300,
+        help='The number of frames to render.',
+    )
+    args = parser.parse_args()
+
+    video = CvVideo(file_path=args.video)
+    detector = PixelChangeFD(
+        video=video,
+        outlier_change_threshold=.5,
+        flag_outliers_buffer=5,
+        movement_threshold=.1,
+        freezing_buffer=5,
+        blur_ksize=3,
+    )
+    detector._create_empty_meta()
+    pygame.init()
+    interface = Interface(detector=detector, read_ahead_depth=0)
+    frame_count = min(args.frames, len(video))
+
+    def build():
+        interface._build_frame()
+
+    def render():
+        frame = interface._build_frame()
+        interface._player.blit(frame, (0, 0))
+        interface._draw_overlays(action_text='Benchmark')
+
+    # the player was the size of the frame before the timeline was added
+    frame_area = interface._player.subsurface(
+        (0, 0, video.frame_shape[1], video.frame_shape[0])
+    )
+
+    def previous_render():
+        index = interface._frame_index
+        video.skip_to(index)
+        frame = cv2.cvtColor(video[index], cv2.COLOR_BGR2RGB)
+        frame = np.ascontiguousarray(frame.transpose(1, 0, 2))
+        pygame.surfarray.blit_array(frame_area, frame)
+        meta_data = detector.meta(start=index, stop=index + 1)
+        overlays = (
+            interface._moving_text(meta_data=meta_data),
+            interface._outlier_text(meta_data=meta_data),
+            (interface._frame_rate_text(), interface._info_colour),
+            ('Benchmark', interface._info_colour),
+        )
+        for line, (text, colour) in enumerate(overlays):
+            if text:
+                surface = interface._font.render(text, True, colour)
+                frame_area.blit(surface, (10, 6 + 20 * line))
+
+    for name, func in (
+            ('_build_frame', build),
+            ('render', render),
+            ('previous render', previous_render),
+    ):
+        video.skip_to(0)
+        durations = []
+        for index in range(frame_count):
+            interface._frame_index = index
+            start = time.perf_counter()
+            func()
+            durations.append(time.perf_counter() - start)
+        durations = np.array(durations) * 1e3
+        print(
+            f'{name:>18}: median {np.median(durations):.3f} ms, '
+            f'p95 {np.percentile(durations, 95):.3f} ms '
+            f'({frame_count} frames)'
+        )
+    pygame.quit()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,56 +1,66 @@
-import numpy as np
+from concurrent.futures import ProcessPoolExecutor
 
 from movement_detector import CvVideo, PixelChangeFD
 from md_interface.interface import Interface
 from movement_detector.analysis import IntervalAggregatorMA
-from movement_detector.utils import get_video_paths, get_project_path
+from movement_detector.batch import analyze_video, detect_video
+from movement_detector.cli import get_analyzer_kwargs, get_detector_kwargs
+from movement_detector.utils import get_video_paths, parse_settings
 
 
-def parse_settings():
-    root = get_project_path()
-    settings_path = root / 'settings.txt'
-    settings = {}
-
-    with open(settings_path) as f:
-        for line in f:
-            key, value = line.split(' = ')
-            try:
-                value = eval(value)
-            except NameError:
-                pass
-            settings[key] = value
-
-    return settings
+def review_video(video_path, detector_kwargs, progressive=False):
+    video = CvVideo(file_path=video_path)
+    detector = PixelChangeFD(video=video, **detector_kwargs)
+    if progressive:
+        # review the frames while the detection is running
+        detection = detector.run_in_background()
+        visualizer = Interface(
+            detector=detector,
+            video=CvVideo(file_path=video_path),
+        )
+        visualizer.display()
+        detection.result()  # raises if the detection failed
+    else:
+        detector.run()
+        visualizer = Interface(detector=detector)
+        visualizer.display()
+    detector.save_meta()
 
 
 def main():
     settings = parse_settings()
+    detector_kwargs = get_detector_kwargs(settings=settings)
+    analyzer_kwargs = get_analyzer_kwargs(settings=settings)
+    look_ahead = settings.get('look_ahead', 2)
 
     vid_paths = get_video_paths()
-    for video_path in vid_paths:
-        video = CvVideo(file_path=video_path)
-        detector = PixelChangeFD(
-            video=video,
-            outlier_change_threshold=settings.get(
-                'outlier_change_threshold', .5
-            ),
-            flag_outliers_buffer=settings.get('flag_outliers_buffer', 5),
-            movement_threshold=settings.get('movement_threshold', .1),
-            freezing_buffer=settings.get('freezing_buffer', 5),
-            blur_ksize=settings.get('blur_ksize', 3),
-        )
-        detector.run()
-        visualizer = Interface(detector=detector)
-        visualizer.display()
-        detector.save_meta()
-        meta_analyzer = IntervalAggregatorMA(
-            detector=detector,
-            intervals=settings['intervals'],
-            aggregation=lambda x: 1 - np.mean(x),
-            include_start=settings.get('include_start', 1),
-            include_end=settings.get('include_end', 1),
-        )
-        meta_analyzer.run()
+    detections = {}
+    analyses = []
+    # the upcoming videos are detected, and the reviewed videos analyzed, in
+    # worker processes while a video is being reviewed
+    with ProcessPoolExecutor(max_workers=max(look_ahead, 1)) as executor:
+        for i, video_path in enumerate(vid_paths):
+            for upcoming in vid_paths[i + 1:i + 1 + look_ahead]:
+                if upcoming not in detections:
+                    detections[upcoming] = executor.submit(
+                        detect_video,
+                        upcoming, CvVideo, PixelChangeFD, detector_kwargs,
+                    )
+            detection = detections.pop(video_path, None)
+            if detection is not None and not detection.cancel():
+                detection.result()
+            review_video(
+                video_path=video_path,
+                detector_kwargs=detector_kwargs,
+                progressive=settings.get('progressive', False),
+            )
+            analyses.append(executor.submit(
+                analyze_video,
+                video_path, CvVideo, PixelChangeFD, detector_kwargs,
+                IntervalAggregatorMA, analyzer_kwargs,
+            ))
+        for analysis in analyses:
+            analysis.result()
 
 
 if __name__ == '__main__':
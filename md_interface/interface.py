@@ -1,57 +1,132 @@
+from collections import deque
+from typing import Optional
+
 import pandas as pd
 import cv2
 import pygame
 import numpy as np
 
 from movement_detector.detectors import AbstractMovementDetector
+from movement_detector.video import AbstractVideo
+from md_interface.playback import PlaybackScheduler
+from md_interface.readahead import FrameReadAhead
+from md_interface.timeline import Timeline
 
 
 class Interface:
     """
     This class displays the video, overlays metadata, and enables user-control.
+
+    During playback, upcoming frames are decoded ahead of time on a
+    background thread, see :class:`FrameReadAhead`. Set `read_ahead_depth`
+    to zero to decode the frames on the display thread instead.
+
+    A timeline of the metadata is shown below the video. Clicking or dragging
+    on it jumps to the corresponding frame.
+
+    The interface can be opened while the detector is running in the
+    background, see :meth:`AbstractMovementDetector.run_in_background`. The
+    frames show "Loading info" until their metadata arrives. In that case,
+    pass a separate `video` object for the same file, since the detector's
+    video is being read by the detection thread.
+
+    Parameters
+    ----------
+    detector : AbstractMovementDetector
+        The detector whose metadata to review.
+    read_ahead_depth : int, default 16
+        The maximum number of frames decoded ahead of time.
+    video : AbstractVideo, optional
+        The video from which to display the frames. Defaults to the
+        detector's video.
     """
 
-    def __init__(self, detector: AbstractMovementDetector):
+    def __init__(
+            self,
+            detector: AbstractMovementDetector,
+            read_ahead_depth: int = 16,
+            video: Optional[AbstractVideo] = None,
+    ):
         self.detector = detector
+        self.video = detector.video if video is None else video
         self._play_video = False
         self._frame_index = 0
-        self._playback_frame_rate = self.detector.video.frame_rate
+        self._scheduler = PlaybackScheduler(
+            frame_rate=self.video.frame_rate
+        )
+        frame_width = self.video.frame_shape[1]
+        self._frame_height = self.video.frame_shape[0]
+        self._timeline = Timeline(detector=detector, width=frame_width)
         self._player = pygame.display.set_mode(
-            self.detector.video.frame_shape[1::-1],
+            (frame_width, self._frame_height + self._timeline.height),
             pygame.RESIZABLE
         )
+        self._seeking = False
         self._clock = pygame.time.Clock()
         self._space_pressed = False
         self._key_repeat_buffer = 600
+        self._action_text_duration = 1500  # ms
+        self._idle_loop_rate = 30  # polling rate while paused
+        self._render_key = None
+        self._read_ahead_depth = read_ahead_depth
+        self._read_ahead = None
+        self._read_ahead_wait = .1  # s, for a frame the worker is decoding
+        self._last_built_index = 0
+        pygame.font.init()
+        self._font = pygame.font.Font(None, 22)
+        self._info_colour = (255, 165, 0)
+        self._text_surfaces = {}
+        self._max_text_surfaces = 256
+        self._meta_updates = deque()
+        self._meta_built = False
 
     def display(self, stop_keys=('N', 'P', 27)):
-        vid_name = self.detector.video.vid_name
+        vid_name = self.video.vid_name
         self._play_video = False
         self._frame_index = 0
-        time_since_last_frame = 0
+        self._render_key = None
+        self._scheduler.stop()
+        self._meta_built = self.detector.meta_built
+        self.detector.add_listener(self._on_meta_chunk)
+        self._timeline.update()
+        if self._read_ahead_depth > 0:
+            video = self.video
+            self._read_ahead = FrameReadAhead(
+                video=type(video)(file_path=video.vid_path),
+                convert=self._convert_frame,
+                depth=self._read_ahead_depth,
+            )
         quit_ = False
-        keys = None
         command_text = ''
-        command_print_count = 0
-        command_print_max = max(self._key_repeat_buffer, 10)
+        command_text_age = 0
+        new_command_text = ''
         keys_pressed = []
         time_since_key_press = 0
         while True:
-            tick = self._clock.tick()
-            if self._frame_index == len(self.detector.video):
-                self._play_video = False
-            else:
-                frame = self._build_frame(action_text=command_text)
-                if command_text != '':
-                    command_print_count += 1
-                    if command_print_count == command_print_max:
-                        command_text = ''
-                        command_print_count = 0
-            pygame.display.set_caption(
-                f'{vid_name} - Frame {self._frame_index + 1}'
-            )
-            pygame.surfarray.blit_array(self._player, frame)
-            pygame.display.update()
+            tick = self._clock.tick(self._loop_rate())
+            self._apply_meta_updates()
+            if self._play_video:
+                self._advance_playback()
+            if command_text != '':
+                command_text_age += tick
+                if command_text_age >= self._action_text_duration:
+                    command_text = ''
+                    command_text_age = 0
+            render_key = self._get_render_key(action_text=command_text)
+            if render_key != self._render_key:
+                frame = self._build_frame()
+                pygame.display.set_caption(
+                    f'{vid_name} - Frame {self._frame_index + 1}'
+                )
+                self._player.blit(frame, (0, 0))
+                self._draw_overlays(action_text=command_text)
+                self._timeline.draw(
+                    surface=self._player,
+                    position=(0, self._frame_height),
+                    index=self._frame_index,
+                )
+                pygame.display.update()
+                self._render_key = render_key
 
             keys_pressed = pygame.key.get_pressed()
             if any(keys_pressed):
@@ -61,6 +136,7 @@ class Interface:
                 time_since_key_press += tick
                 if new_command_text != '':
                     command_text = new_command_text
+                    command_text_age = 0
             else:
                 time_since_key_press = 0
                 if self._space_pressed:
@@ -70,34 +146,154 @@ class Interface:
                 if event.type == pygame.QUIT:
                     pygame.quit()
                     quit_ = True
+                elif event.type in (pygame.VIDEOEXPOSE, pygame.VIDEORESIZE):
+                    self._render_key = None
+                elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+                    self._seeking = event.pos[1] >= self._frame_height
+                    if self._seeking:
+                        self._seek_to_timeline(x=event.pos[0])
+                elif event.type == pygame.MOUSEMOTION and self._seeking:
+                    self._seek_to_timeline(x=event.pos[0])
+                elif event.type == pygame.MOUSEBUTTONUP and event.button == 1:
+                    self._seeking = False
             if quit_:
                 break
-            if self._play_video:
-                time_since_last_frame += tick
-                if time_since_last_frame >= 1/self._playback_frame_rate:
-                    self._frame_index += 1
-                    time_since_last_frame = 0
-            else:
-                time_since_last_frame = 0
+        if self._read_ahead is not None:
+            self._read_ahead.stop()
+            self._read_ahead = None
+        self.detector.remove_listener(self._on_meta_chunk)
         return keys_pressed
 
-    def _build_frame(self, action_text=''):
-        frame = self.detector.video[self._frame_index]
+    def _on_meta_chunk(self, chunk: pd.DataFrame):
+        # called from the detection thread, the timeline is updated by the
+        # display loop
+        self._meta_updates.append((chunk.index[0], chunk.index[-1] + 1))
+
+    def _apply_meta_updates(self):
+        """Update the timeline with the metadata received since last call."""
+        while self._meta_updates:
+            start, stop = self._meta_updates.popleft()
+            self._timeline.update(start=start, stop=stop)
+        if not self._meta_built and self.detector.meta_built:
+            # fields computed over the whole video are only set at the end
+            self._meta_built = True
+            self._timeline.update()
+
+    def _advance_playback(self):
+        """Jump to the frame scheduled for the current time.
+
+        The frames that are behind schedule are not displayed. With the
+        read-ahead, its worker jumps to the scheduled frame when it has
+        fallen behind. Otherwise, the video skips to the scheduled frame,
+        which may still decode the frames in between, but does not convert
+        them.
+        """
+        last_frame = len(self.video) - 1
+        target = min(self._scheduler.target_frame(), last_frame)
+        if target > self._frame_index:
+            if self._read_ahead is None:
+                self.video.skip_to(target)
+            self._frame_index = target
+            self._scheduler.frame_presented()
+        if self._frame_index == last_frame:
+            self._play_video = False
+            self._scheduler.stop()
+
+    def _seek_to_timeline(self, x: int):
+        """Jump to the frame under the given timeline position."""
+        self._frame_index = self._timeline.frame_at(x=x)
+        if self._play_video:
+            self._scheduler.start(frame_index=self._frame_index)
+
+    def _loop_rate(self) -> float:
+        if self._play_video:
+            # poll faster than the frame rate to present frames on time
+            return 2 * self._scheduler.frame_rate
+        return self._idle_loop_rate
+
+    def _get_render_key(self, action_text: str) -> tuple:
+        """Everything the rendered frame depends on.
+
+        The frame is only rebuilt when the key changes.
+        """
         meta_data = self.detector.meta(
             start=self._frame_index,
             stop=self._frame_index + 1
         )
-        self._add_moving_text(frame=frame, meta_data=meta_data)
-        self._add_outlier_text(frame=frame, meta_data=meta_data)
-        self._add_frame_rate_text(frame=frame)
-        self._add_action_text(frame=frame, action_text=action_text)
-        frame = np.flipud(np.rot90(frame))
-        # frame = pygame.surfarray.make_surface(frame)
+        meta_values = tuple(
+            None if pd.isna(value) else bool(value)
+            for value in meta_data[
+                ['moving', 'outlier', 'flagged', 'manual_set']
+            ].iloc[0]
+        )
+        frame_rate_text = self._frame_rate_text()
+        return (
+            self._frame_index,
+            meta_values,
+            action_text,
+            frame_rate_text,
+            self._timeline.version,
+        )
+
+    def _build_frame(self) -> pygame.Surface:
+        """Returns the current frame as a surface, without overlays.
+
+        The surface is a view of the decoded frame's buffer rather than a copy.
 
-        return frame
+        The frame is taken from the read-ahead buffer when available, waiting
+        for it if it is the next frame the worker decodes. Otherwise, it is
+        decoded in place and the read-ahead is restarted from the following
+        frame.
+        """
+        index = self._frame_index
+        frame = None
+        if self._read_ahead is not None:
+            frame = self._read_ahead.get(index, timeout=self._read_ahead_wait)
+        if frame is None:
+            video = self.video
+            video.skip_to(index)
+            frame = self._convert_frame(video[index])
+            if self._read_ahead is not None:
+                direction = -1 if index < self._last_built_index else 1
+                self._read_ahead.seek(index + direction, direction=direction)
+        self._last_built_index = index
+        height, width = frame.shape[:2]
+        return pygame.image.frombuffer(frame, (width, height), 'RGB')
 
     @staticmethod
-    def _add_moving_text(frame, meta_data):
+    def _convert_frame(frame: np.ndarray) -> np.ndarray:
+        """Converts a BGR frame to a contiguous RGB array."""
+        return cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+
+    def _text_surface(self, text: str, colour: tuple) -> pygame.Surface:
+        """Returns the rendered text, rendering it only on first use."""
+        key = (text, colour)
+        surface = self._text_surfaces.get(key)
+        if surface is None:
+            if len(self._text_surfaces) >= self._max_text_surfaces:
+                self._text_surfaces.clear()
+            surface = self._font.render(text, True, colour)
+            self._text_surfaces[key] = surface
+        return surface
+
+    def _draw_overlays(self, action_text=''):
+        meta_data = self.detector.meta(
+            start=self._frame_index,
+            stop=self._frame_index + 1
+        )
+        overlays = (
+            self._moving_text(meta_data=meta_data),
+            self._outlier_text(meta_data=meta_data),
+            (self._frame_rate_text(), self._info_colour),
+            (action_text, self._info_colour),
+        )
+        for line, (text, colour) in enumerate(overlays):
+            if text:
+                surface = self._text_surface(text=text, colour=colour)
+                self._player.blit(surface, (10, 6 + 20 * line))
+
+    @staticmethod
+    def _moving_text(meta_data) -> tuple:
         if pd.isna(meta_data['moving'].iloc[0]):
             colour = (0, 0, 255)
             status_text = 'Loading info'
@@ -107,18 +303,10 @@ class Interface:
         else:
             colour = (0, 255, 0)
             status_text = 'Freezing'
-        cv2.putText(
-            img=frame,
-            text=status_text,
-            org=(10, 20),
-            fontFace=cv2.FONT_HERSHEY_COMPLEX,
-            fontScale=.5,
-            color=colour,
-            thickness=2,
-        )
+        return status_text, colour
 
     @staticmethod
-    def _add_outlier_text(frame, meta_data):
+    def _outlier_text(meta_data) -> tuple:
         outlier_text = ''
         if pd.isna(meta_data['outlier'].iloc[0]):
             colour = (0, 0, 255)
@@ -131,39 +319,15 @@ class Interface:
             outlier_text = 'Flagged'
         else:
             colour = (255, 165, 0)
-        cv2.putText(
-            img=frame,
-            text=outlier_text,
-            org=(10, 40),
-            fontFace=cv2.FONT_HERSHEY_COMPLEX,
-            fontScale=.5,
-            color=colour,
-            thickness=2
-        )
+        return outlier_text, colour
 
-    def _add_frame_rate_text(self, frame):
-        frame_rate = np.round(self._playback_frame_rate, decimals=2)
+    def _frame_rate_text(self) -> str:
+        frame_rate = np.round(self._scheduler.frame_rate, decimals=2)
         frame_rate_text = f'Frame rate: {frame_rate}'
-        cv2.putText(
-            img=frame,
-            text=frame_rate_text,
-            org=(10, 60),
-            fontFace=cv2.FONT_HERSHEY_COMPLEX,
-            fontScale=.5,
-            color=(255, 165, 0),
-            thickness=2
-        )
-
-    def _add_action_text(self, frame, action_text):
-        cv2.putText(
-            img=frame,
-            text=action_text,
-            org=(10, 80),
-            fontFace=cv2.FONT_HERSHEY_COMPLEX,
-            fontScale=.5,
-            color=(255, 165, 0),
-            thickness=2
-        )
+        achieved = self._scheduler.achieved_frame_rate
+        if self._play_video and not np.isnan(achieved):
+            frame_rate_text += f' (achieved {achieved:.1f})'
+        return frame_rate_text
 
     def _parse_command(self, keys):
         command_text = ''
@@ -173,23 +337,29 @@ class Interface:
                     self._frame_index -= 1
                     command_text = 'Previous frame'
             elif keys[pygame.K_RIGHT]:
-                if self._frame_index != len(self.detector.video) - 1:
+                if self._frame_index != len(self.video) - 1:
                     self._frame_index += 1
                     command_text = 'Next frame'
             elif keys[ord('f')]:
                 self.detector.set_freezing(self._frame_index)
-                if self._frame_index != len(self.detector.video) - 1:
+                self._timeline.update(
+                    start=self._frame_index, stop=self._frame_index + 1
+                )
+                if self._frame_index != len(self.video) - 1:
                     self._frame_index += 1
                     command_text = 'Set freezing'
             elif keys[ord('m')]:
                 self.detector.set_moving(self._frame_index)
-                if self._frame_index != len(self.detector.video) - 1:
+                self._timeline.update(
+                    start=self._frame_index, stop=self._frame_index + 1
+                )
+                if self._frame_index != len(self.video) - 1:
                     self._frame_index += 1
                     command_text = 'Set moving'
             elif keys[ord('n')]:
                 search_started = False
                 while True:
-                    if self._frame_index == len(self.detector.video) - 1:
+                    if self._frame_index == len(self.video) - 1:
                         break
                     meta_data = self.detector.meta(self._frame_index)
                     if pd.isna(meta_data['flagged'].iloc[0]):
@@ -219,18 +389,18 @@ class Interface:
             elif keys[ord(' ')] and not self._space_pressed:
                 self._space_pressed = True
                 self._play_video = True
+                self._scheduler.start(frame_index=self._frame_index)
                 command_text = 'Play'
         else:  # video is playing
             if keys[ord(' ')] and not self._space_pressed:
                 self._space_pressed = True
                 self._play_video = False
+                self._scheduler.stop()
                 command_text = 'Pause'
             elif keys[pygame.K_UP]:
-                # max_frame_rate = self.detector.video.frame_rate * 2
-                # if not self._playback_frame_rate + 1 > max_frame_rate:
-                self._playback_frame_rate += 1
+                self._scheduler.frame_rate += 1
                 command_text = 'Speed up'
-            elif keys[pygame.K_DOWN] and self._playback_frame_rate - 1 > 0:
-                self._playback_frame_rate -= 1
+            elif keys[pygame.K_DOWN] and self._scheduler.frame_rate - 1 > 0:
+                self._scheduler.frame_rate -= 1
                 command_text = 'Slow down'
         return  command_text
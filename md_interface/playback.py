@@ -0,0 +1,97 @@
+import time
+from collections import deque
+from typing import Callable, Optional
+
+
+class PlaybackScheduler:
+    """Real-time playback scheduler.
+
+    Computes which frame should be on screen from the time elapsed on a
+    monotonic clock since playback started and the requested frame rate, so
+    that the playback speed does not depend on how fast frames are decoded
+    and rendered. When rendering falls behind, the target frame jumps ahead
+    and the intermediate frames are meant to be skipped.
+
+    The frame rate at which frames are actually presented is tracked over a
+    sliding window of recent frames.
+
+    Parameters
+    ----------
+    frame_rate : float
+        The requested playback frame rate.
+    clock : Callable, default time.monotonic
+        The clock returning the current time in seconds.
+    """
+
+    def __init__(
+            self,
+            frame_rate: float,
+            clock: Callable[[], float] = time.monotonic,
+    ):
+        self._frame_rate = frame_rate
+        self._clock = clock
+        self._anchor_time: Optional[float] = None
+        self._anchor_frame = 0
+        self._presentation_times = deque(maxlen=30)
+
+    @property
+    def frame_rate(self) -> float:
+        """The requested playback frame rate."""
+        return self._frame_rate
+
+    @frame_rate.setter
+    def frame_rate(self, frame_rate: float):
+        if self.playing:
+            # re-anchor so that the current frame does not jump
+            self._anchor_frame = self.target_frame()
+            self._anchor_time = self._clock()
+        self._frame_rate = frame_rate
+
+    @property
+    def playing(self) -> bool:
+        """Set to True between `start` and `stop`."""
+        return self._anchor_time is not None
+
+    @property
+    def achieved_frame_rate(self) -> float:
+        """The rate at which frames have recently been presented.
+
+        Returns NaN until two frames have been presented.
+        """
+        times = self._presentation_times
+        if len(times) < 2 or times[-1] == times[0]:
+            return float('nan')
+        return (len(times) - 1) / (times[-1] - times[0])
+
+    def start(self, frame_index: int):
+        """Start playing from the given frame.
+
+        Parameters
+        ----------
+        frame_index : int
+            The frame currently on screen.
+        """
+        self._anchor_frame = frame_index
+        self._anchor_time = self._clock()
+        self._presentation_times.clear()
+
+    def stop(self):
+        """Stop playing."""
+        self._anchor_time = None
+        self._presentation_times.clear()
+
+    def target_frame(self) -> int:
+        """Returns the frame that should currently be on screen.
+
+        Returns
+        -------
+        int
+        """
+        if not self.playing:
+            return self._anchor_frame
+        elapsed = self._clock() - self._anchor_time
+        return self._anchor_frame + int(elapsed * self._frame_rate)
+
+    def frame_presented(self):
+        """Record that a new frame has been presented."""
+        self._presentation_times.append(self._clock())
@@ -0,0 +1,175 @@
+import threading
+from typing import Callable, Optional
+
+import numpy as np
+
+from movement_detector.video import AbstractVideo
+
+
+class FrameReadAhead:
+    """Background decoder of upcoming video frames.
+
+    A worker thread decodes the frames following the last requested position
+    in the playback direction, converts them to a display-ready format and
+    keeps up to `depth` of them in a buffer. The display thread then only
+    needs to pick the frames from the buffer.
+
+    Frames are kept after they are read, so that a paused display can redraw
+    them. Once the buffer is full, the frames the playback has moved past are
+    evicted, farthest from the current frame first.
+
+    When the playback skips ahead of the worker, e.g. to keep up with the
+    playback schedule, the worker jumps to the current frame instead of
+    decoding the frames in between, and the frames still ahead are kept.
+
+    The video object must be dedicated to the worker, since video readers
+    cannot be shared between threads.
+
+    Parameters
+    ----------
+    video : AbstractVideo
+        The video from which to decode the frames.
+    convert : Callable, optional
+        Applied to each decoded frame by the worker.
+    depth : int, default 16
+        The maximum number of buffered frames.
+    """
+
+    def __init__(
+            self,
+            video: AbstractVideo,
+            convert: Optional[Callable[[np.ndarray], np.ndarray]] = None,
+            depth: int = 16,
+    ):
+        self._video = video
+        self._convert = convert
+        self._depth = depth
+        self._frames = {}
+        self._condition = threading.Condition()
+        self._generation = 0
+        self._next_index = None
+        self._current_index = None
+        self._direction = 1
+        self._stopped = False
+        self._thread = None
+
+    def seek(self, index: int, direction: int = 1):
+        """Restart decoding from the given frame.
+
+        Any frames buffered or being decoded for the previous position are
+        discarded. The worker is restarted if it was stopped.
+
+        Parameters
+        ----------
+        index : int
+            The first frame to decode.
+        direction : {1, -1}, default 1
+            The playback direction.
+        """
+        with self._condition:
+            self._generation += 1
+            self._frames.clear()
+            self._next_index = index
+            self._current_index = index - direction
+            self._direction = direction
+            self._stopped = False
+            self._condition.notify_all()
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._work, daemon=True)
+            self._thread.start()
+
+    def get(self, index: int, timeout: float = 0.) -> Optional[np.ndarray]:
+        """Returns the buffered frame, if available.
+
+        The requested frame becomes the current frame, see the eviction
+        policy of the class.
+
+        Parameters
+        ----------
+        index : int
+            Index of the desired frame.
+        timeout : float, default 0
+            If the frame is not buffered but is the next one the worker will
+            decode, how long to wait for it in seconds.
+
+        Returns
+        -------
+        NumPy array or None
+        """
+        with self._condition:
+            self._current_index = index
+            self._evict()
+            self._condition.notify_all()
+            if timeout > 0 and self._next_pending() == index:
+                self._condition.wait_for(
+                    lambda: (index in self._frames
+                             or self._next_pending() != index),
+                    timeout=timeout,
+                )
+            frame = self._frames.get(index)
+        return frame
+
+    def stop(self):
+        """Stop the worker thread."""
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _is_behind(self, index: int) -> bool:
+        return (index - self._current_index) * self._direction < 0
+
+    def _evict(self):
+        excess = len(self._frames) - self._depth
+        if excess <= 0:
+            return
+        behind = sorted(
+            (i for i in self._frames if self._is_behind(i)),
+            key=lambda i: abs(i - self._current_index),
+            reverse=True,
+        )
+        for i in behind[:excess]:
+            del self._frames[i]
+
+    def _next_pending(self) -> Optional[int]:
+        """Returns the next frame to decode, None if there is none."""
+        index = self._next_index
+        if index is None or self._stopped:
+            return None
+        if self._is_behind(index):
+            # the playback moved past the decoded frames
+            index = self._current_index
+            while index in self._frames:
+                index += self._direction
+        if not 0 <= index < len(self._video):
+            return None
+        return index
+
+    def _has_work(self) -> bool:
+        if self._next_pending() is None:
+            return False
+        ahead = sum(not self._is_behind(i) for i in self._frames)
+        return ahead < self._depth
+
+    def _work(self):
+        while True:
+            with self._condition:
+                while not self._stopped and not self._has_work():
+                    self._condition.wait()
+                if self._stopped:
+                    return
+                generation = self._generation
+                index = self._next_pending()
+                direction = self._direction
+            self._video.skip_to(index)
+            frame = self._video.get_frame(index)
+            if frame is not None and self._convert is not None:
+                frame = self._convert(frame)
+            with self._condition:
+                if generation == self._generation:
+                    self._frames[index] = frame
+                    self._next_index = index + direction
+                    self._evict()
+                    self._condition.notify_all()
@@ -0,0 +1,139 @@
+from typing import Optional
+
+import numpy as np
+import pygame
+
+from movement_detector.detectors import AbstractMovementDetector
+
+
+class Timeline:
+    """Overview strip of the detector's metadata across the whole video.
+
+    Each pixel column summarizes a contiguous range of frames: it is drawn as
+    moving or freezing depending on the majority of its frames, with markers
+    for flagged and user-verified frames. The summaries are kept per column,
+    so drawing the strip does not depend on the number of frames, and only
+    the columns covering edited frames are recomputed.
+
+    Parameters
+    ----------
+    detector : AbstractMovementDetector
+        The detector whose metadata to summarize.
+    width : int
+        The width of the strip in pixels.
+    height : int, default 24
+        The height of the strip in pixels.
+    """
+
+    moving_colour = (0, 0, 255)
+    freezing_colour = (0, 255, 0)
+    loading_colour = (128, 128, 128)
+    flagged_colour = (255, 0, 0)
+    manual_set_colour = (255, 255, 255)
+    cursor_colour = (255, 165, 0)
+    marker_height = 4
+
+    def __init__(
+            self,
+            detector: AbstractMovementDetector,
+            width: int,
+            height: int = 24,
+    ):
+        self.detector = detector
+        self.width = width
+        self.height = height
+        self.version = 0
+        frame_count = len(detector.video)
+        columns = np.arange(width + 1)
+        edges = columns * frame_count // width
+        self._starts = np.minimum(edges[:-1], frame_count - 1)
+        self._stops = np.maximum(edges[1:], self._starts + 1)
+        self._surface = pygame.Surface((width, height), depth=32)
+        self._surface.fill(self.loading_colour)
+
+    @property
+    def surface(self) -> pygame.Surface:
+        """The rendered strip, without the cursor."""
+        return self._surface
+
+    def update(self, start: int = 0, stop: Optional[int] = None):
+        """Recompute the columns covering the given frames.
+
+        Parameters
+        ----------
+        start : int, default 0
+            The first changed frame.
+        stop : int, optional
+            The frame following the last changed frame. Defaults to the end
+            of the video.
+        """
+        if stop is None:
+            stop = len(self.detector.video)
+        first = np.searchsorted(self._stops, start, side='right')
+        last = np.searchsorted(self._starts, stop, side='left')
+        if first >= last:
+            return
+        starts = self._starts[first:last]
+        meta = self.detector.meta(
+            start=starts[0],
+            stop=self._stops[last - 1],
+            field=['moving', 'flagged', 'manual_set'],
+        ).to_numpy(dtype=float)
+        known = ~np.isnan(meta)
+        meta = np.where(known, meta, 0)
+        offsets = starts - starts[0]
+        known_count = np.add.reduceat(known[:, 0], offsets)
+        moving, flagged, manual_set = np.add.reduceat(meta, offsets).T
+        colours = np.empty((len(starts), self.height, 3), dtype='uint8')
+        main = np.where(
+            (2 * moving >= known_count)[:, None],
+            self.moving_colour,
+            self.freezing_colour,
+        )
+        main[known_count == 0] = self.loading_colour
+        colours[:] = main[:, None, :]
+        marker = self.marker_height
+        colours[flagged > 0, :marker] = self.flagged_colour
+        colours[manual_set > 0, -marker:] = self.manual_set_colour
+        pixels = pygame.surfarray.pixels3d(self._surface)
+        pixels[first:last] = colours
+        del pixels
+        self.version += 1
+
+    def draw(self, surface: pygame.Surface, position: tuple, index: int):
+        """Draw the strip with a cursor at the given frame.
+
+        Parameters
+        ----------
+        surface : pygame Surface
+            The surface on which to draw.
+        position : tuple
+            The top-left corner of the strip on the surface.
+        index : int
+            The frame at which to draw the cursor.
+        """
+        surface.blit(self._surface, position)
+        x = position[0] + int(index * self.width / len(self.detector.video))
+        top = position[1]
+        pygame.draw.line(
+            surface,
+            self.cursor_colour,
+            (x, top),
+            (x, top + self.height - 1),
+        )
+
+    def frame_at(self, x: int) -> int:
+        """Returns the frame corresponding to a horizontal position.
+
+        Parameters
+        ----------
+        x : int
+            The position relative to the left of the strip.
+
+        Returns
+        -------
+        int
+        """
+        frame_count = len(self.detector.video)
+        frame = int(x * frame_count / self.width)
+        return int(np.clip(frame, 0, frame_count - 1))
@@ -1,9 +1,17 @@
-from movement_detector.video import CvVideo
+from movement_detector.video import CvVideo, LiveVideo
 from movement_detector.detectors import PixelChangeFD
-from movement_detector.analysis import IntervalAggregatorMA
+from movement_detector.analysis import (
+    IntervalAggregatorMA, IntervalStatisticsMA, SegmentsMA, SlidingWindowMA,
+    StreamingIntervalAggregatorMA,
+)
 
 __all__ = [
     'CvVideo',
+    'LiveVideo',
     'PixelChangeFD',
     'IntervalAggregatorMA',
+    'IntervalStatisticsMA',
+    'SegmentsMA',
+    'SlidingWindowMA',
+    'StreamingIntervalAggregatorMA',
 ]
@@ -1,13 +1,18 @@
 import os
+import shutil
+import weakref
 from abc import ABC, abstractmethod
 from pathlib import Path
-from typing import List, Callable
+from typing import List, Callable, Optional, Any
 
 import pandas as pd
 import numpy as np
 
+from movement_detector.cache import ResultCache, parameters_hash
 from movement_detector.detectors import AbstractMovementDetector
-from movement_detector.utils import get_video_mapped_path
+from movement_detector.np_utils import run_lengths
+from movement_detector.store import SQLiteResultStore
+from movement_detector.utils import get_video_mapped_path, get_video_id
 
 
 class AbstractMetaAnalyzer(ABC):
@@ -19,13 +24,29 @@ class AbstractMetaAnalyzer(ABC):
     ----------
     detector : AbstractMovementDetector
         The detector who's metadata to analyze.
+    cache : ResultCache, optional
+        If set, the analysis is looked up in and saved to the cache, keyed by
+        the video's content, the detector's and analyzer's parameters, and
+        the current metadata.
+    store : SQLiteResultStore, optional
+        If set, the analysis is also written to the store when saved.
     """
 
-    def __init__(self, detector: AbstractMovementDetector):
+    _analysis_name = ''
+
+    def __init__(
+            self,
+            detector: AbstractMovementDetector,
+            cache: Optional[ResultCache] = None,
+            store: Optional[SQLiteResultStore] = None,
+    ):
         self.detector = detector
+        self.cache = cache
+        self.store = store
         # TODO: this violates the open-closed principle
         self.analysis_path = self.get_analysis_path(
-            vid_path=self.detector.video.vid_path
+            vid_path=self.detector.video.vid_path,
+            analysis_name=self._analysis_name,
         )
 
     def run(self):
@@ -35,8 +56,31 @@ class AbstractMetaAnalyzer(ABC):
         as a CSV file.
 
         If the detector hasn't been ran, `self.detector.run()` is called.
+
+        If the analyzer has a cache, a cached analysis is only reused if it
+        was produced by the same parameters from the same metadata.
         """
-        if not os.path.exists(self.analysis_path):
+        if self.cache is not None:
+            if not self.detector.meta_built:
+                self.detector.run()
+            parameters = self._cache_parameters()
+            cached_path = self.cache.get(
+                fingerprint=self.detector.video.fingerprint,
+                parameters=parameters,
+            )
+            if cached_path is not None:
+                self._make_analysis_parent()
+                shutil.copyfile(cached_path, self.analysis_path)
+                analysis = self._load_analysis()
+            else:
+                analysis = self._analyze_meta(df=self.detector._metadata)
+                self._save_analysis(analysis=analysis)
+                self.cache.put(
+                    fingerprint=self.detector.video.fingerprint,
+                    parameters=parameters,
+                    file_path=self.analysis_path,
+                )
+        elif not os.path.exists(self.analysis_path):
             if not self.detector.meta_built:
                 self.detector.run()
             analysis = self._analyze_meta(df=self.detector._metadata)
@@ -45,8 +89,17 @@ class AbstractMetaAnalyzer(ABC):
             analysis = self._load_analysis()
         return analysis
 
+    @property
+    def parameters(self) -> dict:
+        """The parameters that determine the analyzer's output.
+
+        Used to key the analysis in a :class:`ResultCache`. Subclasses must
+        extend the dictionary with their own parameters.
+        """
+        return {'analyzer': type(self).__name__}
+
     @staticmethod
-    def get_analysis_path(vid_path: Path) -> Path:
+    def get_analysis_path(vid_path: Path, analysis_name: str = '') -> Path:
         """Returns the path in which to save the analysis file.
 
         The analysis is saved in a sub-path relative to the analysis folder
@@ -57,6 +110,9 @@ class AbstractMetaAnalyzer(ABC):
         ----------
         vid_path : Path
             The path to the video file.
+        analysis_name : str, optional
+            If set, the name is appended to the file name so that several
+            analyses of the same video can coexist.
 
         Returns
         -------
@@ -68,6 +124,8 @@ class AbstractMetaAnalyzer(ABC):
             dir_suffix='analysis',
             file_extension='.csv',
         )
+        if analysis_name:
+            path = path.with_name(f'{path.stem}_{analysis_name}{path.suffix}')
         return path
 
     @abstractmethod
@@ -80,11 +138,29 @@ class AbstractMetaAnalyzer(ABC):
         """
         pass
 
-    def _save_analysis(self, analysis):
+    def _cache_parameters(self) -> dict:
+        parameters = {
+            'analyzer': self.parameters,
+            'detector': self.detector.parameters,
+            'meta': self.detector.meta_digest(),
+        }
+        return parameters
+
+    def _make_analysis_parent(self):
         parent = self.analysis_path.parent
         if not os.path.exists(parent):
             os.makedirs(parent)
+
+    def _save_analysis(self, analysis):
+        self._make_analysis_parent()
         analysis.to_csv(self.analysis_path)
+        if self.store is not None:
+            self.store.write_analysis(
+                video_id=get_video_id(self.detector.video.vid_path),
+                analyzer=type(self).__name__,
+                analysis=analysis,
+                parameters=parameters_hash(self.parameters),
+            )
 
     def _load_analysis(self):
         analysis = pd.read_csv(self.analysis_path)
@@ -117,6 +193,10 @@ class IntervalAggregatorMA(AbstractMetaAnalyzer):
         If set to True and the last cut-off point is lower than the duration
         of the video, the last interval will span from the cut-off point to
         the end of the video.
+    cache : ResultCache, optional
+        The cache in which to look up and save the analysis.
+    store : SQLiteResultStore, optional
+        The store to which to write the analysis.
     """
 
     def __init__(
@@ -126,8 +206,10 @@ class IntervalAggregatorMA(AbstractMetaAnalyzer):
             aggregation: Callable = np.mean,
             include_start: bool = True,
             include_end: bool = True,
+            cache: Optional[ResultCache] = None,
+            store: Optional[SQLiteResultStore] = None,
     ):
-        super().__init__(detector=detector)
+        super().__init__(detector=detector, cache=cache, store=store)
         self._intervals = intervals
         self._aggregation = aggregation
         self._include_start = include_start
@@ -143,17 +225,803 @@ class IntervalAggregatorMA(AbstractMetaAnalyzer):
         """The aggregation operation."""
         return self._aggregation
 
+    @property
+    def parameters(self) -> dict:
+        parameters = super().parameters
+        parameters.update({
+            'intervals': list(self.intervals),
+            'aggregation': self.aggregation,
+            'include_start': self._include_start,
+            'include_end': self._include_end,
+        })
+        return parameters
+
+    def interval_edges(self) -> List[float]:
+        """Returns the interval edges, including the start and end of the
+        video as configured.
+
+        Returns
+        -------
+        list of floats
+        """
+        edges = _interval_edges(
+            intervals=self.intervals,
+            include_start=self._include_start,
+            include_end=self._include_end,
+            vid_duration=self.detector.video.vid_duration,
+        )
+        return edges
+
+    def _analyze_meta(self, df: pd.DataFrame):
+        edges = self.interval_edges()
+        statistic = IntervalPrefixSums.statistic_name(self._aggregation)
+        engine = None
+        if statistic is not None:
+            engine = _moving_engine(detector=self.detector, df=df)
+        if engine is not None:
+            analysis = engine.aggregate(edges=edges, statistic=statistic)
+        else:
+            analysis = df['moving'].groupby(pd.cut(df['time'], bins=edges))
+            analysis = analysis.aggregate(self._aggregation)
+        return analysis
+
+
+class IntervalStatisticsMA(AbstractMetaAnalyzer):
+    """Interval statistics analyzer.
+
+    Computes several freezing statistics for each interval of time in a single
+    vectorized pass over the metadata, and saves them as one table with a
+    column per statistic.
+
+    The available statistics are:
+
+    **freezing**: The fraction of frames without movement.
+
+    **freezing_bouts**: The number of freezing bouts. Bouts that span an
+    interval cut-off are counted in both intervals.
+
+    **freezing_latency**: The time in seconds from the start of the interval
+    to the first freezing frame in the interval. Set to NaN if there is no
+    freezing in the interval.
+
+    **longest_freezing_bout**: The duration in seconds of the longest
+    freezing bout, clipped to the interval.
+
+    **change_ratio**: The mean `change_ratio`, if the detector produces that
+    field.
+
+    Parameters
+    ----------
+    detector : AbstractMovementDetector
+        The detector who's metadata to analyze.
+    intervals : list of floats
+        A list of the interval cut-off points.
+    statistics : list of str, optional
+        The statistics to compute. Defaults to all available statistics.
+    include_start : bool, default True
+        If set to True and the first cut-off point is not zero, the first
+        interval will span from the start of the video to the first cut-off.
+    include_end : bool, default True
+        If set to True and the last cut-off point is lower than the duration
+        of the video, the last interval will span from the cut-off point to
+        the end of the video.
+    cache : ResultCache, optional
+        The cache in which to look up and save the analysis.
+    store : SQLiteResultStore, optional
+        The store to which to write the analysis.
+    """
+
+    available_statistics = (
+        'freezing',
+        'freezing_bouts',
+        'freezing_latency',
+        'longest_freezing_bout',
+        'change_ratio',
+    )
+
+    _analysis_name = 'statistics'
+
+    def __init__(
+            self,
+            detector: AbstractMovementDetector,
+            intervals: List[float],
+            statistics: Optional[List[str]] = None,
+            include_start: bool = True,
+            include_end: bool = True,
+            cache: Optional[ResultCache] = None,
+            store: Optional[SQLiteResultStore] = None,
+    ):
+        super().__init__(detector=detector, cache=cache, store=store)
+        if statistics is None:
+            statistics = list(self.available_statistics)
+        unknown = set(statistics) - set(self.available_statistics)
+        if unknown:
+            raise ValueError(f'Unknown statistics {sorted(unknown)}.')
+        self._intervals = intervals
+        self._statistics = list(statistics)
+        self._include_start = include_start
+        self._include_end = include_end
+
+    @property
+    def intervals(self) -> List[float]:
+        """The list of cut-off points for the intervals."""
+        return self._intervals
+
+    @property
+    def statistics(self) -> List[str]:
+        """The statistics computed for each interval."""
+        return self._statistics
+
+    @property
+    def parameters(self) -> dict:
+        parameters = super().parameters
+        parameters.update({
+            'intervals': list(self.intervals),
+            'statistics': self.statistics,
+            'include_start': self._include_start,
+            'include_end': self._include_end,
+        })
+        return parameters
+
+    def interval_edges(self) -> List[float]:
+        """Returns the interval edges, including the start and end of the
+        video as configured.
+
+        Returns
+        -------
+        list of floats
+        """
+        edges = _interval_edges(
+            intervals=self.intervals,
+            include_start=self._include_start,
+            include_end=self._include_end,
+            vid_duration=self.detector.video.vid_duration,
+        )
+        return edges
+
+    def _analyze_meta(self, df: pd.DataFrame):
+        edges = self.interval_edges()
+        time = df['time'].values.astype('float64')
+        freezing = ~df['moving'].values.astype(bool)
+        engine = IntervalPrefixSums(time=time, values=freezing)
+        bounds = engine.frame_bounds(edges=edges)
+        interval_count = len(edges) - 1
+        frame_period = 1 / self.detector.video.frame_rate
+
+        # freezing bouts, split at the interval cut-offs
+        interval_ids = np.full(len(df), -1)
+        interval_ids[bounds[0]:bounds[-1]] = np.repeat(
+            np.arange(interval_count), np.diff(bounds)
+        )
+        bout_keys = np.where(freezing & (interval_ids >= 0), interval_ids, -1)
+        starts, lengths, keys = run_lengths(bout_keys)
+        is_bout = keys >= 0
+        bout_starts = starts[is_bout]
+        bout_durations = lengths[is_bout] * frame_period
+        bout_intervals = keys[is_bout]
+
+        columns = {}
+        for statistic in self.statistics:
+            if statistic == 'freezing':
+                values = engine.means(edges=edges)
+            elif statistic == 'freezing_bouts':
+                values = np.bincount(bout_intervals, minlength=interval_count)
+            elif statistic == 'freezing_latency':
+                values = np.full(interval_count, np.nan)
+                intervals_, first_bouts = np.unique(
+                    bout_intervals, return_index=True
+                )
+                values[intervals_] = (
+                    time[bout_starts[first_bouts]]
+                    - np.asarray(edges, dtype='float64')[intervals_]
+                )
+            elif statistic == 'longest_freezing_bout':
+                values = np.zeros(interval_count)
+                np.maximum.at(values, bout_intervals, bout_durations)
+            elif 'change_ratio' in df:
+                values = IntervalPrefixSums(
+                    time=time, values=df['change_ratio'].values
+                ).means(edges=edges)
+            else:
+                continue
+            columns[statistic] = values
+
+        index = _interval_index(edges=edges)
+        return pd.DataFrame(columns, index=index)
+
+
+class SegmentsMA(AbstractMetaAnalyzer):
+    """Movement and freezing bouts table.
+
+    Saves the run-length encoded segments of the `moving` field, as returned
+    by :meth:`AbstractMovementDetector.segments`. Each row holds one bout of
+    movement or freezing with its start and stop frames, start time, duration
+    and mean change ratio.
+
+    Parameters
+    ----------
+    detector : AbstractMovementDetector
+        The detector who's metadata to analyze.
+    cache : ResultCache, optional
+        The cache in which to look up and save the analysis.
+    store : SQLiteResultStore, optional
+        The store to which to write the analysis.
+    """
+
+    _analysis_name = 'segments'
+
+    def _analyze_meta(self, df: pd.DataFrame):
+        return self.detector.segments()
+
+
+class SlidingWindowMA(AbstractMetaAnalyzer):
+    """Sliding-window freezing analyzer.
+
+    Computes the fraction of freezing frames over windows of time of a fixed
+    width, placed every `step` seconds, e.g. a 10 second window every second.
+    The windows are computed by differencing the cumulative sum of the
+    freezing frames, so the cost is linear in the number of frames no matter
+    how much the windows overlap.
+
+    The windows are closed on the right, as with
+    :class:`IntervalAggregatorMA`.
+
+    Parameters
+    ----------
+    detector : AbstractMovementDetector
+        The detector who's metadata to analyze.
+    window : float
+        The width of the windows in seconds.
+    step : float
+        The time in seconds between the start of consecutive windows.
+    start : float, default 0
+        The start time of the first window.
+    end : float, optional
+        The time after which no window extends. Defaults to the duration of
+        the video.
+    cache : ResultCache, optional
+        The cache in which to look up and save the analysis.
+    store : SQLiteResultStore, optional
+        The store to which to write the analysis.
+    """
+
+    _analysis_name = 'sliding'
+
+    def __init__(
+            self,
+            detector: AbstractMovementDetector,
+            window: float,
+            step: float,
+            start: float = 0,
+            end: Optional[float] = None,
+            cache: Optional[ResultCache] = None,
+            store: Optional[SQLiteResultStore] = None,
+    ):
+        super().__init__(detector=detector, cache=cache, store=store)
+        if window <= 0 or step <= 0:
+            raise ValueError('The window and step must be positive.')
+        self.window = window
+        self.step = step
+        self.start = start
+        self.end = end
+
+    @property
+    def parameters(self) -> dict:
+        parameters = super().parameters
+        parameters.update({
+            'window': self.window,
+            'step': self.step,
+            'start': self.start,
+            'end': self.end,
+        })
+        return parameters
+
+    def window_starts(self) -> np.ndarray:
+        """Returns the start time of each window.
+
+        Returns
+        -------
+        NumPy array
+        """
+        end = self.end
+        if end is None:
+            end = self.detector.video.vid_duration
+        window_count = int(np.floor(
+            (end - self.start - self.window) / self.step + 1e-9
+        )) + 1
+        starts = self.start + self.step * np.arange(max(window_count, 0))
+        return starts
+
+    def _analyze_meta(self, df: pd.DataFrame):
+        freezing = ~df['moving'].values.astype(bool)
+        engine = IntervalPrefixSums(time=df['time'].values, values=freezing)
+        starts = self.window_starts()
+        stops = starts + self.window
+        analysis = pd.DataFrame({
+            'start': starts,
+            'end': stops,
+            'frames': engine.window_counts(starts=starts, stops=stops),
+            'freezing': engine.window_means(starts=starts, stops=stops),
+        })
+        return analysis
+
+
+class AbstractStreamingMetaAnalyzer(AbstractMetaAnalyzer):
+    """Streaming metadata analyzer.
+
+    A group of analyzers that consume the detector's metadata as it is
+    produced, through :meth:`AbstractMovementDetector.add_listener`, instead
+    of analyzing the complete metadata once the detector is done. The
+    analysis is therefore ready as soon as the detector finishes, without a
+    second pass over the metadata.
+
+    Subclasses implement `reset`, `update` and `finalize`.
+
+    Parameters
+    ----------
+    detector : AbstractMovementDetector
+        The detector who's metadata to analyze.
+    cache : ResultCache, optional
+        The cache in which to look up and save the analysis.
+    store : SQLiteResultStore, optional
+        The store to which to write the analysis.
+    """
+
+    def __init__(
+            self,
+            detector: AbstractMovementDetector,
+            cache: Optional[ResultCache] = None,
+            store: Optional[SQLiteResultStore] = None,
+    ):
+        super().__init__(detector=detector, cache=cache, store=store)
+        self._frames_seen = 0
+
+    def run(self):
+        """Run the analysis.
+
+        If the detector hasn't been ran, the analyzer listens to the
+        detector while `self.detector.run()` is called. Otherwise, the
+        detector's current metadata is analyzed as a whole.
+        """
+        if self.detector.meta_built:
+            self._reset_stream()
+        elif self.cache is not None or not os.path.exists(self.analysis_path):
+            self._reset_stream()
+            self.detector.add_listener(self._consume)
+            try:
+                self.detector.run()
+            finally:
+                self.detector.remove_listener(self._consume)
+        return super().run()
+
+    @abstractmethod
+    def reset(self):
+        """Overwrite to clear the accumulated state."""
+        pass
+
+    @abstractmethod
+    def update(self, chunk: pd.DataFrame):
+        """Overwrite to accumulate a chunk of consecutive frames.
+
+        Parameters
+        ----------
+        chunk : pandas DataFrame
+            The metadata of the frames, indexed by frame.
+        """
+        pass
+
+    @abstractmethod
+    def finalize(self):
+        """Overwrite to return the analysis of the accumulated frames."""
+        pass
+
+    def _reset_stream(self):
+        self._frames_seen = 0
+        self.reset()
+
+    def _consume(self, chunk: pd.DataFrame):
+        self.update(chunk=chunk)
+        self._frames_seen += len(chunk)
+
     def _analyze_meta(self, df: pd.DataFrame):
-        if self._include_start:
-            first_timestamp = self.intervals[0]
-            if first_timestamp != 0:
-                self.intervals.insert(0, 0)
-        if self._include_end:
-            last_timestamp = self.intervals[-1]
-            vid_len = self.detector.video.vid_duration
-            if vid_len > last_timestamp:
-                self.intervals.append(vid_len)
-
-        df = df.groupby(pd.cut(df['time'], bins=self.intervals))
-        df = df.aggregate(self._aggregation)['moving']
-        return df
+        if self._frames_seen != len(df):
+            # the metadata was not streamed: analyze it as a single chunk
+            self._reset_stream()
+            self._consume(chunk=df)
+        return self.finalize()
+
+
+class StreamingIntervalAggregatorMA(AbstractStreamingMetaAnalyzer):
+    """Streaming interval metadata aggregator.
+
+    Computes the same analysis as :class:`IntervalAggregatorMA` from the
+    detector's metadata as it streams, keeping a running count and sum of the
+    `moving` field per interval. An interval is finalized as soon as the
+    video time passes its cut-off, so partial per-interval results are
+    available while long videos are still processing.
+
+    Parameters
+    ----------
+    detector : AbstractMovementDetector
+        The detector who's metadata to analyze.
+    intervals : list of floats
+        A list of the interval cut-off points.
+    statistic : {'mean', 'sum', 'count', 'freezing'}, default 'mean'
+        The statistic of the `moving` field computed for each interval.
+    include_start : bool, default True
+        If set to True and the first cut-off point is not zero, the first
+        interval will span from the start of the video to the first cut-off.
+    include_end : bool, default True
+        If set to True and the last cut-off point is lower than the duration
+        of the video, the last interval will span from the cut-off point to
+        the end of the video.
+    on_interval : Callable, optional
+        Called with the interval and its value whenever an interval is
+        finalized.
+    cache : ResultCache, optional
+        The cache in which to look up and save the analysis.
+    store : SQLiteResultStore, optional
+        The store to which to write the analysis.
+    """
+
+    def __init__(
+            self,
+            detector: AbstractMovementDetector,
+            intervals: List[float],
+            statistic: str = 'mean',
+            include_start: bool = True,
+            include_end: bool = True,
+            on_interval: Optional[Callable[[pd.Interval, float], Any]] = None,
+            cache: Optional[ResultCache] = None,
+            store: Optional[SQLiteResultStore] = None,
+    ):
+        super().__init__(detector=detector, cache=cache, store=store)
+        if statistic not in IntervalPrefixSums.statistics:
+            raise ValueError(f'Unsupported statistic {statistic}.')
+        self._intervals = intervals
+        self._statistic = statistic
+        self._include_start = include_start
+        self._include_end = include_end
+        self._on_interval = on_interval
+        self._edges = np.asarray(_interval_edges(
+            intervals=intervals,
+            include_start=include_start,
+            include_end=include_end,
+            vid_duration=detector.video.vid_duration,
+        ), dtype='float64')
+        self._index = _interval_index(edges=list(self._edges))
+        self.reset()
+
+    @property
+    def intervals(self) -> List[float]:
+        """The list of cut-off points for the intervals."""
+        return self._intervals
+
+    @property
+    def parameters(self) -> dict:
+        parameters = super().parameters
+        parameters.update({
+            'intervals': list(self.intervals),
+            'statistic': self._statistic,
+            'include_start': self._include_start,
+            'include_end': self._include_end,
+        })
+        return parameters
+
+    @property
+    def partial_results(self) -> pd.Series:
+        """The values of the intervals finalized so far."""
+        return self._results()[:self._finalized]
+
+    def reset(self):
+        interval_count = len(self._edges) - 1
+        self._counts = np.zeros(interval_count, dtype='int64')
+        self._sums = np.zeros(interval_count)
+        self._finalized = 0
+
+    def update(self, chunk: pd.DataFrame):
+        time = chunk['time'].values.astype('float64')
+        if len(time) == 0:
+            return
+        # intervals are closed on the right
+        bins = np.searchsorted(self._edges, time, side='left') - 1
+        valid = (bins >= 0) & (bins < len(self._counts))
+        bins = bins[valid]
+        moving = chunk['moving'].values.astype('float64')[valid]
+        self._counts += np.bincount(bins, minlength=len(self._counts))
+        self._sums += np.bincount(
+            bins, weights=moving, minlength=len(self._sums)
+        )
+        # an interval is complete once the time has passed its cut-off
+        finalized = int(np.searchsorted(
+            self._edges[1:], time.max(), side='left'
+        ))
+        self._finalize_intervals(stop=finalized)
+
+    def finalize(self):
+        self._finalize_intervals(stop=len(self._counts))
+        return self._results()
+
+    def _finalize_intervals(self, stop: int):
+        if stop <= self._finalized:
+            return
+        if self._on_interval is not None:
+            values = self._results()
+            for i in range(self._finalized, stop):
+                self._on_interval(self._index[i], values.iloc[i])
+        self._finalized = stop
+
+    def _results(self) -> pd.Series:
+        if self._statistic == 'count':
+            values = self._counts
+        elif self._statistic == 'sum':
+            values = self._sums
+        else:
+            values = np.full(len(self._counts), np.nan)
+            np.divide(
+                self._sums, self._counts,
+                out=values, where=self._counts > 0,
+            )
+            if self._statistic == 'freezing':
+                values = 1 - values
+        return pd.Series(values, index=self._index, name='moving')
+
+
+def freezing_ratio(moving: np.ndarray) -> float:
+    """The ratio of freezing frames."""
+    return 1 - np.mean(moving)
+
+
+class IntervalPrefixSums:
+    """Prefix-sum engine for interval statistics.
+
+    Precomputes the cumulative sum of a per-frame value once, after which the
+    count, sum and mean of the value over any set of k time intervals are
+    obtained with a binary search of the interval edges in O(k log n),
+    instead of re-grouping all the frames for each interval set.
+
+    Parameters
+    ----------
+    time : NumPy array
+        The frame timestamps. Must be sorted in increasing order.
+    values : NumPy array
+        The per-frame values, e.g. the `moving` field of the metadata.
+    """
+
+    statistics = ('count', 'sum', 'mean', 'freezing')
+
+    _aggregation_statistics = {
+        np.mean: 'mean',
+        np.sum: 'sum',
+        np.size: 'count',
+        len: 'count',
+        freezing_ratio: 'freezing',
+    }
+
+    def __init__(self, time: np.ndarray, values: np.ndarray):
+        self.time = np.asarray(time, dtype='float64')
+        self._cumsum = np.concatenate(
+            ([0], np.cumsum(np.asarray(values, dtype='float64')))
+        )
+
+    @classmethod
+    def from_meta(cls, df: pd.DataFrame, field: str = 'moving'):
+        """Builds the engine from a detector's metadata.
+
+        Parameters
+        ----------
+        df : pandas DataFrame
+            The metadata.
+        field : str, default 'moving'
+            The field over which to compute the statistics.
+
+        Returns
+        -------
+        IntervalPrefixSums
+        """
+        return cls(time=df['time'].values, values=df[field].values)
+
+    @classmethod
+    def statistic_name(cls, aggregation) -> Optional[str]:
+        """Returns the engine statistic equivalent to an aggregation.
+
+        Parameters
+        ----------
+        aggregation : Callable or str
+            An aggregation function or the name of a statistic.
+
+        Returns
+        -------
+        str or None
+            The statistic name, or None if the aggregation is not supported
+            by the engine.
+        """
+        if isinstance(aggregation, str):
+            return aggregation if aggregation in cls.statistics else None
+        try:
+            return cls._aggregation_statistics.get(aggregation)
+        except TypeError:  # unhashable callable
+            return None
+
+    def frame_bounds(self, edges, closed: str = 'right') -> np.ndarray:
+        """Returns the index of the first frame after each edge.
+
+        Parameters
+        ----------
+        edges : list of floats
+            The interval edges.
+        closed : {'right', 'left'}, default 'right'
+            Which side of the intervals is closed.
+
+        Returns
+        -------
+        NumPy array
+        """
+        side = 'right' if closed == 'right' else 'left'
+        return np.searchsorted(self.time, edges, side=side)
+
+    def counts(self, edges, closed: str = 'right') -> np.ndarray:
+        """Returns the number of frames in each interval."""
+        return np.diff(self.frame_bounds(edges=edges, closed=closed))
+
+    def sums(self, edges, closed: str = 'right') -> np.ndarray:
+        """Returns the sum of the values in each interval."""
+        return np.diff(self._cumsum[self.frame_bounds(edges, closed=closed)])
+
+    def means(self, edges, closed: str = 'right') -> np.ndarray:
+        """Returns the mean of the values in each interval.
+
+        Empty intervals are set to NaN.
+        """
+        edges = np.asarray(edges, dtype='float64')
+        return self.window_means(
+            starts=edges[:-1], stops=edges[1:], closed=closed
+        )
+
+    def window_counts(
+            self,
+            starts: np.ndarray,
+            stops: np.ndarray,
+            closed: str = 'right',
+    ) -> np.ndarray:
+        """Returns the number of frames in each of a set of windows.
+
+        Unlike with `counts`, the windows may overlap.
+
+        Parameters
+        ----------
+        starts : NumPy array
+            The start time of each window.
+        stops : NumPy array
+            The stop time of each window.
+        closed : {'right', 'left'}, default 'right'
+            Which side of the windows is closed.
+
+        Returns
+        -------
+        NumPy array
+        """
+        start_bounds = self.frame_bounds(edges=starts, closed=closed)
+        stop_bounds = self.frame_bounds(edges=stops, closed=closed)
+        return stop_bounds - start_bounds
+
+    def window_means(
+            self,
+            starts: np.ndarray,
+            stops: np.ndarray,
+            closed: str = 'right',
+    ) -> np.ndarray:
+        """Returns the mean of the values in each of a set of windows.
+
+        Unlike with `means`, the windows may overlap. Empty windows are set
+        to NaN.
+
+        Parameters
+        ----------
+        starts : NumPy array
+            The start time of each window.
+        stops : NumPy array
+            The stop time of each window.
+        closed : {'right', 'left'}, default 'right'
+            Which side of the windows is closed.
+
+        Returns
+        -------
+        NumPy array
+        """
+        start_bounds = self.frame_bounds(edges=starts, closed=closed)
+        stop_bounds = self.frame_bounds(edges=stops, closed=closed)
+        counts = stop_bounds - start_bounds
+        sums = self._cumsum[stop_bounds] - self._cumsum[start_bounds]
+        means = np.full(len(counts), np.nan)
+        np.divide(sums, counts, out=means, where=counts > 0)
+        return means
+
+    def aggregate(
+            self,
+            edges,
+            statistic: str = 'mean',
+            closed: str = 'right',
+            name: str = 'moving',
+    ) -> pd.Series:
+        """Computes a statistic over consecutive intervals.
+
+        Parameters
+        ----------
+        edges : list of floats
+            The interval edges.
+        statistic : {'count', 'sum', 'mean', 'freezing'}, default 'mean'
+            The statistic to compute. The freezing statistic is the mean of
+            the complement of the values, as computed by `freezing_ratio`.
+        closed : {'right', 'left'}, default 'right'
+            Which side of the intervals is closed.
+        name : str, default 'moving'
+            The name of the resulting series.
+
+        Returns
+        -------
+        pandas Series
+            The statistic, indexed by the intervals.
+        """
+        if statistic == 'count':
+            values = self.counts(edges=edges, closed=closed)
+        elif statistic == 'sum':
+            values = self.sums(edges=edges, closed=closed)
+        elif statistic == 'mean':
+            values = self.means(edges=edges, closed=closed)
+        elif statistic == 'freezing':
+            values = 1 - self.means(edges=edges, closed=closed)
+        else:
+            raise ValueError(f'Unsupported statistic {statistic}.')
+        index = _interval_index(edges=edges, closed=closed)
+        return pd.Series(values, index=index, name=name)
+
+
+# the `moving` engine of each detector's metadata, with the metadata version
+# it was built from
+_moving_engines = weakref.WeakKeyDictionary()
+
+
+def _moving_engine(
+        detector: AbstractMovementDetector,
+        df: pd.DataFrame,
+) -> Optional[IntervalPrefixSums]:
+    """Returns the prefix-sum engine of the `moving` field of a detector's
+    metadata, or None if the frames are not sorted by time.
+
+    The engine is only rebuilt when the metadata changes.
+    """
+    key = (id(df), detector.meta_version)
+    cached = _moving_engines.get(detector)
+    if cached is not None and cached[0] == key and cached[1] is df:
+        return cached[2]
+    time = df['time'].values.astype('float64')
+    engine = None
+    if np.all(np.diff(time) >= 0):
+        engine = IntervalPrefixSums(time=time, values=df['moving'].values)
+    _moving_engines[detector] = (key, df, engine)
+    return engine
+
+
+def _interval_index(edges: List[float], closed: str = 'right'):
+    # labelled as by pd.cut, which rounds the interval bounds
+    index = pd.cut(
+        np.empty(0),
+        bins=edges,
+        right=closed == 'right',
+    ).categories.rename('time')
+    return index
+
+
+def _interval_edges(
+        intervals: List[float],
+        include_start: bool,
+        include_end: bool,
+        vid_duration: float,
+) -> List[float]:
+    edges = list(intervals)
+    if include_start and edges[0] != 0:
+        edges.insert(0, 0)
+    if include_end and vid_duration > edges[-1]:
+        edges.append(vid_duration)
+    return edges
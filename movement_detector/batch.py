@@ -0,0 +1,379 @@
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Type
+
+import numpy as np
+import pandas as pd
+
+from movement_detector.analysis import AbstractMetaAnalyzer
+from movement_detector.cache import parameters_hash, video_fingerprint
+from movement_detector.detectors import AbstractMovementDetector
+from movement_detector.utils import (
+    get_video_paths, get_video_mapped_path, get_video_id
+)
+from movement_detector.video import AbstractVideo, CvVideo
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+#: The keyword arguments that do not affect the results of a job.
+_RESOURCE_KWARGS = ('cache', 'store', 'checkpoint_interval')
+
+#: The approximate resident memory of a worker process before it decodes a
+#: video, with NumPy, pandas, SciPy and OpenCV loaded.
+WORKER_BASE_MEMORY = 150 * 2 ** 20
+
+
+def analyze_cohort(
+        detector_cls: Type[AbstractMovementDetector],
+        detector_kwargs: dict,
+        analyzer_cls: Type[AbstractMetaAnalyzer],
+        analyzer_kwargs: dict,
+        vid_paths: Optional[List[str]] = None,
+        max_workers: Optional[int] = None,
+        video_cls: Type[AbstractVideo] = CvVideo,
+) -> pd.DataFrame:
+    """Analyzes the metadata of all videos and merges the results.
+
+    The videos are analyzed in a process pool. Videos without metadata are
+    skipped. A saved analysis is reused without loading the video or its
+    metadata if it is more recent than the metadata and was produced with the
+    same parameters, which are recorded next to it, see
+    :func:`parameters_digest`.
+
+    All the arguments must be picklable, e.g. an `aggregation` passed in
+    `analyzer_kwargs` cannot be a lambda, unless `max_workers` is 1, in which
+    case the videos are analyzed in the current process.
+
+    Parameters
+    ----------
+    detector_cls : type
+        The detector class that produced the metadata.
+    detector_kwargs : dict
+        The keyword arguments of the detector, except for the video.
+    analyzer_cls : type
+        The analyzer class.
+    analyzer_kwargs : dict
+        The keyword arguments of the analyzer, except for the detector.
+    vid_paths : list of str, optional
+        The videos to analyze. Defaults to all the videos in the videos
+        folder.
+    max_workers : int, optional
+        The number of worker processes. Defaults to the number of processors.
+    video_cls : type, default CvVideo
+        The video class used to open the videos.
+
+    Returns
+    -------
+    pandas DataFrame
+        The concatenated analyses, with a `video` column holding the video
+        identifiers.
+    """
+    if vid_paths is None:
+        vid_paths = get_video_paths()
+    jobs = [
+        (vid_path, video_cls, detector_cls, detector_kwargs,
+         analyzer_cls, analyzer_kwargs)
+        for vid_path in vid_paths
+    ]
+    if max_workers == 1:
+        analyses = [analyze_video(*job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            analyses = list(executor.map(analyze_video, *zip(*jobs)))
+    analyses = [a for a in analyses if a is not None]
+    if not analyses:
+        return pd.DataFrame(columns=['video'])
+    return pd.concat(analyses, ignore_index=True)
+
+
+def analyze_video(
+        vid_path: str,
+        video_cls: Type[AbstractVideo],
+        detector_cls: Type[AbstractMovementDetector],
+        detector_kwargs: dict,
+        analyzer_cls: Type[AbstractMetaAnalyzer],
+        analyzer_kwargs: dict,
+) -> Optional[pd.DataFrame]:
+    """Analyzes the metadata of a single video.
+
+    Refer to :func:`analyze_cohort` for details.
+
+    Returns
+    -------
+    pandas DataFrame or None
+        The analysis with a `video` column, or None if the video has no
+        metadata.
+    """
+    meta_path = get_video_mapped_path(
+        vid_path=vid_path,
+        dir_suffix='meta',
+        file_extension='.csv',
+    )
+    if not os.path.exists(meta_path):
+        return None
+    analysis_path = analyzer_cls.get_analysis_path(
+        vid_path=vid_path,
+        analysis_name=analyzer_cls._analysis_name,
+    )
+    digest = parameters_digest(
+        detector_cls=detector_cls,
+        detector_kwargs=detector_kwargs,
+        analyzer_cls=analyzer_cls,
+        analyzer_kwargs=analyzer_kwargs,
+    )
+    digest_path = analysis_path.with_suffix('.params')
+    if not (_is_up_to_date(path=analysis_path, source_path=meta_path)
+            and _read_digest(digest_path) == digest):
+        video = video_cls(file_path=vid_path)
+        detector = detector_cls(video=video, **detector_kwargs)
+        analyzer = analyzer_cls(detector=detector, **analyzer_kwargs)
+        if os.path.exists(analysis_path):
+            os.remove(analysis_path)
+        analyzer.run()
+        with open(digest_path, 'w') as f:
+            f.write(digest)
+    analysis = pd.read_csv(analysis_path)
+    analysis.insert(0, 'video', get_video_id(vid_path))
+    return analysis
+
+
+def detect_video(
+        vid_path: str,
+        video_cls: Type[AbstractVideo],
+        detector_cls: Type[AbstractMovementDetector],
+        detector_kwargs: dict,
+) -> Optional[AbstractMovementDetector]:
+    """Builds and saves the metadata of a single video.
+
+    Intended to prepare the metadata of videos in worker processes, see
+    :func:`analyze_video` for the arguments.
+
+    A digest of the video's content fingerprint and of the detector's
+    parameters is recorded next to the metadata. Existing metadata is reused
+    if its digest matches, and rebuilt if the video or the parameters
+    changed. Saving the metadata, e.g. from the review interface, removes
+    the digest, and metadata without a digest is reused. Metadata with
+    manually set frames is never rebuilt.
+
+    Returns
+    -------
+    AbstractMovementDetector or None
+        The detector that built the metadata, or None if the video already
+        had metadata.
+    """
+    meta_path = get_video_mapped_path(
+        vid_path=vid_path,
+        dir_suffix='meta',
+        file_extension='.csv',
+    )
+    digest = parameters_hash({
+        'fingerprint': video_fingerprint(vid_path=vid_path),
+        'parameters': parameters_digest(
+            detector_cls=detector_cls, detector_kwargs=detector_kwargs
+        ),
+    })
+    digest_path = meta_path.with_suffix('.params')
+    if os.path.exists(meta_path):
+        meta_digest = _read_digest(digest_path)
+        if meta_digest is None or meta_digest == digest:
+            return None
+        if _has_manual_set(meta_path):
+            # reviewed, the metadata is kept as it is from now on
+            os.remove(digest_path)
+            return None
+        os.remove(meta_path)
+    video = video_cls(file_path=vid_path)
+    detector = detector_cls(video=video, **detector_kwargs)
+    detector.run()
+    with open(digest_path, 'w') as f:
+        f.write(digest)
+    return detector
+
+
+def parameters_digest(
+        detector_cls: Type[AbstractMovementDetector],
+        detector_kwargs: dict,
+        analyzer_cls: Optional[Type[AbstractMetaAnalyzer]] = None,
+        analyzer_kwargs: Optional[dict] = None,
+) -> str:
+    """Computes a digest of the parameters of a job.
+
+    The digest identifies the classes and the keyword arguments that
+    determine the job's results. The arguments that only affect how the job
+    runs, i.e. the result cache, the result store and the checkpoint
+    interval, are ignored.
+
+    Parameters
+    ----------
+    detector_cls : type
+        The detector class.
+    detector_kwargs : dict
+        The keyword arguments of the detector, except for the video.
+    analyzer_cls : type, optional
+        The analyzer class.
+    analyzer_kwargs : dict, optional
+        The keyword arguments of the analyzer, except for the detector.
+
+    Returns
+    -------
+    str
+    """
+    parameters = {
+        'detector': detector_cls.__name__,
+        'detector_kwargs': _result_kwargs(detector_kwargs),
+    }
+    if analyzer_cls is not None:
+        parameters.update({
+            'analyzer': analyzer_cls.__name__,
+            'analyzer_kwargs': _result_kwargs(analyzer_kwargs or {}),
+        })
+    return parameters_hash(parameters)
+
+
+def _result_kwargs(kwargs: dict) -> dict:
+    return {
+        key: value for key, value in kwargs.items()
+        if key not in _RESOURCE_KWARGS
+    }
+
+
+def _read_digest(path) -> Optional[str]:
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def _has_manual_set(meta_path) -> bool:
+    manual_set = pd.read_csv(meta_path, usecols=['manual_set'])['manual_set']
+    return bool(manual_set.fillna(False).astype(bool).any())
+
+
+def _is_up_to_date(path, source_path) -> bool:
+    if not os.path.exists(path):
+        return False
+    return os.path.getmtime(path) >= os.path.getmtime(source_path)
+
+
+class MemoryBudget:
+    """Limits the jobs running at once to a memory budget.
+
+    A job is admitted if the memory estimates of the running jobs plus its
+    own fit in the budget. A job is always admitted when nothing is running,
+    so that videos larger than the budget are still processed, one at a
+    time.
+
+    Parameters
+    ----------
+    budget : int, optional
+        The memory budget in bytes. If None, all jobs are admitted.
+    """
+
+    def __init__(self, budget: Optional[int] = None):
+        self.budget = budget
+        self.reserved = 0
+        self._running = 0
+
+    def admits(self, estimate: int) -> bool:
+        """Returns True if a job with the given estimate can start.
+
+        Parameters
+        ----------
+        estimate : int
+            The memory estimate of the job in bytes.
+
+        Returns
+        -------
+        bool
+        """
+        return (
+            self.budget is None
+            or self._running == 0
+            or self.reserved + estimate <= self.budget
+        )
+
+    def reserve(self, estimate: int):
+        """Record the start of a job."""
+        self.reserved += estimate
+        self._running += 1
+
+    def release(self, estimate: int):
+        """Record the end of a job."""
+        self.reserved -= estimate
+        self._running -= 1
+
+
+def estimate_memory(
+        video: AbstractVideo,
+        buffer_depth: int = 4,
+        base_memory: int = WORKER_BASE_MEMORY,
+) -> int:
+    """Estimates the memory needed to detect movement in a video.
+
+    The estimate covers the memory of the worker process itself,
+    `buffer_depth` decoded frames held at once by the decoder and the
+    detector, plus the metadata and the detector's working arrays, which hold
+    a few 8-byte values per frame.
+
+    Parameters
+    ----------
+    video : AbstractVideo
+        The video.
+    buffer_depth : int, default 4
+        The number of decoded frames held in memory at once.
+    base_memory : int, default WORKER_BASE_MEMORY
+        The resident memory of a worker process before it processes the
+        video, in bytes. Can be calibrated with the `peak_memory` recorded
+        in the manifest for small videos.
+
+    Returns
+    -------
+    int
+        The estimate in bytes.
+    """
+    frame_bytes = int(np.prod(video.frame_shape))
+    meta_bytes = len(video) * 8 * (
+        len(AbstractMovementDetector._default_cols) + 4  # + working arrays
+    )
+    return base_memory + frame_bytes * buffer_depth + meta_bytes
+
+
+def reset_peak_memory():
+    """Resets the peak resident memory of the current process, if supported.
+
+    Only supported on Linux. Elsewhere, the peak is the process's lifetime
+    peak, which includes the previous jobs run by a pool worker.
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+
+def peak_memory() -> Optional[int]:
+    """Returns the peak resident memory of the current process in bytes.
+
+    Returns
+    -------
+    int or None
+        The peak memory, or None if it cannot be measured on this platform.
+    """
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':  # bytes on macOS, kilobytes elsewhere
+        return max_rss
+    return max_rss * 1024
@@ -0,0 +1,278 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+import uuid
+from pathlib import Path
+from typing import Callable, Optional, List
+
+from movement_detector.leases import file_lock
+from movement_detector.utils import get_project_path
+
+
+def video_fingerprint(
+        vid_path: Path,
+        sample_count: int = 8,
+        sample_size: int = 2 ** 16,
+) -> str:
+    """Computes a fast content fingerprint of a video file.
+
+    The fingerprint combines the size of the file with a hash of
+    `sample_count` evenly spaced byte ranges of `sample_size` bytes. It is
+    independent of the file's name and location, so renaming or moving a video
+    does not change it.
+
+    Parameters
+    ----------
+    vid_path : Path
+        The path to the video file.
+    sample_count : int, default 8
+        The number of byte ranges to hash.
+    sample_size : int, default 65536
+        The size of each byte range.
+
+    Returns
+    -------
+    fingerprint : str
+    """
+    file_size = os.path.getsize(vid_path)
+    hasher = hashlib.sha1()
+    with open(vid_path, 'rb') as f:
+        if file_size <= sample_count * sample_size:
+            hasher.update(f.read())
+        else:
+            step = (file_size - sample_size) // (sample_count - 1)
+            for i in range(sample_count):
+                f.seek(i * step)
+                hasher.update(f.read(sample_size))
+    fingerprint = f'{file_size:x}-{hasher.hexdigest()}'
+    return fingerprint
+
+
+def parameters_hash(parameters: dict) -> str:
+    """Computes a canonical hash of a parameters dictionary.
+
+    The keys are sorted before hashing, so the order in which the parameters
+    were declared does not matter. Callables are represented by their
+    qualified name and, for lambdas and locally defined functions, by their
+    byte-code.
+
+    Parameters
+    ----------
+    parameters : dict
+        The parameters to hash.
+
+    Returns
+    -------
+    str
+    """
+    canonical = json.dumps(parameters, sort_keys=True, default=_canonical)
+    return hashlib.sha1(canonical.encode()).hexdigest()
+
+
+def _canonical(value):
+    if hasattr(value, 'item'):  # numpy scalars
+        return value.item()
+    if hasattr(value, 'tolist'):  # numpy arrays
+        return value.tolist()
+    if callable(value):
+        name = (f'{getattr(value, "__module__", "")}.'
+                f'{getattr(value, "__qualname__", repr(value))}')
+        code = getattr(value, '__code__', None)
+        if code is not None and ('<' in name):
+            code_hash = hashlib.sha1(
+                code.co_code + repr(code.co_consts).encode()
+                + repr(code.co_names).encode()
+            ).hexdigest()
+            name = f'{name}:{code_hash}'
+        return name
+    return repr(value)
+
+
+class ResultCache:
+    """Content-addressed cache for detector and analyzer results.
+
+    Results are keyed by the fingerprint of the video's content combined
+    with a canonical hash of the parameters that produced them, so renaming a
+    video keeps its results, while changing a parameter never returns stale
+    output. Any number of entries can coexist for the same video.
+
+    The entries are stored as files in the cache directory and are tracked by
+    an index file. When the total size of the entries exceeds `max_bytes`,
+    the least recently used entries are evicted.
+
+    The cache can be shared by several processes. The index is re-read and
+    updated under a lock, see :func:`movement_detector.leases.file_lock`,
+    and the files are replaced atomically.
+
+    Parameters
+    ----------
+    cache_dir : Path, optional
+        The cache directory. Defaults to the `cache` folder in the project's
+        root directory.
+    max_bytes : int, default 2 GiB
+        The disk budget of the cache.
+    """
+
+    _index_name = 'index.json'
+
+    def __init__(
+            self,
+            cache_dir: Optional[Path] = None,
+            max_bytes: int = 2 * 2 ** 30,
+    ):
+        if cache_dir is None:
+            cache_dir = get_project_path() / 'cache'
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._index_path = self.cache_dir / self._index_name
+        self._index = None
+
+    @staticmethod
+    def key(fingerprint: str, parameters: dict) -> str:
+        """Returns the cache key for the given video and parameters.
+
+        Parameters
+        ----------
+        fingerprint : str
+            The video fingerprint, see :func:`video_fingerprint`.
+        parameters : dict
+            The parameters that produced the result.
+
+        Returns
+        -------
+        str
+        """
+        return f'{fingerprint}-{parameters_hash(parameters)}'
+
+    def get(self, fingerprint: str, parameters: dict) -> Optional[Path]:
+        """Returns the path to the cached result, if any.
+
+        Parameters
+        ----------
+        fingerprint : str
+            The video fingerprint.
+        parameters : dict
+            The parameters that produced the result.
+
+        Returns
+        -------
+        Path or None
+            The path to the cached file, or None on a cache miss.
+        """
+        index = self._load_index()
+        key = self.key(fingerprint=fingerprint, parameters=parameters)
+        entry = index.get(key)
+        if entry is None or not os.path.exists(self.cache_dir / entry['file']):
+            self.misses += 1
+            return None
+
+        def touch(index):
+            if key in index:
+                index[key]['last_access'] = time.time()
+
+        self._update_index(touch)
+        self.hits += 1
+        return self.cache_dir / entry['file']
+
+    def put(self, fingerprint: str, parameters: dict, file_path: Path):
+        """Copies a result file into the cache.
+
+        An existing entry with the same key is replaced.
+
+        Parameters
+        ----------
+        fingerprint : str
+            The video fingerprint.
+        parameters : dict
+            The parameters that produced the result.
+        file_path : Path
+            The result file to store.
+        """
+        if not os.path.exists(self.cache_dir):
+            os.makedirs(self.cache_dir, exist_ok=True)
+        key = self.key(fingerprint=fingerprint, parameters=parameters)
+        file_name = f'{key}{Path(file_path).suffix}'
+        tmp_path = self.cache_dir / f'{file_name}.{uuid.uuid4().hex}.tmp'
+        shutil.copyfile(file_path, tmp_path)
+        os.replace(tmp_path, self.cache_dir / file_name)
+        entry = {
+            'fingerprint': fingerprint,
+            'parameters': json.loads(
+                json.dumps(parameters, default=_canonical)
+            ),
+            'file': file_name,
+            'size': os.path.getsize(self.cache_dir / file_name),
+            'last_access': time.time(),
+        }
+
+        def add(index):
+            index[key] = entry
+            self._evict(keep=key)
+
+        self._update_index(add)
+
+    def entries(self, fingerprint: str) -> List[dict]:
+        """Returns the index entries for all results of a video.
+
+        Parameters
+        ----------
+        fingerprint : str
+            The video fingerprint.
+
+        Returns
+        -------
+        list of dict
+        """
+        index = self._load_index()
+        return [
+            entry for entry in index.values()
+            if entry['fingerprint'] == fingerprint
+        ]
+
+    @property
+    def total_size(self) -> int:
+        """The combined size in bytes of all cached entries."""
+        return sum(entry['size'] for entry in self._load_index().values())
+
+    def _evict(self, keep: str):
+        index = self._index
+        total_size = sum(entry['size'] for entry in index.values())
+        lru_keys = sorted(index, key=lambda k: index[k]['last_access'])
+        for key in lru_keys:
+            if total_size <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            entry = index.pop(key)
+            total_size -= entry['size']
+            file_path = self.cache_dir / entry['file']
+            if os.path.exists(file_path):
+                os.remove(file_path)
+
+    def _load_index(self) -> dict:
+        if not os.path.exists(self.cache_dir):
+            os.makedirs(self.cache_dir, exist_ok=True)
+        if os.path.exists(self._index_path):
+            with open(self._index_path) as f:
+                self._index = json.load(f)
+        else:
+            self._index = {}
+        return self._index
+
+    def _update_index(self, update: Callable[[dict], None]):
+        """Applies an update to the current index and saves it."""
+        with file_lock(path=f'{self._index_path}.lock'):
+            update(self._load_index())
+            self._save_index()
+
+    def _save_index(self):
+        tmp_path = self._index_path.with_name(
+            f'{self._index_name}.{uuid.uuid4().hex}.tmp'
+        )
+        with open(tmp_path, 'w') as f:
+            json.dump(self._index, f)
+        os.replace(tmp_path, self._index_path)
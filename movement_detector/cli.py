@@ -0,0 +1,609 @@
+"""Headless batch processing of the videos folder.
+
+Runs the detection and the analysis of all the videos in a process pool,
+without the review interface::
+
+    python -m movement_detector.cli --max-workers 16
+
+The progress is recorded in a manifest file, so that an interrupted run
+resumes where it stopped. The throughput of each video and of the run is
+appended to a JSON lines report, and can also be exported to a Prometheus
+textfile with `--textfile`.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import uuid
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+from movement_detector.analysis import IntervalAggregatorMA, freezing_ratio
+from movement_detector.batch import (
+    analyze_video, detect_video, estimate_memory, MemoryBudget,
+    parameters_digest, peak_memory, reset_peak_memory,
+)
+from movement_detector.detectors import PixelChangeFD
+from movement_detector.leases import Lease, file_lock
+from movement_detector.telemetry import RunReport
+from movement_detector.utils import (
+    get_project_path, get_video_id, get_video_paths, parse_settings
+)
+from movement_detector.video import CvVideo
+
+
+def get_detector_kwargs(settings: dict) -> dict:
+    """Returns the :class:`PixelChangeFD` arguments defined in the settings.
+
+    Parameters
+    ----------
+    settings : dict
+        The settings, as returned by :func:`parse_settings`.
+
+    Returns
+    -------
+    dict
+    """
+    return {
+        'outlier_change_threshold': settings.get(
+            'outlier_change_threshold', .5
+        ),
+        'flag_outliers_buffer': settings.get('flag_outliers_buffer', 5),
+        'movement_threshold': settings.get('movement_threshold', .1),
+        'freezing_buffer': settings.get('freezing_buffer', 5),
+        'blur_ksize': settings.get('blur_ksize', 3),
+        'checkpoint_interval': settings.get('checkpoint_interval'),
+    }
+
+
+def get_analyzer_kwargs(settings: dict) -> dict:
+    """Returns the :class:`IntervalAggregatorMA` arguments defined in the
+    settings.
+
+    The analysis computes the ratio of freezing frames in each interval.
+
+    Parameters
+    ----------
+    settings : dict
+        The settings, as returned by :func:`parse_settings`.
+
+    Returns
+    -------
+    dict
+    """
+    return {
+        'intervals': settings['intervals'],
+        'aggregation': freezing_ratio,
+        'include_start': settings.get('include_start', 1),
+        'include_end': settings.get('include_end', 1),
+    }
+
+
+class JobReport(NamedTuple):
+    """The outcome of :func:`process_video`."""
+
+    #: The processing time in seconds.
+    duration: float
+    #: The peak resident memory of the worker in bytes, if measurable.
+    peak_memory: Optional[int]
+    #: The time spent building the metadata in seconds.
+    detection_time: float = 0.
+    #: The time spent analyzing the metadata in seconds.
+    analysis_time: float = 0.
+    #: The number of frames decoded, zero if the metadata was reused.
+    frames: int = 0
+    #: The size of the decoded frames in bytes.
+    bytes_decoded: int = 0
+    #: Set to True if existing metadata was reused.
+    meta_reused: bool = False
+
+
+class JobManifest:
+    """Record of the videos processed by previous batch runs.
+
+    A video is considered done if it was processed successfully, with the
+    same parameters, and its file has not changed since. The manifest is
+    written atomically after each update, so it stays valid if the run is
+    interrupted.
+
+    Each update re-reads the manifest and merges the updated video into it,
+    so that runners sharing the manifest keep each other's records. If
+    `shared` is True, the updates are serialized with a :class:`Lease` on
+    the manifest.
+
+    Parameters
+    ----------
+    path : Path
+        The path to the manifest's JSON file.
+    parameters : str, optional
+        The digest of the parameters of the jobs, see
+        :func:`movement_detector.batch.parameters_digest`. It is recorded
+        with each video, and videos processed with other parameters are not
+        done.
+    shared : bool, default False
+        Set to True when several runners, e.g. on different machines, update
+        the manifest.
+    """
+
+    def __init__(self, path: Path, parameters: str = '', shared: bool = False):
+        self.path = Path(path)
+        self.parameters = parameters
+        self.shared = shared
+        self._jobs = self._read()
+
+    def is_done(self, vid_path: Path) -> bool:
+        """Returns True if the video was processed with the same parameters
+        and has not changed since.
+
+        Parameters
+        ----------
+        vid_path : Path
+            The path to the video.
+
+        Returns
+        -------
+        bool
+        """
+        job = self._jobs.get(get_video_id(vid_path))
+        return (
+            job is not None
+            and job['status'] == 'done'
+            and job.get('parameters') == self.parameters
+            and job['file'] == self._file_state(vid_path)
+        )
+
+    def mark_done(
+            self,
+            vid_path: Path,
+            duration: float,
+            peak_memory: Optional[int] = None,
+    ):
+        """Record that the video was processed successfully.
+
+        Parameters
+        ----------
+        vid_path : Path
+            The path to the video.
+        duration : float
+            The processing time in seconds.
+        peak_memory : int, optional
+            The peak resident memory of the job in bytes.
+        """
+        self._update(
+            vid_path=vid_path,
+            status='done',
+            duration=duration,
+            peak_memory=peak_memory,
+        )
+
+    def mark_failed(self, vid_path: Path, error: str):
+        """Record that the processing of the video failed.
+
+        Failed videos are processed again by the next run.
+
+        Parameters
+        ----------
+        vid_path : Path
+            The path to the video.
+        error : str
+            The description of the error.
+        """
+        self._update(vid_path=vid_path, status='failed', error=error)
+
+    def _update(self, vid_path: Path, status: str, **details):
+        job = dict(
+            status=status,
+            file=self._file_state(vid_path),
+            parameters=self.parameters,
+            finished=time.time(),
+            **details
+        )
+        parent = self.path.parent
+        if not os.path.exists(parent):
+            os.makedirs(parent, exist_ok=True)
+        with self._locked():
+            jobs = self._read()
+            jobs[get_video_id(vid_path)] = job
+            tmp_path = self.path.with_name(
+                f'{self.path.name}.{uuid.uuid4().hex}.tmp'
+            )
+            with open(tmp_path, 'w') as f:
+                json.dump(jobs, f, indent=1)
+            os.replace(tmp_path, self.path)
+        self._jobs = jobs
+
+    def _read(self) -> dict:
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    @contextmanager
+    def _locked(self):
+        if not self.shared:
+            yield
+            return
+        with file_lock(path=f'{self.path}.lock'):
+            yield
+
+    @staticmethod
+    def _file_state(vid_path: Path) -> list:
+        stat = os.stat(vid_path)
+        return [stat.st_size, stat.st_mtime]
+
+
+def process_video(
+        vid_path: str,
+        detector_kwargs: dict,
+        analyzer_kwargs: dict,
+        shared: bool = False,
+) -> Optional[JobReport]:
+    """Runs the detection and the analysis of a single video.
+
+    Existing metadata is reused, and the analysis is only redone if it is
+    older than the metadata.
+
+    If `shared` is True, the video is first claimed with a :class:`Lease`,
+    so that runners on other machines sharing the project folder skip it.
+
+    Returns
+    -------
+    JobReport or None
+        The processing times, throughput and peak memory, or None if the
+        video is claimed by another runner.
+    """
+    lease = Lease(vid_path=vid_path) if shared else None
+    if lease is not None and not lease.acquire():
+        return None
+    try:
+        reset_peak_memory()
+        start = time.perf_counter()
+        detector = detect_video(
+            vid_path, CvVideo, PixelChangeFD, detector_kwargs
+        )
+        detected = time.perf_counter()
+        analyze_video(
+            vid_path, CvVideo, PixelChangeFD, detector_kwargs,
+            IntervalAggregatorMA, analyzer_kwargs,
+        )
+        end = time.perf_counter()
+        frames = bytes_decoded = 0
+        if detector is not None:
+            frames = len(detector.video)
+            bytes_decoded = frames * int(np.prod(detector.video.frame_shape))
+        return JobReport(
+            duration=end - start,
+            peak_memory=peak_memory(),
+            detection_time=detected - start,
+            analysis_time=end - detected,
+            frames=frames,
+            bytes_decoded=bytes_decoded,
+            meta_reused=detector is None,
+        )
+    finally:
+        if lease is not None:
+            lease.release()
+
+
+class VideoProbe(NamedTuple):
+    """The properties of a video used to schedule its job."""
+
+    #: The duration in seconds, zero if it cannot be probed.
+    duration: float
+    #: The memory estimate in bytes, zero if it cannot be probed.
+    memory_estimate: int
+
+
+def probe_videos(vid_paths: Sequence[str]) -> Dict[str, VideoProbe]:
+    """Reads the header of each video once.
+
+    See :func:`estimate_memory` for the memory estimates.
+
+    Parameters
+    ----------
+    vid_paths : list of str
+        The videos.
+
+    Returns
+    -------
+    dict
+        The probes, keyed by video path.
+    """
+    probes = {}
+    for vid_path in vid_paths:
+        try:
+            video = CvVideo(file_path=vid_path)
+            duration = video.vid_duration
+            probes[vid_path] = VideoProbe(
+                duration=duration if np.isfinite(duration) else 0.,
+                memory_estimate=estimate_memory(video),
+            )
+        except Exception:
+            probes[vid_path] = VideoProbe(duration=0., memory_estimate=0)
+    return probes
+
+
+def memory_estimates(
+        vid_paths: Sequence[str],
+        probes: Optional[Dict[str, VideoProbe]] = None,
+) -> Dict[str, int]:
+    """Estimates the memory needed to process each video.
+
+    See :func:`estimate_memory`. Videos that cannot be probed are estimated
+    at zero bytes.
+
+    Parameters
+    ----------
+    vid_paths : list of str
+        The videos.
+    probes : dict, optional
+        The probes of the videos, as returned by :func:`probe_videos`. The
+        videos are probed if not set.
+
+    Returns
+    -------
+    dict
+        The estimates in bytes, keyed by video path.
+    """
+    if probes is None:
+        probes = probe_videos(vid_paths=vid_paths)
+    return {
+        vid_path: probes[vid_path].memory_estimate for vid_path in vid_paths
+    }
+
+
+def schedule_videos(
+        vid_paths: Sequence[str],
+        probes: Optional[Dict[str, VideoProbe]] = None,
+) -> List[str]:
+    """Orders the videos from the longest to the shortest.
+
+    Processing the longest videos first keeps a single long video from
+    running alone at the end of the batch. The duration is probed from the
+    video's header, and the file size is used for ties and for videos that
+    cannot be probed.
+
+    Parameters
+    ----------
+    vid_paths : list of str
+        The videos to order.
+    probes : dict, optional
+        The probes of the videos, as returned by :func:`probe_videos`. The
+        videos are probed if not set.
+
+    Returns
+    -------
+    list of str
+    """
+    if probes is None:
+        probes = probe_videos(vid_paths=vid_paths)
+
+    def size(vid_path):
+        return probes[vid_path].duration, os.path.getsize(vid_path)
+
+    return sorted(vid_paths, key=size, reverse=True)
+
+
+def run_batch(
+        settings: dict,
+        manifest_path: Path,
+        vid_paths: Optional[Sequence[str]] = None,
+        max_workers: Optional[int] = None,
+        shared: bool = False,
+        memory_budget: Optional[int] = None,
+        report: Optional[RunReport] = None,
+) -> Dict[str, str]:
+    """Processes the videos that are not done according to the manifest.
+
+    Parameters
+    ----------
+    settings : dict
+        The settings, as returned by :func:`parse_settings`.
+    manifest_path : Path
+        The path to the job manifest.
+    vid_paths : list of str, optional
+        The videos to process. Defaults to all the videos in the videos
+        folder.
+    max_workers : int, optional
+        The number of worker processes. Defaults to the number of
+        processors. If 1, the videos are processed in the current process.
+    shared : bool, default False
+        Set to True when several runners, e.g. on different machines, process
+        the same project folder. Each video is then claimed with a
+        :class:`Lease` before being processed.
+    memory_budget : int, optional
+        The memory in bytes that the jobs running at once may use, according
+        to their estimates, see :class:`MemoryBudget`. By default, the number
+        of jobs is only limited by `max_workers`.
+    report : RunReport, optional
+        The report to which the metrics of each processed video are
+        appended.
+
+    Returns
+    -------
+    dict
+        The status of each video, keyed by video identifier: "done",
+        "failed", or "claimed" if it was being processed by another runner.
+        Claimed videos are not recorded in the manifest.
+    """
+    if vid_paths is None:
+        vid_paths = get_video_paths()
+    detector_kwargs = get_detector_kwargs(settings=settings)
+    analyzer_kwargs = get_analyzer_kwargs(settings=settings)
+    manifest = JobManifest(
+        path=manifest_path,
+        parameters=parameters_digest(
+            detector_cls=PixelChangeFD,
+            detector_kwargs=detector_kwargs,
+            analyzer_cls=IntervalAggregatorMA,
+            analyzer_kwargs=analyzer_kwargs,
+        ),
+        shared=shared,
+    )
+    pending = [p for p in vid_paths if not manifest.is_done(vid_path=p)]
+    probes = probe_videos(vid_paths=pending)
+    pending = schedule_videos(vid_paths=pending, probes=probes)
+    skipped = len(vid_paths) - len(pending)
+    if skipped:
+        print(f'Skipping {skipped} videos processed by a previous run.')
+    statuses = {}
+
+    def record(vid_path, job=None, error=None):
+        video_id = get_video_id(vid_path)
+        if error is None and job is None:
+            statuses[video_id] = 'claimed'
+            message = 'claimed by another runner'
+        elif error is None:
+            manifest.mark_done(
+                vid_path=vid_path,
+                duration=job.duration,
+                peak_memory=job.peak_memory,
+            )
+            statuses[video_id] = 'done'
+            message = f'done in {job.duration:.1f}s'
+            if job.peak_memory is not None:
+                message += f', peak memory {job.peak_memory / 2**20:.0f}MiB'
+        else:
+            manifest.mark_failed(vid_path=vid_path, error=error)
+            statuses[video_id] = 'failed'
+            message = f'failed: {error}'
+        print(f'[{len(statuses)}/{len(pending)}] {video_id} {message}')
+        if report is not None:
+            metrics = {} if job is None else job._asdict()
+            if error is not None:
+                metrics['error'] = error
+            report.record(
+                video_id=video_id, status=statuses[video_id], **metrics
+            )
+
+    if max_workers == 1:
+        for vid_path in pending:
+            try:
+                job = process_video(
+                    vid_path, detector_kwargs, analyzer_kwargs, shared
+                )
+            except Exception as e:
+                record(vid_path=vid_path, error=repr(e))
+            else:
+                record(vid_path=vid_path, job=job)
+        return statuses
+
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    budget = MemoryBudget(budget=memory_budget)
+    estimates = {}
+    if memory_budget is not None:
+        estimates = memory_estimates(vid_paths=pending, probes=probes)
+    queue = list(pending)
+    running = {}
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        while queue or running:
+            # start the largest videos that fit in the budget
+            i = 0
+            while i < len(queue) and len(running) < max_workers:
+                estimate = estimates.get(queue[i], 0)
+                if budget.admits(estimate=estimate):
+                    vid_path = queue.pop(i)
+                    budget.reserve(estimate=estimate)
+                    job = executor.submit(
+                        process_video,
+                        vid_path, detector_kwargs, analyzer_kwargs, shared,
+                    )
+                    running[job] = vid_path
+                else:
+                    i += 1
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for job in done:
+                vid_path = running.pop(job)
+                budget.release(estimate=estimates.get(vid_path, 0))
+                error = job.exception()
+                if error is None:
+                    record(vid_path=vid_path, job=job.result())
+                else:
+                    record(vid_path=vid_path, error=repr(error))
+    return statuses
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description='Detect freezing in all the videos of the videos folder '
+                    'and analyze the results, without the review interface.'
+    )
+    parser.add_argument(
+        '--settings', type=Path, default=None,
+        help='The settings file. Defaults to the project\'s settings.txt.',
+    )
+    parser.add_argument(
+        '--manifest', type=Path, default=None,
+        help='The job manifest used to resume interrupted runs. Defaults to '
+             'manifest.json in the project folder.',
+    )
+    parser.add_argument(
+        '--max-workers', type=int, default=None,
+        help='The number of worker processes. Defaults to the number of '
+             'processors.',
+    )
+    parser.add_argument(
+        '--shared', action='store_true',
+        help='Claim each video with a lease file before processing it, so '
+             'that several machines can process the same project folder.',
+    )
+    parser.add_argument(
+        '--memory-budget', type=float, default=None,
+        help='The memory in GiB that the videos processed at once may use, '
+             'according to their estimated needs.',
+    )
+    parser.add_argument(
+        '--report', type=Path, default=None,
+        help='The JSON lines file to which the metrics of the run are '
+             'appended. Defaults to batch_report.jsonl in the project '
+             'folder.',
+    )
+    parser.add_argument(
+        '--textfile', type=Path, default=None,
+        help='Also write the metrics of the run to this Prometheus textfile, '
+             'e.g. in the directory of a node exporter\'s textfile '
+             'collector.',
+    )
+    parser.add_argument(
+        '--restart', action='store_true',
+        help='Ignore the manifest and check all the videos again. Existing '
+             'metadata is kept.',
+    )
+    args = parser.parse_args(argv)
+
+    manifest_path = args.manifest
+    if manifest_path is None:
+        manifest_path = get_project_path() / 'manifest.json'
+    if args.restart and os.path.exists(manifest_path):
+        os.remove(manifest_path)
+    report_path = args.report
+    if report_path is None:
+        report_path = get_project_path() / 'batch_report.jsonl'
+    with RunReport(path=report_path, textfile_path=args.textfile) as report:
+        statuses = run_batch(
+            settings=parse_settings(settings_path=args.settings),
+            manifest_path=manifest_path,
+            max_workers=args.max_workers,
+            shared=args.shared,
+            memory_budget=(
+                None if args.memory_budget is None
+                else int(args.memory_budget * 2 ** 30)
+            ),
+            report=report,
+        )
+    failed = sum(status == 'failed' for status in statuses.values())
+    if failed:
+        print(f'{failed} videos failed, see {manifest_path}.')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
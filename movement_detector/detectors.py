@@ -1,7 +1,14 @@
+import asyncio
+import hashlib
+import json
 import os
+import queue
+import shutil
+import threading
 from abc import ABC, abstractmethod
+from concurrent.futures import Executor, Future
 from pathlib import Path
-from typing import Union, Any, Optional, Tuple
+from typing import Union, Any, Optional, Tuple, Callable, NamedTuple
 import time
 
 import numpy as np
@@ -9,9 +16,32 @@ import pandas as pd
 import cv2
 from scipy import stats
 
-from movement_detector.utils import get_video_mapped_path
+from movement_detector.cache import ResultCache
+from movement_detector.np_utils import run_lengths
+from movement_detector.profiling import StageProfile, DISABLED_PROFILE
+from movement_detector.store import SQLiteResultStore
+from movement_detector.utils import get_video_mapped_path, get_video_id
 from movement_detector.video import AbstractVideo
 
+try:
+    _get_running_loop = asyncio.get_running_loop
+except AttributeError:  # Python 3.6
+    _get_running_loop = asyncio.get_event_loop
+
+
+class Progress(NamedTuple):
+    """The progress of a detection, passed to the `run_async` callback."""
+
+    #: The number of frames processed.
+    frames_done: int
+    #: The number of frames in the video.
+    frame_count: int
+    #: The processing rate in frames per second.
+    fps: float
+    #: The estimated time to completion in seconds, None until a frame is
+    #: processed.
+    eta: Optional[float]
+
 
 class AbstractMovementDetector(ABC):
     """Abstract class for all movement detectors.
@@ -39,6 +69,17 @@ class AbstractMovementDetector(ABC):
     ----------
     video : AbstractVideo
         The video object.
+    cache : ResultCache, optional
+        If set, the metadata is looked up in and saved to the cache, keyed by
+        the video's content and the detector's parameters, in addition to
+        the video-mapped `meta_path`.
+    store : SQLiteResultStore, optional
+        If set, the metadata is also written to the store when saved.
+    checkpoint_interval : int, optional
+        If set, the state of the detection is saved to `checkpoint_path`
+        every `checkpoint_interval` frames, and when it is cancelled. An
+        interrupted detection then resumes from the last checkpoint, with the
+        same result as an uninterrupted one.
     """
 
     _default_cols = (
@@ -49,15 +90,35 @@ class AbstractMovementDetector(ABC):
         'manual_set',
     )
 
+    #: The number of finalized frames passed to the listeners at a time.
+    chunk_size = 250
+
     def __init__(
             self,
             video: AbstractVideo,
+            cache: Optional[ResultCache] = None,
+            store: Optional[SQLiteResultStore] = None,
+            checkpoint_interval: Optional[int] = None,
     ):
         self._video = video
+        self.cache = cache
+        self.store = store
+        self.checkpoint_interval = checkpoint_interval
         self._meta_path = None
         self.meta_fields = self._default_cols
         self.meta_fields += self._additional_columns
         self._meta_built = False
+        self._listeners = []
+        self._segment_starts = None
+        self._segment_values = None
+        self._change_ratio_cumsum = None
+        self._meta_version = 0
+        self._meta_lock = threading.RLock()
+        self._profile = DISABLED_PROFILE
+        self._save_profile = False
+        self._cancel_requested = threading.Event()
+        self._cancelled = False
+        self._frames_done = 0
 
     @property
     def video(self) -> AbstractVideo:
@@ -69,6 +130,11 @@ class AbstractMovementDetector(ABC):
         """Set to True if the metadata has been built."""
         return self._meta_built
 
+    @property
+    def meta_version(self) -> int:
+        """A counter incremented whenever the metadata changes."""
+        return self._meta_version
+
     @property
     def meta_path(self) -> Path:
         """Path to metadata file."""
@@ -80,6 +146,63 @@ class AbstractMovementDetector(ABC):
             )
         return self._meta_path
 
+    @property
+    def checkpoint_path(self) -> Path:
+        """Path to the checkpoint file, beside the metadata file."""
+        return self.meta_path.with_suffix('.checkpoint.npz')
+
+    @property
+    def digest_path(self) -> Path:
+        """Path to the digest of the video and parameters that built the
+        metadata, beside the metadata file.
+
+        The digest is written by :func:`movement_detector.batch.detect_video`
+        and removed whenever the metadata is saved.
+        """
+        return self.meta_path.with_suffix('.params')
+
+    @property
+    def cancelled(self) -> bool:
+        """Set to True if the last detection was stopped with `cancel`."""
+        return self._cancelled
+
+    @property
+    def profile(self) -> Optional[StageProfile]:
+        """The stage timings of the last metadata build.
+
+        Set to None unless profiling was enabled with `enable_profiling`.
+        """
+        return self._profile if self._profile.enabled else None
+
+    @property
+    def profile_path(self) -> Path:
+        """Path to the profile file, beside the metadata file."""
+        return self.meta_path.with_suffix('.profile.json')
+
+    def enable_profiling(self, save: bool = False):
+        """Record the time spent in each stage of the metadata build.
+
+        The timings are available from `profile` once the metadata is built.
+        Profiling is disabled by default and then adds no overhead.
+
+        Parameters
+        ----------
+        save : bool, default False
+            If True, the timings are also written to `profile_path` when the
+            metadata is built.
+        """
+        self._profile = StageProfile()
+        self._save_profile = save
+
+    @property
+    def parameters(self) -> dict:
+        """The parameters that determine the detector's output.
+
+        Used to key the detector's results in a :class:`ResultCache`.
+        Subclasses must extend the dictionary with their own parameters.
+        """
+        return {'detector': type(self).__name__}
+
     @property
     def _additional_columns(self) -> Tuple[str]:
         """Additional meta-data columns to add to the default set.
@@ -90,18 +213,174 @@ class AbstractMovementDetector(ABC):
 
     @abstractmethod
     def _build_meta(self):
-        """Overwrite this method to define the metadata generation process."""
+        """Overwrite this method to define the metadata generation process.
+
+        The method must count the processed frames in `_frames_done`, and
+        stop early, setting `_cancelled` to True, once `_cancel_requested` is
+        set.
+        """
         pass
 
     def run(self):
-        """Process the video and extract the meta-data."""
-        if os.path.exists(self.meta_path):
-            self._load_meta()
-        else:
-            self._create_empty_meta()
-            self._build_meta()
-            self.save_meta()
-        self._meta_built = True
+        """Process the video and extract the meta-data.
+
+        If the detector has a cache, the metadata is retrieved from it when
+        available, regardless of the video's location. Otherwise, existing
+        metadata at `meta_path` is loaded, and added to the cache. The
+        metadata is only built if neither is available.
+        """
+        self._start_run()
+        build = self._load_or_create_meta()
+        self._complete_run(build=build)
+
+    def run_in_background(self) -> Future:
+        """Process the video on a background thread.
+
+        Existing metadata is loaded before returning, as in `run`. Otherwise,
+        the metadata is created with missing values, which are filled in
+        chunks as the frames are processed, so that it can be read with
+        `meta` and manually set while the detection is running. Frames set
+        manually in the meantime keep their values.
+
+        The video must not be read by other threads until the detection is
+        complete, and the listeners are called from the background thread.
+        The detection can be stopped with `cancel`.
+
+        Returns
+        -------
+        concurrent.futures.Future
+            The future of the detection. Its `result` waits for the metadata
+            to be built, and raises the exception of the detection if it
+            failed, in which case the metadata is not saved.
+        """
+        self._start_run()
+        build = self._load_or_create_meta()
+        future = Future()
+
+        def work():
+            if not future.set_running_or_notify_cancel():
+                return
+            try:
+                self._complete_run(build=build)
+            except BaseException as e:
+                future.set_exception(e)
+            else:
+                future.set_result(None)
+
+        threading.Thread(target=work, daemon=True).start()
+        return future
+
+    async def run_async(
+            self,
+            progress: Optional[Callable[[Progress], Any]] = None,
+            progress_interval: float = 1.,
+            executor: Optional[Executor] = None,
+    ) -> Progress:
+        """Process the video without blocking the event loop.
+
+        The detection runs in `executor`, and `progress` is called from the
+        event loop every `progress_interval` seconds, and once more when the
+        detection ends. Cancelling the awaiting task stops the detection, as
+        does `cancel`, see there for the partial results.
+
+        Parameters
+        ----------
+        progress : Callable, optional
+            A callable accepting a :class:`Progress`.
+        progress_interval : float, default 1
+            The time between progress events in seconds.
+        executor : concurrent.futures.Executor, optional
+            The executor running the detection. Must be a thread pool, since
+            the metadata is built in place. Defaults to the event loop's
+            default executor.
+
+        Returns
+        -------
+        Progress
+            The progress when the detection ended.
+
+        Examples
+        --------
+        >>> await detector.run_async(progress=print)  # doctest: +SKIP
+        """
+        self._start_run()
+        loop = _get_running_loop()
+        build = await loop.run_in_executor(executor, self._load_or_create_meta)
+        frame_count = len(self._metadata)
+        if not build:
+            self._frames_done = frame_count
+        start = time.monotonic()
+
+        def report() -> Progress:
+            frames_done = self._frames_done
+            elapsed = time.monotonic() - start
+            fps = frames_done / elapsed if elapsed > 0 else 0.
+            eta = (frame_count - frames_done) / fps if fps > 0 else None
+            event = Progress(
+                frames_done=frames_done,
+                frame_count=frame_count,
+                fps=fps,
+                eta=eta,
+            )
+            if progress is not None:
+                progress(event)
+            return event
+
+        run = loop.run_in_executor(executor, self._complete_run, build)
+        try:
+            while True:
+                done, _ = await asyncio.wait({run}, timeout=progress_interval)
+                if done:
+                    break
+                report()
+        except asyncio.CancelledError:
+            self.cancel()
+            await asyncio.wait({run})
+            raise
+        run.result()
+        return report()
+
+    def cancel(self):
+        """Stop the running detection at the next frame.
+
+        The frames processed so far keep their values in the metadata, which
+        can be read with `meta`, while the other frames are left empty. Fields
+        computed over the whole video, such as `outlier` and `flagged`, are
+        not computed. The partial metadata is not saved, and `cancelled` is
+        set to True. The next `run` starts over, unless checkpoints are
+        enabled with `checkpoint_interval`, in which case it resumes where the
+        detection was stopped.
+        """
+        self._cancel_requested.set()
+
+    def add_listener(self, listener: Callable[[pd.DataFrame], Any]):
+        """Register a callable that receives the metadata as it is built.
+
+        While the metadata is being built, the listener is called with
+        consecutive chunks of finalized frames, in order, as a Pandas
+        DataFrame indexed by frame. When the metadata is loaded from a file
+        instead, the listener receives all the frames in a single chunk.
+
+        Only the `time`, `moving` and detector-specific fields are final in
+        the chunks. Fields computed over the whole video, such as `outlier`
+        and `flagged`, are only available once `run()` returns.
+
+        Parameters
+        ----------
+        listener : Callable
+            A callable accepting a Pandas DataFrame.
+        """
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[pd.DataFrame], Any]):
+        """Unregister a listener added with `add_listener`.
+
+        Parameters
+        ----------
+        listener : Callable
+            The listener to remove.
+        """
+        self._listeners.remove(listener)
 
     def meta(
             self,
@@ -128,9 +407,57 @@ class AbstractMovementDetector(ABC):
         """
         if stop is None:
             stop = start + 1
-        if field is None:
-            field = self._metadata.columns
-        return self._metadata.iloc[start:stop][field]
+        with self._meta_lock:
+            if field is None:
+                field = self._metadata.columns
+            return self._metadata.iloc[start:stop][field]
+
+    def segments(self) -> pd.DataFrame:
+        """Returns the table of movement and freezing bouts.
+
+        Consecutive frames with the same `moving` value are grouped into a
+        single segment. The table is computed once from the metadata and is
+        then updated in place whenever a frame is manually set.
+
+        Each segment contains the following fields:
+
+        **start**: Index of the first frame of the segment.
+
+        **stop**: Index of the frame following the segment (exclusive).
+
+        **moving**: The `moving` value of the frames in the segment.
+
+        **start_time**: The timestamp of the first frame in seconds.
+
+        **duration**: The duration of the segment in seconds.
+
+        **change_ratio**: The mean `change_ratio` over the segment's frames,
+        if the detector produces that field.
+
+        The metadata must have been built.
+
+        Returns
+        -------
+        pandas DataFrame
+        """
+        if self._segment_starts is None:
+            self._build_segments()
+        starts = self._segment_starts
+        stops = np.append(starts[1:], len(self._metadata))
+        lengths = stops - starts
+        segments = pd.DataFrame({
+            'start': starts,
+            'stop': stops,
+            'moving': self._segment_values,
+            'start_time': self._metadata['time'].values[starts],
+            'duration': lengths / self.video.frame_rate,
+        })
+        if self._change_ratio_cumsum is not None:
+            cumsum = self._change_ratio_cumsum
+            segments['change_ratio'] = (
+                (cumsum[stops] - cumsum[starts]) / lengths
+            )
+        return segments
 
     def set_freezing(self, index: int):
         """Set metadata of specified frame to freezing.
@@ -144,7 +471,10 @@ class AbstractMovementDetector(ABC):
         """
         col_names = ['moving', 'manual_set', 'flagged']
         col_vals = [False, True, False]
-        self._metadata.loc[index, col_names] = col_vals
+        with self._meta_lock:
+            self._metadata.loc[index, col_names] = col_vals
+            self._meta_version += 1
+            self._update_segments(index=index)
 
     def set_moving(self, index: int):
         """Set metadata of specified frame to moving.
@@ -158,21 +488,199 @@ class AbstractMovementDetector(ABC):
         """
         col_names = ['moving', 'manual_set', 'flagged']
         col_vals = [True, True, False]
-        self._metadata.loc[index, col_names] = col_vals
+        with self._meta_lock:
+            self._metadata.loc[index, col_names] = col_vals
+            self._meta_version += 1
+            self._update_segments(index=index)
 
     def save_meta(self):
         """Save the metadata to file.
 
         The file path relative to the `meta` folder is the same as the video's
-        path relative to the `video` folder.
+        path relative to the `video` folder. If the detector has a cache or a
+        store, they are updated as well.
+
+        The saved metadata may have been reviewed, so the digest of the
+        parameters that built it is removed, see `digest_path`.
+        """
+        self._make_meta_parent()
+        with self._meta_lock:
+            self._metadata.to_csv(self.meta_path)
+        if os.path.exists(self.digest_path):
+            os.remove(self.digest_path)
+        if self.cache is not None:
+            self.cache.put(
+                fingerprint=self.video.fingerprint,
+                parameters=self.parameters,
+                file_path=self.meta_path,
+            )
+        if self.store is not None:
+            self.store.write_meta(
+                video_id=get_video_id(self.video.vid_path),
+                meta=self._metadata[list(self.meta_fields)],
+            )
+
+    def meta_digest(self) -> str:
+        """Returns a hash of the current metadata.
+
+        The digest only depends on the values of the metadata fields, so it
+        changes whenever a frame is manually set.
+
+        Returns
+        -------
+        str
+        """
+        values = np.asarray(
+            self._metadata[list(self.meta_fields)],
+            dtype='float64',
+        )
+        return hashlib.sha1(values.tobytes()).hexdigest()
+
+    def _start_run(self):
+        """Resets the state of the previous run, including its cancellation.
+
+        Called synchronously when a run starts, so that `cancel` stops the
+        run from then on.
         """
+        self._cancel_requested.clear()
+        self._cancelled = False
+        self._frames_done = 0
+
+    def _load_or_create_meta(self) -> bool:
+        """Loads the available metadata, or creates empty metadata.
+
+        Returns
+        -------
+        bool
+            True if the metadata must be built.
+        """
+        if self.cache is not None:
+            cached_path = self.cache.get(
+                fingerprint=self.video.fingerprint,
+                parameters=self.parameters,
+            )
+            if cached_path is not None:
+                self._make_meta_parent()
+                shutil.copyfile(cached_path, self.meta_path)
+                self._load_meta()
+                self._publish(start=0, stop=len(self._metadata))
+                return False
+        if os.path.exists(self.meta_path):
+            self._load_meta()
+            self._publish(start=0, stop=len(self._metadata))
+            if self.cache is not None:
+                self.cache.put(
+                    fingerprint=self.video.fingerprint,
+                    parameters=self.parameters,
+                    file_path=self.meta_path,
+                )
+            return False
+        self._create_empty_meta()
+        return True
+
+    def _complete_run(self, build: bool):
+        if build:
+            self._build_meta()
+            if self._cancelled:
+                return
+            self.save_meta()
+            if os.path.exists(self.checkpoint_path):
+                os.remove(self.checkpoint_path)
+            if self._save_profile:
+                self._profile.save(path=self.profile_path)
+        self._segment_starts = None
+        self._meta_built = True
+
+    def _save_checkpoint(self, **state: np.ndarray):
+        """Atomically saves the state of the detection to `checkpoint_path`.
+
+        The checkpoint records the video's fingerprint and the detector's
+        parameters, so that it is only resumed by an identical detection.
+        """
+        self._make_meta_parent()
+        tmp_path = self.checkpoint_path.with_suffix('.tmp')
+        with open(tmp_path, 'wb') as f:
+            np.savez(
+                f,
+                fingerprint=self.video.fingerprint,
+                parameters=json.dumps(self.parameters, sort_keys=True),
+                **state
+            )
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def _load_checkpoint(self) -> Optional[dict]:
+        """Loads the state saved with `_save_checkpoint`.
+
+        Returns
+        -------
+        dict or None
+            The state, or None if there is no checkpoint of this detection.
+        """
+        if not os.path.exists(self.checkpoint_path):
+            return None
+        with np.load(self.checkpoint_path) as checkpoint:
+            state = dict(checkpoint)
+        parameters = json.dumps(self.parameters, sort_keys=True)
+        if (str(state.pop('fingerprint')) != self.video.fingerprint
+                or str(state.pop('parameters')) != parameters):
+            return None
+        return state
+
+    def _publish(self, start: int, stop: int):
+        """Pass the frames in [start, stop) to the listeners."""
+        if not self._listeners:
+            return
+        chunk = self._metadata.iloc[start:stop]
+        for listener in list(self._listeners):
+            listener(chunk)
+
+    def _build_segments(self):
+        moving = self._metadata['moving'].values.astype(bool)
+        starts, _, values = run_lengths(moving)
+        self._segment_starts = starts
+        self._segment_values = values
+        if 'change_ratio' in self._metadata:
+            change_ratio = self._metadata['change_ratio'].values
+            self._change_ratio_cumsum = np.concatenate(
+                ([0], np.cumsum(change_ratio, dtype='float64'))
+            )
+        else:
+            self._change_ratio_cumsum = None
+
+    def _update_segments(self, index: int):
+        """Re-encodes only the segments around a manually set frame."""
+        if self._segment_starts is None:
+            return
+        starts = self._segment_starts
+        values = self._segment_values
+        segment = np.searchsorted(starts, index, side='right') - 1
+        moving = bool(self._metadata.loc[index, 'moving'])
+        if values[segment] == moving:
+            return
+        first = max(segment - 1, 0)
+        last = min(segment + 2, len(starts))
+        lo = starts[first]
+        hi = starts[last] if last < len(starts) else len(self._metadata)
+        window = self._metadata['moving'].values[lo:hi].astype(bool)
+        window_starts, _, window_values = run_lengths(window)
+        self._segment_starts = np.concatenate(
+            (starts[:first], window_starts + lo, starts[last:])
+        )
+        self._segment_values = np.concatenate(
+            (values[:first], window_values, values[last:])
+        )
+
+    def _make_meta_parent(self):
         parent = self.meta_path.parent
         if not os.path.exists(parent):
             os.makedirs(parent)
-        self._metadata.to_csv(self.meta_path)
 
     def _load_meta(self):
-        self._metadata = pd.read_csv(self.meta_path)
+        self._metadata = pd.read_csv(
+            self.meta_path,
+            float_precision='round_trip',
+        )
+        self._meta_version += 1
 
     def _create_empty_meta(self):
         self._metadata = pd.DataFrame(
@@ -180,6 +688,72 @@ class AbstractMovementDetector(ABC):
             index=range(len(self.video)),
             dtype='float',
         )
+        self._meta_version += 1
+
+
+class FreezingTracker:
+    """Incremental classification of frames as moving or freezing.
+
+    A frame is freezing if it belongs to a run of at least `freezing_buffer`
+    consecutive frames whose change ratio is below `movement_threshold`. The
+    frames are fed one at a time to `update`, which reports the frames that
+    turn out to be freezing. The decision for a frame is final once
+    `pending` is smaller than the number of frames fed after it, so at most
+    `freezing_buffer - 1` frames later. Frames that are never reported stay
+    moving.
+
+    Parameters
+    ----------
+    movement_threshold : float
+        The change ratio above which a frame contains movement.
+    freezing_buffer : int
+        The number of consecutive frames below the threshold that make up
+        freezing.
+    freezing_frames : int, default 0
+        The number of consecutive frames below the threshold that precede the
+        next frame, to resume a tracking.
+    """
+
+    def __init__(
+            self,
+            movement_threshold: float,
+            freezing_buffer: int,
+            freezing_frames: int = 0,
+    ):
+        self.movement_threshold = movement_threshold
+        self.freezing_buffer = freezing_buffer
+        self.freezing_frames = freezing_frames
+
+    @property
+    def pending(self) -> int:
+        """The number of last frames that may still turn out to be freezing."""
+        if self.freezing_frames < self.freezing_buffer:
+            return self.freezing_frames
+        return 0
+
+    def update(self, change_ratio: float) -> int:
+        """Classify the next frame.
+
+        Parameters
+        ----------
+        change_ratio : float
+            The change ratio of the frame.
+
+        Returns
+        -------
+        int
+            The number of last frames, including this one, that turn out to
+            be freezing. Zero if this frame is moving or still pending.
+        """
+        if change_ratio >= self.movement_threshold:
+            self.freezing_frames = 0
+            return 0
+        if self.freezing_frames < self.freezing_buffer:
+            self.freezing_frames += 1
+            if self.freezing_frames == self.freezing_buffer:
+                return self.freezing_buffer
+            return 0
+        return 1
 
 
 class PixelChangeFD(AbstractMovementDetector):
@@ -220,6 +794,13 @@ class PixelChangeFD(AbstractMovementDetector):
     blur_ksize : int
         The size of the Gaussian blur filter. For more information refer to:
         https://docs.opencv.org/master/d4/d13/tutorial_py_filtering.html
+    cache : ResultCache, optional
+        The cache in which to look up and save the metadata.
+    store : SQLiteResultStore, optional
+        The store to which to write the metadata.
+    checkpoint_interval : int, optional
+        The number of frames between checkpoints from which an interrupted
+        detection resumes.
 
     References
     ----------
@@ -234,66 +815,347 @@ class PixelChangeFD(AbstractMovementDetector):
             movement_threshold: float,
             freezing_buffer: int,
             blur_ksize: int,
+            cache: Optional[ResultCache] = None,
+            store: Optional[SQLiteResultStore] = None,
+            checkpoint_interval: Optional[int] = None,
     ):
-        super().__init__(video=video)
+        super().__init__(
+            video=video,
+            cache=cache,
+            store=store,
+            checkpoint_interval=checkpoint_interval,
+        )
         self.outlier_change_threshold = outlier_change_threshold
         self.flag_outliers_buffer = flag_outliers_buffer
         self.movement_threshold = movement_threshold
         self.freezing_buffer = freezing_buffer
         self.blur_ksize = blur_ksize
 
+    @property
+    def parameters(self) -> dict:
+        parameters = super().parameters
+        parameters.update({
+            'outlier_change_threshold': self.outlier_change_threshold,
+            'flag_outliers_buffer': self.flag_outliers_buffer,
+            'movement_threshold': self.movement_threshold,
+            'freezing_buffer': self.freezing_buffer,
+            'blur_ksize': self.blur_ksize,
+        })
+        return parameters
+
     @property
     def _additional_columns(self) -> Tuple[str]:
         return 'change_ratio',
 
-    # todo: improve readability
-    def _build_meta(self, _timeit: bool = False):
+    def run_live(
+            self,
+            callback: Callable[[pd.DataFrame], Any],
+            window: int = 1,
+            latency_budget: Optional[float] = None,
+    ):
+        """Detect freezing while the video is being recorded.
+
+        Intended for a :class:`LiveVideo`. The frames are read on a
+        background thread and processed as they arrive. The decisions are
+        passed to `callback` in chunks of `window` frames, as a Pandas
+        DataFrame indexed by frame, with the fields `time`, `moving`,
+        `change_ratio`, `final` and `latency`, the time in seconds since the
+        frame was read.
+
+        The decision for a frame is final once `freezing_buffer - 1` more
+        frames are processed, or sooner if movement is detected. If
+        `latency_budget` is set, every frame is passed to the callback within
+        `latency_budget` seconds of being read: when the oldest frame not yet
+        passed reaches the budget, the frames are passed without waiting for
+        the window to fill or the decisions to be final. The frames whose
+        decision is not final are passed as moving, with `final` set to
+        False, and passed again once their decision is final.
+
+        The detection stops at the end of the recording, or when `cancel` is
+        called, e.g. from the callback. The metadata of the processed frames
+        is then built, as by `run`. For recordings to a file, it can be saved
+        with `save_meta`.
+
+        Parameters
+        ----------
+        callback : Callable
+            A callable accepting a Pandas DataFrame.
+        window : int, default 1
+            The number of final decisions passed to the callback at once.
+        latency_budget : float, optional
+            The longest time in seconds between the reading of a frame and
+            the passing of its decision to the callback.
+        """
+        if window < 1:
+            raise ValueError('The window must hold at least one frame.')
+        self._start_run()
+        img_area = self.video.frame_shape[0] * self.video.frame_shape[1]
+        tracker = FreezingTracker(
+            movement_threshold=self.movement_threshold,
+            freezing_buffer=self.freezing_buffer,
+        )
+        arrivals = queue.Queue(maxsize=2 * self.chunk_size)
+        stop_reading = threading.Event()
+
+        def put(item) -> bool:
+            while not stop_reading.is_set():
+                try:
+                    arrivals.put(item, timeout=.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        def read():
+            try:
+                for frame in self.video:
+                    frame_time = self.video.get_frame_time()
+                    if not put((frame, frame_time, time.monotonic())):
+                        return
+                put(None)
+            except Exception as e:
+                put(e)
+
+        times, moving, change_ratios, read_times = [], [], [], []
+        decided = 0  # the frames before have a final decision
+        passed = 0  # the frames before were passed with their final decision
+        provisional = 0  # the frames before were passed at least once
+
+        def pass_frames(stop: int):
+            """Passes the frames before `stop` that have a final decision not
+            passed yet, or that were never passed."""
+            nonlocal passed, provisional
+            final_stop = min(decided, stop)
+            indices = np.r_[
+                passed:final_stop, max(provisional, final_stop):stop
+            ]
+            if not len(indices):
+                return
+            chunk = pd.DataFrame(
+                {
+                    'time': [times[i] for i in indices],
+                    'moving': [moving[i] for i in indices],
+                    'change_ratio': [change_ratios[i] for i in indices],
+                    'final': indices < final_stop,
+                    'latency': time.monotonic() - np.array(
+                        [read_times[i] for i in indices]
+                    ),
+                },
+                index=pd.Index(indices),
+            )
+            passed = final_stop
+            provisional = max(provisional, stop)
+            callback(chunk)
+
+        reader = threading.Thread(target=read, daemon=True)
+        reader.start()
         prev_frame = None
+        try:
+            while not self._cancel_requested.is_set():
+                timeout = .1  # to notice a cancellation
+                oldest = max(passed, provisional)
+                if latency_budget is not None and oldest < len(read_times):
+                    deadline = read_times[oldest] + latency_budget
+                    if deadline <= time.monotonic():
+                        pass_frames(stop=len(moving))
+                        continue
+                    timeout = min(deadline - time.monotonic(), timeout)
+                try:
+                    item = arrivals.get(timeout=max(timeout, 0))
+                except queue.Empty:
+                    continue
+                if item is None:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                frame, frame_time, read_time = item
+                frame = self._frame_preprocessing(frame)
+                change_ratio = self._frame_change_ratio(
+                    prev_frame=prev_frame, frame=frame, img_area=img_area,
+                )
+                prev_frame = frame
+                times.append(frame_time)
+                moving.append(True)
+                change_ratios.append(change_ratio)
+                read_times.append(read_time)
+                frozen = tracker.update(change_ratio)
+                if frozen:
+                    moving[-frozen:] = [False] * frozen
+                decided = len(moving) - tracker.pending
+                self._frames_done = len(moving)
+                if decided - passed >= window:
+                    pass_frames(stop=decided)
+        finally:
+            stop_reading.set()
+            # the reader may be waiting for the recording to grow, in which
+            # case it stops once it next reads a frame
+            reader.join(timeout=1.)
+        self._cancelled = self._cancel_requested.is_set()
+        # the frames still pending at the end are moving, as in `run`
+        decided = len(moving)
+        if passed < decided:
+            pass_frames(stop=decided)
+        self._metadata = pd.DataFrame(
+            columns=self.meta_fields,
+            index=range(decided),
+            dtype='float',
+        )
+        self._write_frames(
+            start=0, stop=decided, times=np.array(times),
+            moving=np.array(moving, dtype=bool),
+            change_ratio=np.array(change_ratios),
+        )
+        self._finalize_meta()
+        self._segment_starts = None
+        self._meta_built = True
+
+    def _build_meta(self, _timeit: bool = False):
         t1 = time.time() if _timeit else None
-        freezing_frames = 0
-        self._metadata.loc[0, 'moving'] = True
+        frame_count = len(self._metadata)
+        change_ratios = np.zeros(frame_count)
+        times = np.zeros(frame_count)
+        moving = np.ones(frame_count, dtype=bool)
+        # frames before the freezing buffer can no longer change
+        finality_lag = max(self.freezing_buffer - 1, 0)
         img_area = self.video.frame_shape[0] * self.video.frame_shape[1]
-        for i, frame in enumerate(self.video):
+        profile = self._profile
+        tracker = FreezingTracker(
+            movement_threshold=self.movement_threshold,
+            freezing_buffer=self.freezing_buffer,
+        )
+        prev_frame = None
+        published = 0
+        processed = 0
+        frames = self.video
+        checkpoint = None
+        if self.checkpoint_interval:
+            checkpoint = self._load_checkpoint()
+        if checkpoint is not None:
+            processed = int(checkpoint['processed'])
+            change_ratios[:processed] = checkpoint['change_ratio']
+            times[:processed] = checkpoint['time']
+            moving[:processed] = checkpoint['moving']
+            tracker.freezing_frames = int(checkpoint['freezing_frames'])
+            prev_frame = checkpoint['prev_frame']
+            frames = self.video.iter_from(
+                processed, last_time=float(checkpoint['time'][-1])
+            )
+            self._frames_done = processed
+
+        def save_checkpoint():
+            self._save_checkpoint(
+                processed=processed,
+                change_ratio=change_ratios[:processed],
+                time=times[:processed],
+                moving=moving[:processed],
+                freezing_frames=tracker.freezing_frames,
+                prev_frame=prev_frame,
+            )
+            profile.lap('checkpoint')
+
+        profile.restart()
+        for i, frame in enumerate(frames, start=processed):
+            if self._cancel_requested.is_set():
+                self._cancelled = True
+                if self.checkpoint_interval and processed:
+                    save_checkpoint()
+                break
+            profile.lap('decode')
             frame = self._frame_preprocessing(frame)
-            if prev_frame is None:
-                change_ratio = 0
-            else:
-                diff = cv2.absdiff(prev_frame, frame)
-                diff = self._frame_postprocessing(diff)
-                contours = cv2.findContours(diff, cv2.RETR_EXTERNAL,
-                                            cv2.CHAIN_APPROX_SIMPLE)[0]
-                contours_area = self._get_contours_area(contours)
-                change_ratio = contours_area / img_area
-            self._metadata.loc[i, 'change_ratio'] = change_ratio
-            if change_ratio < self.movement_threshold:
-                if freezing_frames < self.freezing_buffer - 1:
-                    self._metadata.loc[i, 'moving'] = True
-                    freezing_frames += 1
-                elif freezing_frames == self.freezing_buffer - 1:
-                    for j in range(self.freezing_buffer):
-                        self._metadata.loc[i - j, 'moving'] = False
-                    freezing_frames += 1
-                else:
-                    self._metadata.loc[i, 'moving'] = False
-            else:
-                freezing_frames = 0
-                self._metadata.loc[i, 'moving'] = True
-            self._metadata.loc[i, 'manual_set'] = False
-            self._metadata.loc[i, 'time'] = self.video.get_frame_time()
+            change_ratio = self._frame_change_ratio(
+                prev_frame=prev_frame, frame=frame, img_area=img_area,
+            )
+            change_ratios[i] = change_ratio
+            frozen = tracker.update(change_ratio)
+            if frozen:
+                moving[i - frozen + 1:i + 1] = False
+            times[i] = self.video.get_frame_time()
             prev_frame = frame
-        self._metadata.loc[:, 'moving'] = self._metadata['moving'].astype(bool)
-        self._metadata.loc[:, 'manual_set'] = (
-            self._metadata['manual_set'].astype(bool)
-        )
-        self._update_meta()
+            processed = i + 1
+            self._frames_done = processed
+            profile.lap('freezing')
+            final = processed - finality_lag
+            if final - published >= self.chunk_size:
+                self._write_frames(
+                    start=published, stop=final, times=times,
+                    moving=moving, change_ratio=change_ratios,
+                )
+                published = final
+                profile.lap('meta_write')
+            if (self.checkpoint_interval
+                    and processed % self.checkpoint_interval == 0):
+                save_checkpoint()
+        if processed > published:
+            self._write_frames(
+                start=published, stop=processed, times=times,
+                moving=moving, change_ratio=change_ratios,
+            )
+            profile.lap('meta_write')
+        if self._cancelled:
+            return
+        self._finalize_meta()
+        profile.lap('flagging')
         if _timeit:
             print('Video {} analyzed in {:.2f}s'.format(self.video.vid_name,
                                                         time.time() - t1))
 
-    @staticmethod
-    def _frame_postprocessing(frame: np.ndarray) -> np.ndarray:
+    def _write_frames(
+            self,
+            start: int,
+            stop: int,
+            times: np.ndarray,
+            moving: np.ndarray,
+            change_ratio: np.ndarray,
+    ):
+        rows = slice(start, stop - 1)  # label-based slicing is inclusive
+        with self._meta_lock:
+            self._metadata.loc[rows, 'time'] = times[start:stop]
+            self._metadata.loc[rows, 'change_ratio'] = change_ratio[start:stop]
+            # frames set manually while running keep their values
+            manual_set = self._metadata['manual_set'].values[start:stop]
+            automatic = start + np.flatnonzero(manual_set != True)
+            self._metadata.loc[automatic, 'moving'] = moving[automatic]
+            self._metadata.loc[automatic, 'manual_set'] = False
+            self._meta_version += 1
+            self._publish(start=start, stop=stop)
+
+    def _finalize_meta(self):
+        """Computes the fields that depend on all the frames."""
+        with self._meta_lock:
+            self._metadata.loc[:, 'moving'] = (
+                self._metadata['moving'].astype(bool)
+            )
+            self._metadata.loc[:, 'manual_set'] = (
+                self._metadata['manual_set'].astype(bool)
+            )
+            self._update_meta()
+            self._meta_version += 1
+
+    def _frame_change_ratio(
+            self,
+            prev_frame: Optional[np.ndarray],
+            frame: np.ndarray,
+            img_area: int,
+    ) -> float:
+        """The ratio of the image area that changed since the previous
+        preprocessed frame, zero for the first frame.
+        """
+        if prev_frame is None:
+            return 0
+        diff = cv2.absdiff(prev_frame, frame)
+        self._profile.lap('absdiff')
+        diff = self._frame_postprocessing(diff)
+        contours = cv2.findContours(diff, cv2.RETR_EXTERNAL,
+                                    cv2.CHAIN_APPROX_SIMPLE)[0]
+        contours_area = self._get_contours_area(contours)
+        self._profile.lap('contours')
+        return contours_area / img_area
+
+    def _frame_postprocessing(self, frame: np.ndarray) -> np.ndarray:
         output = cv2.threshold(frame, 15, 255, cv2.THRESH_BINARY)[1]
+        self._profile.lap('threshold')
         output = cv2.dilate(output, None, iterations=2)
+        self._profile.lap('dilate')
         return output
 
     @staticmethod
@@ -303,11 +1165,13 @@ class PixelChangeFD(AbstractMovementDetector):
 
     def _frame_preprocessing(self, frame: np.ndarray) -> np.ndarray:
         output = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)  # convert to GreyScale
+        self._profile.lap('cvtColor')
         output = cv2.GaussianBlur(
             output,
             (self.blur_ksize, self.blur_ksize),
             0
         )  # blur the image to remove high freq noise
+        self._profile.lap('blur')
         return output
 
     def _update_meta(self):
@@ -0,0 +1,192 @@
+import json
+import os
+import uuid
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional
+
+from movement_detector.cache import video_fingerprint
+from movement_detector.leases import file_lock
+from movement_detector.utils import get_project_path, VIDEO_EXTENSIONS
+
+
+class ScanResult(NamedTuple):
+    """The differences found by :meth:`VideoIndex.scan`.
+
+    Each field is a list of video paths.
+    """
+
+    new: List[str]
+    changed: List[str]
+    removed: List[str]
+    unchanged: List[str]
+
+    @property
+    def videos(self) -> List[str]:
+        """All the videos currently in the folder."""
+        return sorted(self.new + self.changed + self.unchanged)
+
+
+class VideoIndex:
+    """Persistent index of the videos folder.
+
+    The index records the size, modification time and content fingerprint of
+    each video. A rescan lists the folder with `os.scandir`, and only the
+    videos whose size or modification time differ from the index are read to
+    compute their fingerprint, so re-syncing a large archive takes little more
+    than listing it.
+
+    Symbolic links to folders are followed, and each folder is only listed
+    once, so that links forming a cycle do not make the scan loop.
+
+    Several processes can scan the same folder into the same index. The
+    changes found by each scan are merged into the index file under a lock.
+
+    Parameters
+    ----------
+    index_path : Path, optional
+        The path to the index's JSON file. Defaults to `discovery.json` in
+        the project's root directory.
+    videos_path : Path, optional
+        The folder to index. Defaults to the project's `videos` folder.
+    """
+
+    def __init__(
+            self,
+            index_path: Optional[Path] = None,
+            videos_path: Optional[Path] = None,
+    ):
+        if index_path is None:
+            index_path = get_project_path() / 'discovery.json'
+        if videos_path is None:
+            videos_path = get_project_path() / 'videos'
+        self.index_path = Path(index_path)
+        self.videos_path = Path(os.path.realpath(videos_path))
+        self._entries = self._read()
+
+    def scan(self) -> ScanResult:
+        """Updates the index with the current content of the folder.
+
+        Returns
+        -------
+        ScanResult
+            The new, changed, removed and unchanged videos since the last
+            scan.
+        """
+        new, changed, unchanged = [], [], []
+        entries = {}
+        for video_id, path, stat in self._scan_files():
+            entry = self._entries.get(video_id)
+            if (entry is not None
+                    and entry['size'] == stat.st_size
+                    and entry['mtime_ns'] == stat.st_mtime_ns):
+                unchanged.append(path)
+            else:
+                try:
+                    fingerprint = video_fingerprint(vid_path=path)
+                except FileNotFoundError:  # removed while scanning
+                    continue
+                entry = {
+                    'size': stat.st_size,
+                    'mtime_ns': stat.st_mtime_ns,
+                    'fingerprint': fingerprint,
+                }
+                if video_id in self._entries:
+                    changed.append(path)
+                else:
+                    new.append(path)
+            entries[video_id] = entry
+        removed_ids = [
+            video_id for video_id in self._entries if video_id not in entries
+        ]
+        removed = [self._path(video_id) for video_id in removed_ids]
+        self._entries = entries
+        if new or changed or removed or not os.path.exists(self.index_path):
+            self._save(removed_ids=removed_ids)
+        return ScanResult(
+            new=sorted(new),
+            changed=sorted(changed),
+            removed=sorted(removed),
+            unchanged=sorted(unchanged),
+        )
+
+    def fingerprint(self, vid_path: Path) -> Optional[str]:
+        """Returns the indexed fingerprint of a video.
+
+        Parameters
+        ----------
+        vid_path : Path
+            The path to the video.
+
+        Returns
+        -------
+        str or None
+            The fingerprint, or None if the video is not indexed.
+        """
+        video_id = Path(
+            os.path.relpath(os.path.realpath(vid_path), self.videos_path)
+        ).as_posix()
+        entry = self._entries.get(video_id)
+        return None if entry is None else entry['fingerprint']
+
+    @property
+    def entries(self) -> Dict[str, dict]:
+        """The index entries, keyed by video identifier."""
+        return dict(self._entries)
+
+    def _scan_files(self):
+        """Yields the identifier, path and stat result of each video."""
+        directories = [(str(self.videos_path), '')]
+        visited = set()  # (device, inode) of the listed folders
+        while directories:
+            directory, prefix = directories.pop()
+            try:
+                stat = os.stat(directory)
+                if (stat.st_dev, stat.st_ino) in visited:
+                    continue
+                visited.add((stat.st_dev, stat.st_ino))
+                with os.scandir(directory) as it:
+                    dir_entries = list(it)
+            except FileNotFoundError:  # removed while scanning
+                continue
+            for entry in dir_entries:
+                try:
+                    if entry.is_dir():
+                        directories.append(
+                            (entry.path, f'{prefix}{entry.name}/')
+                        )
+                    elif (entry.name.endswith(VIDEO_EXTENSIONS)
+                          and entry.is_file()):
+                        stat = entry.stat()
+                        yield f'{prefix}{entry.name}', entry.path, stat
+                except FileNotFoundError:
+                    continue
+
+    def _path(self, video_id: str) -> str:
+        return os.path.join(str(self.videos_path), *video_id.split('/'))
+
+    def _read(self) -> Dict[str, dict]:
+        try:
+            with open(self.index_path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def _save(self, removed_ids: List[str]):
+        """Merges the scanned entries into the index file.
+
+        Entries written by other processes since the index was loaded are
+        kept, unless this scan found their video removed.
+        """
+        parent = self.index_path.parent
+        os.makedirs(parent, exist_ok=True)
+        with file_lock(path=f'{self.index_path}.lock'):
+            entries = self._read()
+            entries.update(self._entries)
+            for video_id in removed_ids:
+                entries.pop(video_id, None)
+            tmp_path = self.index_path.with_name(
+                f'{self.index_path.name}.{uuid.uuid4().hex}.tmp'
+            )
+            with open(tmp_path, 'w') as f:
+                json.dump(entries, f)
+            os.replace(tmp_path, self.index_path)
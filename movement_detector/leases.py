@@ -0,0 +1,219 @@
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional
+
+from movement_detector.utils import get_video_mapped_path
+
+
+class Lease:
+    """Exclusive claim on a video, shared through the file system.
+
+    Lets independent batch runners, possibly on different machines mounting
+    the same project folder, split the videos between them without a central
+    service. The lease is a file created atomically next to the video's
+    metadata file. While the lease is held, a background thread refreshes
+    the file's modification time every `ttl / 3` seconds. A lease that has
+    not been refreshed for `ttl` seconds, e.g. because its runner crashed,
+    is considered stale and can be taken over.
+
+    The clocks of the machines must agree to within a fraction of `ttl`.
+
+    Parameters
+    ----------
+    vid_path : Path, optional
+        The path to the video.
+    ttl : float, default 120
+        The time in seconds after which a lease that is not refreshed is
+        stale.
+    path : Path, optional
+        The path to the lease file, to claim something other than a video,
+        e.g. a file that several runners update. Must be set if `vid_path`
+        is not.
+
+    Examples
+    --------
+    >>> with Lease(vid_path) as lease:  # doctest: +SKIP
+    ...     if lease.acquired:
+    ...         detector.run()
+    """
+
+    def __init__(
+            self,
+            vid_path: Optional[Path] = None,
+            ttl: float = 120,
+            path: Optional[Path] = None,
+    ):
+        if path is None:
+            path = get_video_mapped_path(
+                vid_path=vid_path,
+                dir_suffix='meta',
+                file_extension='.lease',
+            )
+        self.path = Path(path)
+        self.ttl = ttl
+        self._token = uuid.uuid4().hex
+        self._acquired = False
+        self._stop_heartbeat = threading.Event()
+        self._heartbeat = None
+
+    @property
+    def acquired(self) -> bool:
+        """Set to True while the lease is held."""
+        return self._acquired
+
+    def acquire(self) -> bool:
+        """Try to take the lease.
+
+        A stale lease is broken and taken over.
+
+        Returns
+        -------
+        bool
+            True if the lease was taken, False if it is held by another
+            runner.
+        """
+        if self._acquired:
+            return True
+        parent = self.path.parent
+        if not os.path.exists(parent):
+            os.makedirs(parent, exist_ok=True)
+        if not self._create():
+            if not self._break_stale():
+                return False
+            if not self._create():
+                return False
+        self._acquired = True
+        self._stop_heartbeat.clear()
+        self._heartbeat = threading.Thread(target=self._beat, daemon=True)
+        self._heartbeat.start()
+        return True
+
+    def release(self):
+        """Give up the lease."""
+        if not self._acquired:
+            return
+        self._stop_heartbeat.set()
+        self._heartbeat.join()
+        self._heartbeat = None
+        self._acquired = False
+        if self._read_token(self.path) == self._token:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.release()
+
+    def _create(self) -> bool:
+        """Atomically creates the lease file, if it does not exist."""
+        try:
+            fd = os.open(
+                str(self.path), os.O_CREAT | os.O_EXCL | os.O_WRONLY
+            )
+        except FileExistsError:
+            return False
+        content = {
+            'token': self._token,
+            'host': socket.gethostname(),
+            'pid': os.getpid(),
+            'acquired': time.time(),
+        }
+        with os.fdopen(fd, 'w') as f:
+            json.dump(content, f)
+        return True
+
+    def _break_stale(self) -> bool:
+        """Removes the lease file if it is stale.
+
+        The file is first renamed to a name unique to this runner, which
+        only one runner can do. If another runner replaced the stale lease
+        with a fresh one in the meantime, the fresh lease is put back.
+
+        Returns
+        -------
+        bool
+            True if a stale lease was removed.
+        """
+        try:
+            age = time.time() - os.path.getmtime(self.path)
+        except FileNotFoundError:
+            return True  # released in the meantime
+        if age < self.ttl:
+            return False
+        stale_token = self._read_token(self.path)
+        moved_path = self.path.with_name(
+            f'{self.path.name}.{self._token}.stale'
+        )
+        try:
+            os.rename(self.path, moved_path)
+        except FileNotFoundError:
+            return True  # broken or released by another runner
+        if self._read_token(moved_path) != stale_token:
+            # a fresh lease was moved, put it back unless replaced again
+            try:
+                os.link(moved_path, self.path)
+            except FileExistsError:
+                pass
+            os.remove(moved_path)
+            return False
+        os.remove(moved_path)
+        return True
+
+    def _beat(self):
+        while not self._stop_heartbeat.wait(self.ttl / 3):
+            token = self._read_token(self.path)
+            if token is None:
+                # moved aside by a runner checking whether it is stale, or
+                # being replaced, try again at the next beat
+                continue
+            if token != self._token:
+                return  # taken over after missing heartbeats
+            try:
+                os.utime(self.path)
+            except FileNotFoundError:
+                continue
+
+    @staticmethod
+    def _read_token(path: Path) -> Optional[str]:
+        try:
+            with open(path) as f:
+                return json.load(f).get('token')
+        except (FileNotFoundError, ValueError):
+            return None
+
+
+@contextmanager
+def file_lock(path: Path, ttl: float = 30, poll_interval: float = .05):
+    """Holds a :class:`Lease` on a file for the duration of the context.
+
+    Waits until the lease is free. Used to serialize the read-modify-write
+    updates of files shared by several processes or machines.
+
+    Parameters
+    ----------
+    path : Path
+        The path to the lease file.
+    ttl : float, default 30
+        The time in seconds after which the lease of a crashed process is
+        stale.
+    poll_interval : float, default 0.05
+        The time in seconds between attempts to take the lease.
+    """
+    lease = Lease(path=path, ttl=ttl)
+    while not lease.acquire():
+        time.sleep(poll_interval)
+    try:
+        yield lease
+    finally:
+        lease.release()
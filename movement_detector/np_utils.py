@@ -37,3 +37,32 @@ def get_dtype(value: np.number):
         for int_ in np_ints:
             if np.iinfo(int_).min < value:
                 return int_
+
+
+def run_lengths(values: np.ndarray) -> tuple:
+    """
+    Run-length encodes a one-dimensional array.
+
+    Parameters
+    ----------
+    values : NumPy array
+        The array to encode.
+
+    Returns
+    -------
+    starts : NumPy array
+        The index of the first element of each run.
+    lengths : NumPy array
+        The number of elements in each run.
+    run_values : NumPy array
+        The value of each run.
+    """
+    values = np.asarray(values)
+    if len(values) == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, values[:0]
+    starts = np.flatnonzero(values[1:] != values[:-1]) + 1
+    starts = np.concatenate(([0], starts))
+    lengths = np.diff(np.append(starts, len(values)))
+    run_values = values[starts]
+    return starts, lengths, run_values
@@ -0,0 +1,122 @@
+import json
+import time
+from pathlib import Path
+
+import pandas as pd
+
+try:
+    _clock_ns = time.perf_counter_ns
+except AttributeError:  # Python 3.6
+    def _clock_ns() -> int:
+        return int(time.perf_counter() * 1e9)
+
+
+class StageProfile:
+    """Cumulative timings of the stages of a processing pipeline.
+
+    The pipeline calls `lap` at the end of each stage, which charges the time
+    elapsed since the previous lap to that stage. Call `restart` once before
+    the loop, so that the set-up is not charged to the first stage. Within
+    the loop, the laps follow each other, so that the whole iteration is
+    accounted for: the time spent fetching the next item is charged to the
+    first stage after it, e.g. "decode" in the detectors.
+
+    Examples
+    --------
+    >>> profile = StageProfile()
+    >>> profile.restart()
+    >>> for frame in frames:  # doctest: +SKIP
+    ...     profile.lap('decode')
+    ...     grey = to_grey(frame)
+    ...     profile.lap('grey')
+    ...     blurred = blur(grey)
+    ...     profile.lap('blur')
+    >>> profile.stats()  # doctest: +SKIP
+    """
+
+    enabled = True
+
+    def __init__(self):
+        self._totals = {}
+        self._counts = {}
+        self._last = _clock_ns()
+
+    def restart(self):
+        """Start timing from now."""
+        self._last = _clock_ns()
+
+    def lap(self, stage: str):
+        """Charge the time elapsed since the previous lap to a stage.
+
+        Parameters
+        ----------
+        stage : str
+            The name of the stage that just completed.
+        """
+        now = _clock_ns()
+        self._totals[stage] = self._totals.get(stage, 0) + now - self._last
+        self._counts[stage] = self._counts.get(stage, 0) + 1
+        self._last = now
+
+    def stats(self) -> pd.DataFrame:
+        """Returns the timings of each stage.
+
+        Returns
+        -------
+        pandas DataFrame
+            Indexed by stage, in order of first appearance, with the columns
+            `count`, `total_s` (total time in seconds), `mean_ms` (mean time
+            per call in milliseconds) and `share` (fraction of the total time
+            of all stages).
+        """
+        stages = list(self._totals)
+        totals = pd.Series(
+            [self._totals[s] for s in stages], index=stages, dtype='float64'
+        ) / 1e9
+        counts = pd.Series(
+            [self._counts[s] for s in stages], index=stages, dtype='int64'
+        )
+        stats = pd.DataFrame({
+            'count': counts,
+            'total_s': totals,
+            'mean_ms': totals / counts * 1e3,
+            'share': totals / totals.sum(),
+        })
+        stats.index.name = 'stage'
+        return stats
+
+    def to_dict(self) -> dict:
+        """Returns the total nanoseconds and call count of each stage."""
+        return {
+            stage: {
+                'total_ns': self._totals[stage],
+                'count': self._counts[stage],
+            }
+            for stage in self._totals
+        }
+
+    def save(self, path: Path):
+        """Write the timings to a JSON file.
+
+        Parameters
+        ----------
+        path : Path
+            The path to the file.
+        """
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=1)
+
+
+class _DisabledProfile:
+    """Stand-in for a :class:`StageProfile` that records nothing."""
+
+    enabled = False
+
+    def restart(self):
+        pass
+
+    def lap(self, stage: str):
+        pass
+
+
+DISABLED_PROFILE = _DisabledProfile()
@@ -0,0 +1,326 @@
+import os
+import sqlite3
+from pathlib import Path
+from typing import List, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+from movement_detector.utils import get_project_path
+
+
+class SQLiteResultStore:
+    """Single-file results store for batches of videos.
+
+    Stores the metadata of the detectors and the results of the analyzers of
+    any number of videos in one SQLite database, so that cohort-level
+    queries do not need to open one CSV file per video.
+
+    The metadata is stored in the `meta` table, with one row per video frame,
+    indexed on (video, frame). The analyses are stored in the long-format
+    `analysis` table, with one row per video, analyzer configuration,
+    interval and statistic, indexed on (video, interval). An analyzer
+    configuration is identified by the analyzer's name and the digest of its
+    parameters, so that analyses of the same analyzer with different
+    parameters do not replace each other.
+
+    Videos are identified by their path relative to the videos folder, see
+    :func:`movement_detector.utils.get_video_id`.
+
+    Parameters
+    ----------
+    db_path : Path, optional
+        The path to the database file. Defaults to `results.sqlite` in the
+        project's root directory.
+    """
+
+    _meta_types = {
+        'time': 'REAL',
+        'moving': 'INTEGER',
+        'outlier': 'INTEGER',
+        'flagged': 'INTEGER',
+        'manual_set': 'INTEGER',
+    }
+
+    def __init__(self, db_path: Optional[Path] = None):
+        if db_path is None:
+            db_path = get_project_path() / 'results.sqlite'
+        self.db_path = Path(db_path)
+        self._connection = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_connection'] = None
+        return state
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """The connection to the database."""
+        if self._connection is None:
+            parent = self.db_path.parent
+            if not os.path.exists(parent):
+                os.makedirs(parent)
+            self._connection = sqlite3.connect(
+                str(self.db_path),
+                timeout=60,
+                check_same_thread=False,
+            )
+            self._create_schema()
+        return self._connection
+
+    def close(self):
+        """Close the connection to the database."""
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def write_meta(self, video_id: str, meta: pd.DataFrame):
+        """Replaces the metadata of a video.
+
+        The rows are inserted in bulk in a single transaction.
+
+        Parameters
+        ----------
+        video_id : str
+            The video identifier.
+        meta : pandas DataFrame
+            The detector's metadata.
+        """
+        columns = [
+            c for c in meta.columns if not str(c).startswith('Unnamed')
+        ]
+        self._add_meta_columns(columns=columns)
+        values = meta[columns].astype('float64').values
+        rows = [
+            (video_id, frame) + tuple(_to_sql(v) for v in row)
+            for frame, row in enumerate(values)
+        ]
+        column_names = ', '.join(['video', 'frame'] + _quote(columns))
+        placeholders = ', '.join(['?'] * (len(columns) + 2))
+        with self.connection as conn:
+            conn.execute('DELETE FROM meta WHERE video = ?', (video_id,))
+            conn.executemany(
+                f'INSERT INTO meta ({column_names}) VALUES ({placeholders})',
+                rows,
+            )
+
+    def read_meta(self, video_id: str) -> pd.DataFrame:
+        """Returns the metadata of a video.
+
+        Parameters
+        ----------
+        video_id : str
+            The video identifier.
+
+        Returns
+        -------
+        pandas DataFrame
+        """
+        meta = pd.read_sql_query(
+            'SELECT * FROM meta WHERE video = ? ORDER BY frame',
+            self.connection,
+            params=(video_id,),
+        )
+        meta = meta.drop(columns=['video', 'frame'])
+        for column, sql_type in self._meta_types.items():
+            if (sql_type == 'INTEGER' and column in meta
+                    and not meta[column].isna().any()):
+                meta[column] = meta[column].astype(bool)
+        return meta
+
+    def write_analysis(
+            self,
+            video_id: str,
+            analyzer: str,
+            analysis: Union[pd.DataFrame, pd.Series],
+            parameters: str = '',
+    ):
+        """Replaces the results of an analyzer configuration for a video.
+
+        Each numeric column of the analysis is stored as a separate
+        statistic. If the analysis is indexed by intervals, their bounds are
+        stored as well.
+
+        Parameters
+        ----------
+        video_id : str
+            The video identifier.
+        analyzer : str
+            The name of the analyzer.
+        analysis : pandas DataFrame or Series
+            The analysis results.
+        parameters : str, optional
+            The digest of the analyzer's parameters, see
+            :func:`movement_detector.cache.parameters_hash`.
+        """
+        if isinstance(analysis, pd.Series):
+            analysis = analysis.to_frame()
+        analysis = analysis.select_dtypes(include=[np.number, np.bool_])
+        rows = []
+        for label, row in analysis.iterrows():
+            if isinstance(label, pd.Interval):
+                start, end = float(label.left), float(label.right)
+            else:
+                start, end = None, None
+            for statistic, value in row.items():
+                rows.append((
+                    video_id, analyzer, parameters, str(label), start, end,
+                    str(statistic), _to_sql(value),
+                ))
+        with self.connection as conn:
+            conn.execute(
+                'DELETE FROM analysis '
+                'WHERE video = ? AND analyzer = ? AND parameters = ?',
+                (video_id, analyzer, parameters),
+            )
+            conn.executemany(
+                'INSERT INTO analysis VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                rows,
+            )
+
+    def videos(self) -> List[str]:
+        """Returns the identifiers of the videos with stored metadata."""
+        cursor = self.connection.execute(
+            'SELECT DISTINCT video FROM meta ORDER BY video'
+        )
+        return [row[0] for row in cursor]
+
+    def analysis_summary(
+            self,
+            analyzer: str,
+            statistic: str = 'moving',
+            parameters: Optional[str] = None,
+    ) -> pd.DataFrame:
+        """Returns an analysis statistic for all videos.
+
+        Parameters
+        ----------
+        analyzer : str
+            The name of the analyzer.
+        statistic : str, default 'moving'
+            The name of the statistic.
+        parameters : str, optional
+            The digest of the analyzer's parameters. Must be set if analyses
+            of several configurations of the analyzer are stored.
+
+        Returns
+        -------
+        pandas DataFrame
+            A table with one row per video and one column per interval.
+
+        Raises
+        ------
+        ValueError
+            If `parameters` is not set and several configurations of the
+            analyzer are stored.
+        """
+        query = (
+            'SELECT video, parameters, interval, interval_start, value '
+            'FROM analysis WHERE analyzer = ? AND statistic = ?'
+        )
+        params = [analyzer, statistic]
+        if parameters is not None:
+            query += ' AND parameters = ?'
+            params.append(parameters)
+        summary = pd.read_sql_query(
+            query + ' ORDER BY video, interval_start',
+            self.connection,
+            params=params,
+        )
+        if summary['parameters'].nunique() > 1:
+            raise ValueError(
+                f'Several configurations of {analyzer} are stored, specify '
+                f'the digest of the parameters to summarize.'
+            )
+        columns = list(dict.fromkeys(summary['interval']))
+        summary = summary.pivot(
+            index='video', columns='interval', values='value'
+        )
+        return summary[columns]
+
+    def freezing_summary(self, intervals: Sequence[float]) -> pd.DataFrame:
+        """Returns the freezing percentage per interval for all videos.
+
+        The summary is computed directly from the stored metadata with a
+        single query. The intervals are closed on the right, as with
+        :class:`movement_detector.analysis.IntervalAggregatorMA`.
+
+        Parameters
+        ----------
+        intervals : list of floats
+            The interval cut-off points.
+
+        Returns
+        -------
+        pandas DataFrame
+            A table with one row per video and one column per interval.
+        """
+        edges = list(intervals)
+        cases = ' '.join(
+            f'WHEN time > ? AND time <= ? THEN {i}'
+            for i in range(len(edges) - 1)
+        )
+        params = []
+        for start, end in zip(edges[:-1], edges[1:]):
+            params.extend([float(start), float(end)])
+        query = (
+            'SELECT video, bin, 1.0 - AVG(moving) AS freezing FROM ('
+            f'SELECT video, moving, CASE {cases} END AS bin FROM meta'
+            ') WHERE bin IS NOT NULL GROUP BY video, bin'
+        )
+        summary = pd.read_sql_query(query, self.connection, params=params)
+        labels = [
+            str(pd.Interval(start, end))
+            for start, end in zip(edges[:-1], edges[1:])
+        ]
+        summary['interval'] = [labels[i] for i in summary['bin']]
+        summary = summary.pivot(
+            index='video', columns='interval', values='freezing'
+        )
+        return summary.reindex(columns=labels)
+
+    def _create_schema(self):
+        meta_columns = ', '.join(
+            f'"{name}" {sql_type}'
+            for name, sql_type in self._meta_types.items()
+        )
+        with self._connection as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS meta ('
+                f'video TEXT NOT NULL, frame INTEGER NOT NULL, {meta_columns}'
+                ')'
+            )
+            conn.execute(
+                'CREATE UNIQUE INDEX IF NOT EXISTS meta_video_frame '
+                'ON meta (video, frame)'
+            )
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS analysis ('
+                'video TEXT NOT NULL, analyzer TEXT NOT NULL, '
+                "parameters TEXT NOT NULL DEFAULT '', "
+                'interval TEXT, interval_start REAL, interval_end REAL, '
+                'statistic TEXT NOT NULL, value REAL'
+                ')'
+            )
+            conn.execute(
+                'CREATE INDEX IF NOT EXISTS analysis_video_interval '
+                'ON analysis (video, interval)'
+            )
+
+    def _add_meta_columns(self, columns: Sequence[str]):
+        cursor = self.connection.execute('PRAGMA table_info(meta)')
+        existing = {row[1] for row in cursor}
+        with self.connection as conn:
+            for column in columns:
+                if column not in existing:
+                    conn.execute(f'ALTER TABLE meta ADD COLUMN "{column}" REAL')
+
+
+def _quote(columns: Sequence[str]) -> List[str]:
+    return [f'"{c}"' for c in columns]
+
+
+def _to_sql(value):
+    if value is None or pd.isna(value):
+        return None
+    return float(value)
@@ -0,0 +1,181 @@
+import json
+import os
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+#: The per-video metrics summed over the run.
+SUMMED_METRICS = (
+    'duration', 'detection_time', 'analysis_time', 'frames', 'bytes_decoded',
+)
+
+
+class RunReport:
+    """Machine-readable report of a batch run.
+
+    Each processed video is appended to a JSON lines file as soon as it
+    finishes, and the aggregate metrics of the run are appended when the
+    report is closed. Successive runs append to the same file, so that
+    throughput can be compared over time. Each line holds a `type`, "video"
+    or "run", and the `run` identifier, the start time of the run.
+
+    Optionally, the aggregate metrics are also written in the Prometheus text
+    format, to be scraped by the textfile collector of a node exporter. The
+    file is replaced atomically, so it is never read half-written.
+
+    Parameters
+    ----------
+    path : Path
+        The path to the JSON lines file.
+    textfile_path : Path, optional
+        The path to the Prometheus textfile, which should end in `.prom`.
+
+    Examples
+    --------
+    >>> with RunReport(path='report.jsonl') as report:  # doctest: +SKIP
+    ...     report.record('mouse1.mp4', 'done', duration=12.5, frames=1500)
+    """
+
+    def __init__(self, path: Path, textfile_path: Optional[Path] = None):
+        self.path = Path(path)
+        self.textfile_path = (
+            None if textfile_path is None else Path(textfile_path)
+        )
+        self.run = datetime.now().isoformat(timespec='seconds')
+        self._start = time.perf_counter()
+        self._statuses = {}
+        self._totals = dict.fromkeys(SUMMED_METRICS, 0)
+        self._cache_hits = 0
+        self._peak_memory = None
+
+    def record(self, video_id: str, status: str, **metrics):
+        """Append the outcome of a video to the report.
+
+        Parameters
+        ----------
+        video_id : str
+            The identifier of the video.
+        status : str
+            The status of the video, e.g. "done" or "failed".
+        **metrics
+            The metrics of the video. `duration`, `detection_time` and
+            `analysis_time` in seconds, `frames` and `bytes_decoded` are
+            summed over the run, `meta_reused` counts as a cache hit, and
+            the maximum `peak_memory` is kept.
+        """
+        self._statuses[status] = self._statuses.get(status, 0) + 1
+        for name in SUMMED_METRICS:
+            self._totals[name] += metrics.get(name) or 0
+        if metrics.get('meta_reused'):
+            self._cache_hits += 1
+        peak_memory = metrics.get('peak_memory')
+        if peak_memory is not None:
+            self._peak_memory = max(self._peak_memory or 0, peak_memory)
+        line = {'type': 'video', 'run': self.run, 'video': video_id,
+                'status': status}
+        line.update(metrics)
+        if metrics.get('frames') and metrics.get('detection_time'):
+            line['frames_per_s'] = (
+                metrics['frames'] / metrics['detection_time']
+            )
+        self._append(line)
+
+    def summary(self) -> dict:
+        """Returns the aggregate metrics of the videos recorded so far.
+
+        Returns
+        -------
+        dict
+            The number of videos of each status, the sums of the summed
+            metrics, the number of cache hits, the detection throughput in
+            frames per second, the maximum peak memory of a job in bytes, and
+            the time elapsed since the start of the run in seconds.
+        """
+        summary = {
+            'type': 'run',
+            'run': self.run,
+            'videos': sum(self._statuses.values()),
+            'statuses': dict(self._statuses),
+            'elapsed': time.perf_counter() - self._start,
+            'cache_hits': self._cache_hits,
+            'peak_memory': self._peak_memory,
+        }
+        summary.update(self._totals)
+        detection_time = self._totals['detection_time']
+        summary['frames_per_s'] = (
+            self._totals['frames'] / detection_time if detection_time else 0.
+        )
+        return summary
+
+    def close(self):
+        """Append the aggregate metrics and write the Prometheus textfile."""
+        summary = self.summary()
+        self._append(summary)
+        if self.textfile_path is not None:
+            self._write_textfile(summary=summary)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _append(self, line: dict):
+        parent = self.path.parent
+        if not os.path.exists(parent):
+            os.makedirs(parent)
+        with open(self.path, 'a') as f:
+            f.write(json.dumps(line) + '\n')
+
+    def _write_textfile(self, summary: dict):
+        gauges = [
+            ('videos', 'Videos processed by the last batch run, by status.',
+             [({'status': status}, count)
+              for status, count in sorted(summary['statuses'].items())]),
+            ('frames_decoded', 'Frames decoded by the last batch run.',
+             [({}, summary['frames'])]),
+            ('bytes_decoded', 'Bytes of decoded frames of the last batch '
+                              'run.',
+             [({}, summary['bytes_decoded'])]),
+            ('stage_seconds', 'Time spent in each stage by the jobs of the '
+                              'last batch run.',
+             [({'stage': 'detection'}, summary['detection_time']),
+              ({'stage': 'analysis'}, summary['analysis_time'])]),
+            ('run_seconds', 'Wall-clock duration of the last batch run.',
+             [({}, summary['elapsed'])]),
+            ('frames_per_second', 'Detection throughput of the last batch '
+                                  'run.',
+             [({}, summary['frames_per_s'])]),
+            ('cache_hits', 'Videos of the last batch run whose metadata was '
+                           'reused.',
+             [({}, summary['cache_hits'])]),
+            ('last_run_timestamp_seconds', 'Completion time of the last '
+                                           'batch run.',
+             [({}, time.time())]),
+        ]
+        if summary['peak_memory'] is not None:
+            gauges.append(
+                ('peak_memory_bytes', 'Peak resident memory of a job of the '
+                                      'last batch run.',
+                 [({}, summary['peak_memory'])])
+            )
+        lines = []
+        for name, description, samples in gauges:
+            name = f'movement_detector_{name}'
+            lines.append(f'# HELP {name} {description}')
+            lines.append(f'# TYPE {name} gauge')
+            for labels, value in samples:
+                labels = ','.join(
+                    f'{key}="{label}"' for key, label in labels.items()
+                )
+                if labels:
+                    labels = '{' + labels + '}'
+                lines.append(f'{name}{labels} {value}')
+        parent = self.textfile_path.parent
+        if not os.path.exists(parent):
+            os.makedirs(parent)
+        tmp_path = self.textfile_path.with_suffix('.tmp')
+        with open(tmp_path, 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+        os.replace(tmp_path, self.textfile_path)
@@ -1,6 +1,8 @@
 import os
 from pathlib import Path
-from typing import List
+from typing import List, Optional
+
+VIDEO_EXTENSIONS = ('.mp4', '.wmv')
 
 
 def get_project_path() -> Path:
@@ -17,6 +19,38 @@ def get_project_path() -> Path:
     return project_path
 
 
+def parse_settings(settings_path: Optional[Path] = None) -> dict:
+    """Reads the settings file.
+
+    Each line holds a setting in the format `name = value`. Values are
+    evaluated as Python literals when possible, and kept as strings otherwise.
+
+    Parameters
+    ----------
+    settings_path : Path, optional
+        The path to the settings file. Defaults to the project's
+        `settings.txt`.
+
+    Returns
+    -------
+    dict
+    """
+    if settings_path is None:
+        settings_path = get_project_path() / 'settings.txt'
+    settings = {}
+
+    with open(settings_path) as f:
+        for line in f:
+            key, value = line.split(' = ')
+            try:
+                value = eval(value)
+            except NameError:
+                pass
+            settings[key] = value
+
+    return settings
+
+
 def check_vid_path(vid_path):
     vid_path = os.path.realpath(vid_path)
     videos_path = str(get_project_path() / 'videos')
@@ -41,22 +75,39 @@ def get_video_mapped_path(vid_path, dir_suffix, file_extension):
     return data_path
 
 
+def get_video_id(vid_path) -> str:
+    """Returns the identifier of a video.
+
+    The identifier is the video's path relative to the videos folder, using
+    forward slashes.
+
+    Parameters
+    ----------
+    vid_path : Path
+        The path to the video file.
+
+    Returns
+    -------
+    str
+    """
+    vid_path = os.path.realpath(vid_path)
+    videos_path = os.path.realpath(get_project_path() / 'videos')
+    video_id = Path(os.path.relpath(vid_path, videos_path)).as_posix()
+    return video_id
+
+
 def get_video_paths() -> List[Path]:
-    videos_path = get_project_path() / 'videos'
-    vid_paths = []
-    for root, dirs, files in os.walk(videos_path):
-        for file in files:
-            path = os.path.join(root, file)
-            if _is_video_file(path=path):
-                vid_paths.append(path)
-    return vid_paths
+    """Returns the paths of the videos in the videos folder.
 
+    The folder is listed through the project's
+    :class:`movement_detector.discovery.VideoIndex`, which is updated on the
+    way.
+
+    Returns
+    -------
+    list of Path
+        The video paths, sorted.
+    """
+    from movement_detector.discovery import VideoIndex  # circular import
+    return VideoIndex().scan().videos
 
-def _is_video_file(path) -> bool:
-    path = str(path)
-    valid = True
-    if not os.path.isfile(path):
-        valid = False
-    elif not (path.endswith(('.mp4', '.wmv'))):
-        valid = False
-    return valid
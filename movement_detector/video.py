@@ -1,11 +1,14 @@
 from abc import ABC, abstractmethod
+import itertools
 import os
+import time
 from pathlib import Path
-from typing import Optional
+from typing import Optional, Union
 
 import cv2
 import numpy as np
 
+from movement_detector.cache import video_fingerprint
 from movement_detector.np_utils import get_dtype
 
 
@@ -24,6 +27,22 @@ class AbstractVideo(ABC):
     def __init__(self, file_path: Path):
         self.vid_path = os.path.realpath(file_path)
         self.vid_name = os.path.basename(self.vid_path)
+        self._fingerprint = None
+
+    @property
+    def fingerprint(self) -> str:
+        """A fingerprint of the video file's content.
+
+        Unlike `vid_path`, the fingerprint does not change when the video
+        file is renamed or moved.
+
+        Returns
+        -------
+        str
+        """
+        if self._fingerprint is None:
+            self._fingerprint = video_fingerprint(vid_path=self.vid_path)
+        return self._fingerprint
 
     @property
     @abstractmethod
@@ -90,6 +109,41 @@ class AbstractVideo(ABC):
         """
         pass
 
+    def iter_from(self, i: int, last_time: Optional[float] = None) -> iter:
+        """Iterates over the frames starting at frame i.
+
+        The default implementation reads and discards the frames preceding
+        frame i.
+
+        Parameters
+        ----------
+        i : int
+            Index of the first frame.
+        last_time : float, optional
+            The time of frame i - 1, as returned by `get_frame_time`, if
+            known. Implementations that seek use it to verify that they
+            landed on frame i.
+
+        Returns
+        -------
+        iterator
+        """
+        return itertools.islice(iter(self), i, None)
+
+    def skip_to(self, i: int):
+        """Prepares the video for the retrieval of frame i.
+
+        Implementations can skip the frames preceding frame i without
+        decoding them, so that a following call to `get_frame(i)` is cheap.
+        The default implementation does nothing.
+
+        Parameters
+        ----------
+        i : int
+            Index of the frame that will be retrieved next.
+        """
+        pass
+
     @abstractmethod
     def get_frame_time(self, i: Optional[int] = None) -> float:
         """Returns the video-time for the frame i in seconds.
@@ -148,6 +202,8 @@ class CvVideo(AbstractVideo):
     of the compute-intensive operations.
     """
     _precision_dtype = np.dtype('float32')
+    # beyond this many frames, seeking is assumed cheaper than grabbing
+    _max_grab_frames = 30
 
     def __init__(self, file_path: Path):
         super().__init__(file_path)
@@ -196,6 +252,34 @@ class CvVideo(AbstractVideo):
             self._current_frame = self._frame_count
             raise StopIteration
 
+    def iter_from(self, i: int, last_time: Optional[float] = None) -> iter:
+        """Iterates over the frames starting at frame i, seeking to it.
+
+        Seeking by frame index is inexact for some formats, e.g. H.264
+        streams in MP4 files. The seek is verified by reading frame i - 1 and
+        comparing its time to `last_time`, or to its nominal time if not
+        set. If they differ by half a frame or more, the frames preceding
+        frame i are read and discarded instead.
+        """
+        if i > 0:
+            if last_time is None:
+                last_time = (i - 1) / self._frame_rate
+            self._frames.set(cv2.CAP_PROP_POS_FRAMES, i - 1)
+            ret, _ = self._frames.read()
+            frame_time = self._frames.get(cv2.CAP_PROP_POS_MSEC) / 1000
+            if not ret or abs(frame_time - last_time) >= .5 / self._frame_rate:
+                yield from itertools.islice(iter(self), i, None)
+                return
+        else:
+            self._frames.set(cv2.CAP_PROP_POS_FRAMES, 0)
+        self._current_frame = i
+        while True:
+            ret, frame = self._frames.read()
+            if not ret:
+                self._current_frame = self._frame_count
+                return
+            yield frame
+
     def __len__(self) -> int:
         return self._frame_count
 
@@ -260,8 +344,190 @@ class CvVideo(AbstractVideo):
         self._current_frame += 1
         return frame
 
+    def skip_to(self, i: int):
+        """Advances to frame i, grabbing the frames in between when that is
+        cheaper than seeking.
+
+        Grabbed frames are still decoded, but they are not retrieved.
+        """
+        skipped = i - self._current_frame
+        if 0 < skipped <= self._max_grab_frames:
+            for _ in range(skipped):
+                self._frames.grab()
+            self._current_frame = i
+        elif skipped != 0:
+            self._frames.set(cv2.CAP_PROP_POS_FRAMES, i)
+            self._current_frame = i
+
     def get_frame_time(self, i: Optional[int] = None) -> float:
         if i is not None:
             self.get_frame(i=i)
         frame_time = self._frames.get(cv2.CAP_PROP_POS_MSEC) / 1000
         return frame_time
+
+
+class LiveVideo(AbstractVideo):
+    """Video that is still being recorded.
+
+    Follows a file that a recorder is still writing, or reads a local capture
+    device. The frames can only be read in order, by iterating over the
+    video, and the iteration ends when the recording does: when the file has
+    not grown for `idle_timeout` seconds, or when the device stops delivering
+    frames.
+
+    The recorder must write a format that can be read while it is written,
+    such as AVI or MPEG-TS, but not MP4, whose index is only written at the
+    end of the recording. The last frame read from a growing file may be
+    incomplete, so it is only returned once the following frame was read or
+    the recording ended. When the reader catches up with the recorder, the
+    file is reopened once it grows, and the reading resumes at the next frame.
+
+    Parameters
+    ----------
+    source : Path or int
+        The path to the video file, or the index of the capture device.
+    poll_interval : float, default .2
+        The time between checks for new frames in the file, in seconds.
+    idle_timeout : float, default 10
+        The time in seconds after which a file that stopped growing is
+        considered complete.
+    """
+
+    def __init__(
+            self,
+            source: Union[Path, int],
+            poll_interval: float = .2,
+            idle_timeout: float = 10.,
+    ):
+        self._device = isinstance(source, int)
+        if self._device:
+            self.vid_path = None
+            self.vid_name = f'device {source}'
+            self._fingerprint = None
+            self._source = source
+        else:
+            super().__init__(file_path=source)
+            self._source = self.vid_path
+        self.poll_interval = poll_interval
+        self.idle_timeout = idle_timeout
+        self._frames = cv2.VideoCapture(self._source)
+        if not self._frames.isOpened():
+            raise ValueError(f'Cannot open the video. Source: {source}.')
+        vid_height = int(self._frames.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        vid_width = int(self._frames.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self._frame_shape = (vid_height, vid_width, 3)
+        self._frame_rate = self._frames.get(cv2.CAP_PROP_FPS)
+        self._frame_count = 0
+        self._frame_time = None
+        self._held = None  # the last frame read and its time
+        self._size = None if self._device else os.path.getsize(self._source)
+        self._start = None
+
+    @property
+    def vid_duration(self) -> float:
+        """The duration of the frames read so far in seconds."""
+        return self._frame_count / self._frame_rate
+
+    @property
+    def frame_shape(self) -> tuple:
+        return self._frame_shape
+
+    @property
+    def frame_rate(self) -> float:
+        return self._frame_rate
+
+    def __iter__(self) -> iter:
+        """Iterates over the frames that were not read yet."""
+        return self
+
+    def __next__(self) -> np.ndarray:
+        if self._device:
+            ret, frame = self._frames.read()
+            if not ret:
+                raise StopIteration
+            now = time.monotonic()
+            if self._start is None:
+                self._start = now
+            return self._next_frame(frame=frame, frame_time=now - self._start)
+        while True:
+            ret, frame = self._frames.read()
+            if ret:
+                frame_time = self._frames.get(cv2.CAP_PROP_POS_MSEC) / 1000
+                held, self._held = self._held, (frame, frame_time)
+                if held is not None:
+                    return self._next_frame(*held)
+            elif self._wait_for_growth():
+                self._reopen()
+            elif self._held is not None:
+                held, self._held = self._held, None
+                return self._next_frame(*held)
+            else:
+                raise StopIteration
+
+    def __len__(self) -> int:
+        """The number of frames read so far."""
+        return self._frame_count
+
+    def __getitem__(self, item) -> np.ndarray:
+        raise NotImplementedError(
+            'The frames of a live video can only be read in order.'
+        )
+
+    def get_frame(self, i: int) -> np.ndarray:
+        raise NotImplementedError(
+            'The frames of a live video can only be read in order.'
+        )
+
+    def get_frame_time(self, i: Optional[int] = None) -> float:
+        """Returns the time of the last frame read in seconds.
+
+        For capture devices, the time is measured from the first frame.
+        """
+        if i is not None and i != self._frame_count - 1:
+            raise NotImplementedError(
+                'Only the time of the last frame read is available.'
+            )
+        return self._frame_time
+
+    def sum(self) -> np.ndarray:
+        raise NotImplementedError('The video is still being recorded.')
+
+    def mean(self) -> np.ndarray:
+        raise NotImplementedError('The video is still being recorded.')
+
+    def std(self) -> np.ndarray:
+        raise NotImplementedError('The video is still being recorded.')
+
+    def _next_frame(self, frame: np.ndarray, frame_time: float) -> np.ndarray:
+        self._frame_count += 1
+        self._frame_time = frame_time
+        return frame
+
+    def _wait_for_growth(self) -> bool:
+        """Waits for the file to grow.
+
+        Returns
+        -------
+        bool
+            True if the file grew, False if it did not grow for
+            `idle_timeout` seconds or is a device.
+        """
+        if self._device:
+            return False
+        deadline = time.monotonic() + self.idle_timeout
+        while True:
+            size = os.path.getsize(self._source)
+            if size != self._size:
+                self._size = size
+                return True
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(self.poll_interval)
+
+    def _reopen(self):
+        """Reopens the file at the first frame that was not returned."""
+        self._frames.release()
+        self._frames = cv2.VideoCapture(self._source)
+        self._held = None
+        if self._frame_count:
+            self._frames.set(cv2.CAP_PROP_POS_FRAMES, self._frame_count)
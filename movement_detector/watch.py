@@ -0,0 +1,284 @@
+"""Watch-folder daemon processing the videos as they are copied.
+
+Polls the videos folder and runs the detection and the analysis of new and
+changed videos once their files stop growing::
+
+    python -m movement_detector.watch --max-workers 4
+
+The results are ready by the time the videos are opened in the viewer.
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from pathlib import Path
+from typing import Dict, Optional, Sequence
+
+from movement_detector.batch import MemoryBudget
+from movement_detector.cli import (
+    get_analyzer_kwargs, get_detector_kwargs, memory_estimates, process_video
+)
+from movement_detector.discovery import VideoIndex
+from movement_detector.utils import get_video_id, parse_settings
+
+
+class FolderWatcher:
+    """Processes the videos of the videos folder as they land.
+
+    Each poll rescans the folder with a :class:`VideoIndex`. New and changed
+    videos are held back until their size and modification time are the same
+    for `stable_polls` consecutive polls, so that files still being copied
+    are not processed. Stable videos are then queued and processed by a pool
+    of at most `max_workers` processes. A video that changes while being
+    processed is queued again once its job ends. When `max_queued` videos
+    are waiting for a worker, the folder is not rescanned until the queue
+    drains.
+
+    On the first poll, all the videos in the folder are queued. Videos that
+    were already processed are skipped quickly, since existing metadata and
+    up-to-date analyses are reused, unless the video changed since, see
+    :func:`movement_detector.batch.detect_video`.
+
+    Parameters
+    ----------
+    settings : dict
+        The settings, as returned by :func:`parse_settings`.
+    index : VideoIndex, optional
+        The discovery index of the folder. Defaults to the project's index.
+    poll_interval : float, default 10
+        The time between polls in seconds.
+    stable_polls : int, default 2
+        The number of polls for which a file must not change before it is
+        processed.
+    max_workers : int, optional
+        The number of worker processes. Defaults to the number of
+        processors.
+    max_queued : int, optional
+        The number of stable videos waiting for a worker above which the
+        folder is not rescanned. Defaults to twice the number of workers.
+    memory_budget : int, optional
+        The memory in bytes that the videos processed at once may use,
+        according to their estimates, see :class:`MemoryBudget`. The largest
+        queued video that fits in the remaining budget is started first.
+    """
+
+    def __init__(
+            self,
+            settings: dict,
+            index: Optional[VideoIndex] = None,
+            poll_interval: float = 10,
+            stable_polls: int = 2,
+            max_workers: Optional[int] = None,
+            max_queued: Optional[int] = None,
+            memory_budget: Optional[int] = None,
+    ):
+        if index is None:
+            index = VideoIndex()
+        if max_workers is None:
+            max_workers = os.cpu_count() or 1
+        if max_queued is None:
+            max_queued = 2 * max_workers
+        self.index = index
+        self.poll_interval = poll_interval
+        self.stable_polls = stable_polls
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self.budget = MemoryBudget(budget=memory_budget)
+        self._estimates = {}
+        self.detector_kwargs = get_detector_kwargs(settings=settings)
+        self.analyzer_kwargs = get_analyzer_kwargs(settings=settings)
+        self._settling = {}  # path -> (file state, unchanged poll count)
+        self._queue = deque()
+        self._running = {}  # job -> (path, memory estimate)
+        self._first_poll = True
+
+    @property
+    def queued(self) -> int:
+        """The number of stable videos waiting for a worker."""
+        return len(self._queue)
+
+    def poll(self):
+        """Rescan the folder and queue the videos that stopped changing."""
+        if len(self._queue) >= self.max_queued:
+            return  # backpressure, the workers are behind
+        result = self.index.scan()
+        candidates = result.new + result.changed
+        if self._first_poll:
+            candidates = result.videos
+            self._first_poll = False
+        for path in candidates:
+            self._settling[path] = (None, 0)
+        for path in result.removed:
+            self._settling.pop(path, None)
+        for path, (state, count) in list(self._settling.items()):
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                del self._settling[path]
+                continue
+            new_state = (stat.st_size, stat.st_mtime_ns)
+            count = count + 1 if new_state == state else 0
+            if count >= self.stable_polls and path in self._running_paths():
+                # queued again once the running job ends
+                self._settling[path] = (new_state, count)
+            elif count >= self.stable_polls:
+                del self._settling[path]
+                if path not in self._queue:
+                    self._queue.append(path)
+            else:
+                self._settling[path] = (new_state, count)
+
+    def run(
+            self,
+            stop_event: Optional[threading.Event] = None,
+            max_polls: Optional[int] = None,
+    ) -> Dict[str, str]:
+        """Poll the folder and process the videos until stopped.
+
+        The videos being processed when the watcher is stopped are completed
+        before returning.
+
+        Parameters
+        ----------
+        stop_event : threading.Event, optional
+            Set to stop watching.
+        max_polls : int, optional
+            Stop after this number of polls.
+
+        Returns
+        -------
+        dict
+            The status, "done" or "failed", of each processed video, keyed by
+            video identifier.
+        """
+        if stop_event is None:
+            stop_event = threading.Event()
+        statuses = {}
+        polls = 0
+        next_poll = time.monotonic()
+        running = self._running
+        with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+            while not stop_event.is_set():
+                if time.monotonic() >= next_poll:
+                    self.poll()
+                    polls += 1
+                    next_poll = time.monotonic() + self.poll_interval
+                while self._queue and len(running) < self.max_workers:
+                    path, estimate = self._next_video()
+                    if path is None:
+                        break
+                    self._queue.remove(path)
+                    self._estimates.pop(path, None)
+                    self.budget.reserve(estimate=estimate)
+                    job = executor.submit(
+                        process_video,
+                        path, self.detector_kwargs, self.analyzer_kwargs,
+                    )
+                    running[job] = (path, estimate)
+                if max_polls is not None and polls >= max_polls:
+                    break
+                timeout = max(next_poll - time.monotonic(), 0)
+                if running:
+                    done, _ = wait(
+                        running, timeout=timeout, return_when=FIRST_COMPLETED
+                    )
+                    for job in done:
+                        self._record(job, *running.pop(job), statuses)
+                else:
+                    stop_event.wait(timeout)
+            for job in list(running):
+                job.exception()  # wait for completion
+                self._record(job, *running.pop(job), statuses)
+        return statuses
+
+    def _next_video(self) -> tuple:
+        """Returns the largest queued video that fits in the memory budget.
+
+        Returns
+        -------
+        tuple
+            The path and memory estimate of the video, or None and zero if
+            no queued video fits. Without a budget, the first queued video.
+        """
+        if self.budget.budget is None:
+            return self._queue[0], 0
+        missing = [path for path in self._queue if path not in self._estimates]
+        if missing:
+            self._estimates.update(memory_estimates(vid_paths=missing))
+        fitting = [
+            path for path in self._queue
+            if self.budget.admits(estimate=self._estimates[path])
+        ]
+        if not fitting:
+            return None, 0
+        path = max(fitting, key=self._estimates.get)  # first among equals
+        return path, self._estimates[path]
+
+    def _running_paths(self) -> set:
+        return {path for path, _ in self._running.values()}
+
+    def _record(self, job, path, estimate, statuses):
+        self.budget.release(estimate=estimate)
+        video_id = get_video_id(path)
+        error = job.exception()
+        if error is None:
+            statuses[video_id] = 'done'
+            print(f'{video_id} done in {job.result().duration:.1f}s')
+        else:
+            statuses[video_id] = 'failed'
+            print(f'{video_id} failed: {error!r}')
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description='Process the videos copied into the videos folder as '
+                    'they land.'
+    )
+    parser.add_argument(
+        '--settings', type=Path, default=None,
+        help='The settings file. Defaults to the project\'s settings.txt.',
+    )
+    parser.add_argument(
+        '--interval', type=float, default=10,
+        help='The time between polls in seconds.',
+    )
+    parser.add_argument(
+        '--stable-polls', type=int, default=2,
+        help='The number of polls for which a file must not change before '
+             'it is processed.',
+    )
+    parser.add_argument(
+        '--max-workers', type=int, default=None,
+        help='The number of worker processes. Defaults to the number of '
+             'processors.',
+    )
+    parser.add_argument(
+        '--memory-budget', type=float, default=None,
+        help='The memory in GiB that the videos processed at once may use, '
+             'according to their estimated needs.',
+    )
+    args = parser.parse_args(argv)
+
+    watcher = FolderWatcher(
+        settings=parse_settings(settings_path=args.settings),
+        poll_interval=args.interval,
+        stable_polls=args.stable_polls,
+        max_workers=args.max_workers,
+        memory_budget=(
+            None if args.memory_budget is None
+            else int(args.memory_budget * 2 ** 30)
+        ),
+    )
+    print(f'Watching {watcher.index.videos_path}, press Ctrl+C to stop.')
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
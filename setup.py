@@ -62,6 +62,9 @@ setup(
     ],
     keywords='movement detection freezing behavioural behaviour behavioral'
              'behavior research',
+    entry_points={
+        'console_scripts': ['movement-detector=movement_detector.cli:main'],
+    },
     app=APP,
     data_files=DATA_FILES,
     options={'py2app': OPTIONS},
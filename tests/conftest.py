@@ -1,6 +1,9 @@
 import os
+import threading
+import time
 from pathlib import Path
 
+import cv2
 import numpy as np
 from typing import Sequence
 
@@ -46,12 +49,66 @@ def create_video(
     video.write_videofile(str(path), fps=frame_rate)
 
 
+def create_avi(
+        path: Path,
+        uniform_frame_values: Sequence,
+        frame_rate: float = 30,
+        resolution: tuple = (120, 160),
+):
+    """Writes an MJPEG AVI, a format that can be read while it is written."""
+    writer = cv2.VideoWriter(
+        str(path), cv2.VideoWriter_fourcc(*'MJPG'), frame_rate,
+        resolution[::-1],
+    )
+    for val in uniform_frame_values:
+        writer.write(np.full(resolution + (3,), val, dtype='uint8'))
+    writer.release()
+
+
+def grow_file(source: Path, path: Path, parts: int, pause: float):
+    """Copies a file in parts on a background thread, like a recorder."""
+    with open(source, 'rb') as f:
+        data = f.read()
+    part_size = len(data) // parts + 1
+    with open(path, 'wb') as f:
+        f.write(data[:part_size])  # the header must be readable at once
+
+    def write():
+        with open(path, 'ab') as f:
+            for start in range(part_size, len(data), part_size):
+                time.sleep(pause)
+                f.write(data[start:start + part_size])
+                f.flush()
+
+    thread = threading.Thread(target=write, daemon=True)
+    thread.start()
+    return thread
+
+
 def extract_frames(path: Path):
     vid = VideoFileClip(str(path))
     frames = np.array([f for f in vid.iter_frames()])
     return frames
 
 
+@pytest.fixture
+def detector_kwargs():
+    """The PixelChangeFD arguments used by the batch processing tests."""
+    return {
+        'outlier_change_threshold': .2,
+        'flag_outliers_buffer': 2,
+        'movement_threshold': .6,
+        'freezing_buffer': 3,
+        'blur_ksize': 5,
+    }
+
+
+@pytest.fixture
+def batch_settings(detector_kwargs):
+    """Settings of a batch run, as returned by `parse_settings`."""
+    return dict(intervals=[1], **detector_kwargs)
+
+
 @pytest.fixture
 def uniform_frame_values_video(request):
     if hasattr(request, 'param'):
@@ -2,8 +2,13 @@ import os
 
 import pytest
 import numpy as np
+import pandas as pd
 
-from movement_detector import PixelChangeFD, IntervalAggregatorMA
+from movement_detector import (
+    PixelChangeFD, IntervalAggregatorMA, IntervalStatisticsMA, SegmentsMA,
+    SlidingWindowMA, StreamingIntervalAggregatorMA,
+)
+from movement_detector.analysis import IntervalPrefixSums, freezing_ratio
 
 
 # ======================== IntervalAggregatorMA ================================
@@ -134,3 +139,244 @@ def test_interval_aggregation_functions(
     assert analysis.loc[0, 'moving'] == 60
     assert analysis.loc[1, 'moving'] == 29
     assert analysis.loc[2, 'moving'] == 60
+
+
+@pytest.mark.parametrize(
+    'aggregation', [np.mean, np.sum, len, freezing_ratio]
+)
+def test_prefix_sums_match_groupby(aggregation):
+    np.random.seed(42)
+    time = np.cumsum(np.random.uniform(0, .1, 500))
+    df = pd.DataFrame({
+        'time': time,
+        'moving': np.random.randint(0, 2, 500).astype(bool),
+    })
+    engine = IntervalPrefixSums.from_meta(df=df)
+    for edges in ([0, 1, 5, 10], [2.5, 3, 3.01, 20, time[-1]], [0, time[0]]):
+        expected = df['moving'].groupby(pd.cut(df['time'], bins=edges))
+        expected = expected.aggregate(aggregation)
+        statistic = IntervalPrefixSums.statistic_name(aggregation)
+        result = engine.aggregate(edges=edges, statistic=statistic)
+
+        assert np.allclose(result.values, expected.values, equal_nan=True)
+        assert list(map(str, result.index)) == list(map(str, expected.index))
+
+
+@pytest.mark.parametrize(
+    'uniform_frame_values_video',
+    ([0] * 120,),  # 4 seconds
+    indirect=True
+)
+def test_intervals_not_mutated(uniform_frame_values_video, detector_kwargs):
+    intervals = [1, 3]
+    analyzer_kwargs = {
+        'intervals': intervals,
+        'aggregation': lambda x: 1 - np.mean(x),
+    }
+    with IntervalAggregator(
+            video=uniform_frame_values_video,
+            detector_kwargs=detector_kwargs,
+            analyzer_kwargs=analyzer_kwargs,
+    ) as analyzer:
+        first = analyzer._analyze_meta(df=analyzer.detector._metadata)
+        second = analyzer._analyze_meta(df=analyzer.detector._metadata)
+
+    assert intervals == [1, 3]
+    assert len(first) == len(second) == 3
+
+
+@pytest.mark.parametrize(
+    'uniform_frame_values_video',
+    ([255, 0] * 30 + [0] * 60,),  # 2 seconds movement, 2 seconds freezing
+    indirect=True
+)
+def test_freezing_engine_reused(
+        uniform_frame_values_video, detector_kwargs, monkeypatch,
+):
+    detector = PixelChangeFD(
+        video=uniform_frame_values_video, **detector_kwargs
+    )
+    analyzer = IntervalAggregatorMA(
+        detector=detector, intervals=[2], aggregation=freezing_ratio,
+    )
+    detector.run()
+    builds = []
+    init = IntervalPrefixSums.__init__
+
+    def counting_init(self, *args, **kwargs):
+        builds.append(1)
+        init(self, *args, **kwargs)
+
+    monkeypatch.setattr(IntervalPrefixSums, '__init__', counting_init)
+    df = detector._metadata
+    expected = df['moving'].groupby(
+        pd.cut(df['time'], bins=analyzer.interval_edges())
+    ).aggregate(freezing_ratio)
+    first = analyzer._analyze_meta(df=df)
+    second = analyzer._analyze_meta(df=df)
+
+    assert np.allclose(first.values, expected.values)
+    assert np.allclose(second.values, first.values)
+    assert len(builds) == 1
+
+    detector.set_moving(index=len(df) - 1)
+    edited = analyzer._analyze_meta(df=df)
+
+    assert len(builds) == 2
+    assert edited.iloc[-1] < first.iloc[-1]
+
+    os.remove(str(detector.meta_path))
+
+
+# ========================= IntervalStatisticsMA ===============================
+
+@pytest.mark.parametrize(
+    'uniform_frame_values_video',
+    (
+            [255, 0] * 45       # 3 seconds movement
+            + [0] * 60          # 2 seconds freezing
+            + [255, 0] * 30,    # 2 second movement
+    ),
+    indirect=True
+)
+def test_interval_statistics(uniform_frame_values_video, detector_kwargs):
+    video = uniform_frame_values_video
+    detector = PixelChangeFD(video=video, **detector_kwargs)
+    analyzer = IntervalStatisticsMA(detector=detector, intervals=[2, 4])
+    analysis = analyzer.run()
+    mean_analysis = IntervalAggregatorMA(
+        detector=detector, intervals=[2, 4],
+    )._analyze_meta(df=detector._metadata)
+
+    assert list(analysis.columns) == list(analyzer.available_statistics)
+    assert list(analysis.index) == list(mean_analysis.index)
+    assert np.allclose(analysis['freezing'], 1 - mean_analysis)
+    assert list(analysis['freezing_bouts']) == [0, 1, 1]
+    assert np.isnan(analysis['freezing_latency'].iloc[0])
+    assert np.isclose(analysis['freezing_latency'].iloc[1], 1, atol=.1)
+    assert np.isclose(analysis['freezing_latency'].iloc[2], 0, atol=.1)
+    assert np.isclose(analysis['longest_freezing_bout'].iloc[1], 1, atol=.1)
+    assert np.isclose(analysis['longest_freezing_bout'].iloc[2], 1, atol=.1)
+
+    with pytest.raises(ValueError):
+        IntervalStatisticsMA(
+            detector=detector, intervals=[2], statistics=['unknown'],
+        )
+
+    os.remove(str(analyzer.analysis_path))
+    os.remove(str(detector.meta_path))
+
+
+# ============================ SegmentsMA ======================================
+
+@pytest.mark.parametrize(
+    'uniform_frame_values_video',
+    (
+            [255, 0] * 45       # 3 seconds movement
+            + [0] * 60          # 2 seconds freezing
+            + [255, 0] * 30,    # 2 second movement
+    ),
+    indirect=True
+)
+def test_segments_analysis(uniform_frame_values_video, detector_kwargs):
+    video = uniform_frame_values_video
+    detector = PixelChangeFD(video=video, **detector_kwargs)
+    analyzer = SegmentsMA(detector=detector)
+    analysis = analyzer.run()
+
+    assert analyzer.analysis_path.stem.endswith('_segments')
+    assert os.path.exists(analyzer.analysis_path)
+    assert list(analysis['moving']) == [True, False, True]
+    assert np.isclose(analysis.loc[1, 'duration'], 2, atol=.1)
+    assert analysis.loc[1, 'change_ratio'] < detector_kwargs[
+        'movement_threshold'
+    ]
+
+    os.remove(str(analyzer.analysis_path))
+    os.remove(str(detector.meta_path))
+
+
+# ========================== SlidingWindowMA ===================================
+
+@pytest.mark.parametrize(
+    'uniform_frame_values_video',
+    (
+            [255, 0] * 45       # 3 seconds movement
+            + [0] * 60          # 2 seconds freezing
+            + [255, 0] * 30,    # 2 second movement
+    ),
+    indirect=True
+)
+def test_sliding_window(uniform_frame_values_video, detector_kwargs):
+    video = uniform_frame_values_video
+    detector = PixelChangeFD(video=video, **detector_kwargs)
+    analyzer = SlidingWindowMA(detector=detector, window=2, step=.5)
+    analysis = analyzer.run()
+
+    assert np.allclose(analysis['start'], np.arange(0, 5.5, .5))
+    assert np.allclose(analysis['end'] - analysis['start'], 2)
+
+    df = detector._metadata
+    for _, window in analysis.iterrows():
+        in_window = (df['time'] > window['start']) & (
+                df['time'] <= window['end'])
+        expected = 1 - df.loc[in_window, 'moving'].mean()
+
+        assert window['frames'] == in_window.sum()
+        assert np.isclose(window['freezing'], expected)
+
+    os.remove(str(analyzer.analysis_path))
+    os.remove(str(detector.meta_path))
+
+
+# =================== StreamingIntervalAggregatorMA ============================
+
+@pytest.mark.parametrize(
+    'uniform_frame_values_video',
+    (
+            [255, 0] * 45       # 3 seconds movement
+            + [0] * 60          # 2 seconds freezing
+            + [255, 0] * 30,    # 2 second movement
+    ),
+    indirect=True
+)
+def test_streaming_interval_aggregation(
+        uniform_frame_values_video,
+        detector_kwargs,
+):
+    video = uniform_frame_values_video
+    detector = PixelChangeFD(video=video, **detector_kwargs)
+    detector.chunk_size = 20
+    finalized = []
+
+    def on_interval(interval, value):
+        finalized.append((interval, detector.meta_built))
+
+    analyzer = StreamingIntervalAggregatorMA(
+        detector=detector,
+        intervals=[2, 4],
+        on_interval=on_interval,
+    )
+    analysis = analyzer.run()
+
+    assert len(finalized) == 3
+    assert not finalized[0][1]  # finalized while the detector was running
+    assert not finalized[1][1]
+
+    expected = IntervalAggregatorMA(
+        detector=detector, intervals=[2, 4],
+    )._analyze_meta(df=detector._metadata)
+
+    assert list(analysis.index) == list(expected.index)
+    assert np.allclose(analysis.values, expected.values)
+
+    # re-running after an edit analyzes the current metadata
+    os.remove(str(analyzer.analysis_path))
+    detector.set_freezing(0)
+    detector.set_freezing(1)
+    edited = analyzer.run()
+
+    assert edited.iloc[0] < analysis.iloc[0]
+
+    os.remove(str(analyzer.analysis_path))
+    os.remove(str(detector.meta_path))
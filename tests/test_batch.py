@@ -0,0 +1,173 @@
+import os
+
+import pytest
+import numpy as np
+
+from movement_detector import PixelChangeFD, IntervalAggregatorMA
+from movement_detector.batch import (
+    analyze_cohort, detect_video, estimate_memory, MemoryBudget
+)
+from movement_detector.utils import get_video_id, get_video_mapped_path
+from movement_detector.video import CvVideo
+from tests.conftest import create_uniform_frames_video
+
+
+@pytest.mark.parametrize(
+    'uniform_frame_values_video',
+    ([255, 0] * 45 + [0] * 60,),
+    indirect=True
+)
+def test_analyze_cohort(uniform_frame_values_video, detector_kwargs):
+    video = uniform_frame_values_video
+    detector = PixelChangeFD(video=video, **detector_kwargs)
+    detector.run()
+    analyzer_kwargs = {'intervals': [2], 'aggregation': np.mean}
+    cohort_kwargs = {
+        'detector_cls': PixelChangeFD,
+        'detector_kwargs': detector_kwargs,
+        'analyzer_cls': IntervalAggregatorMA,
+        'analyzer_kwargs': analyzer_kwargs,
+        'vid_paths': [video.vid_path],
+    }
+
+    cohort = analyze_cohort(max_workers=2, **cohort_kwargs)
+    expected = IntervalAggregatorMA(
+        detector=detector, **analyzer_kwargs
+    )._analyze_meta(df=detector._metadata)
+
+    assert list(cohort.columns) == ['video', 'time', 'moving']
+    assert (cohort['video'] == get_video_id(video.vid_path)).all()
+    assert np.allclose(cohort['moving'], expected.values)
+
+    # a valid saved analysis is reused without opening the video
+    reused = analyze_cohort(
+        max_workers=1, video_cls=_fail_video, **cohort_kwargs
+    )
+
+    assert reused.equals(cohort)
+
+    # changing the analyzer's parameters recomputes the analysis
+    cohort_kwargs['analyzer_kwargs'] = {
+        'intervals': [1, 2], 'aggregation': np.mean
+    }
+    with pytest.raises(AssertionError):
+        analyze_cohort(max_workers=1, video_cls=_fail_video, **cohort_kwargs)
+    recomputed = analyze_cohort(max_workers=1, **cohort_kwargs)
+
+    assert len(recomputed) == len(cohort) + 1
+
+    analysis_path = IntervalAggregatorMA.get_analysis_path(video.vid_path)
+    os.remove(str(analysis_path))
+    os.remove(str(analysis_path.with_suffix('.params')))
+    os.remove(str(detector.meta_path))
+
+
+def test_analyze_cohort_skips_videos_without_meta(
+        uniform_frame_values_video, detector_kwargs
+):
+    cohort = analyze_cohort(
+        detector_cls=PixelChangeFD,
+        detector_kwargs=detector_kwargs,
+        analyzer_cls=IntervalAggregatorMA,
+        analyzer_kwargs={'intervals': [1]},
+        vid_paths=[uniform_frame_values_video.vid_path],
+        max_workers=1,
+    )
+
+    assert len(cohort) == 0
+
+
+@pytest.mark.parametrize(
+    'uniform_frame_values_video', ([255, 0] * 15,), indirect=True
+)
+def test_detect_video(uniform_frame_values_video, detector_kwargs):
+    vid_path = uniform_frame_values_video.vid_path
+    args = (vid_path, CvVideo, PixelChangeFD, detector_kwargs)
+    meta_path = get_video_mapped_path(vid_path, 'meta', '.csv')
+
+    assert detect_video(*args) is not None
+    assert detect_video(*args) is None  # the metadata is reused
+
+    # the metadata of a replaced video is rebuilt
+    create_uniform_frames_video(path=vid_path, uniform_frame_values=[0] * 30)
+    detector = detect_video(*args)
+
+    assert detector is not None
+    assert not detector.meta(start=0, stop=len(detector.video))['moving'].any()
+
+    os.remove(str(meta_path))
+    os.remove(str(meta_path.with_suffix('.params')))
+
+
+@pytest.mark.parametrize(
+    'uniform_frame_values_video',
+    ([255, 0] * 15,),
+    indirect=True
+)
+def test_detect_video_keeps_reviewed_meta(
+        uniform_frame_values_video, detector_kwargs,
+):
+    vid_path = uniform_frame_values_video.vid_path
+    changed_kwargs = dict(detector_kwargs, movement_threshold=.1)
+    meta_path = get_video_mapped_path(vid_path, 'meta', '.csv')
+    digest_path = meta_path.with_suffix('.params')
+    detect_video(vid_path, CvVideo, PixelChangeFD, detector_kwargs)
+
+    # reviewed after the detection
+    detector = PixelChangeFD(
+        video=uniform_frame_values_video, **detector_kwargs
+    )
+    detector.run()
+    detector.set_freezing(index=0)
+    detector.save_meta()
+
+    assert not os.path.exists(str(digest_path))
+    assert detect_video(
+        vid_path, CvVideo, PixelChangeFD, changed_kwargs
+    ) is None
+
+    # reviewed with a stale digest
+    with open(str(digest_path), 'w') as f:
+        f.write('stale')
+
+    assert detect_video(
+        vid_path, CvVideo, PixelChangeFD, changed_kwargs
+    ) is None
+    assert not os.path.exists(str(digest_path))
+    reviewed = PixelChangeFD(
+        video=uniform_frame_values_video, **detector_kwargs
+    )
+    reviewed.run()
+    assert reviewed.meta(start=0, stop=1)['manual_set'].iloc[0]
+
+    os.remove(str(meta_path))
+
+
+def _fail_video(file_path):
+    raise AssertionError('The saved analysis should have been reused.')
+
+
+def test_memory_budget():
+    budget = MemoryBudget(budget=100)
+
+    assert budget.admits(estimate=150)  # nothing is running
+
+    budget.reserve(estimate=60)
+
+    assert budget.admits(estimate=40)
+    assert not budget.admits(estimate=41)
+
+    budget.release(estimate=60)
+
+    assert budget.admits(estimate=150)
+    assert MemoryBudget().admits(estimate=10 ** 12)
+
+
+def test_estimate_memory(uniform_frame_values_video):
+    video = uniform_frame_values_video
+    estimate = estimate_memory(video=video, buffer_depth=2, base_memory=0)
+
+    assert estimate > 2 * np.prod(video.frame_shape)
+    assert estimate < video.size
+    assert (estimate_memory(video=video, buffer_depth=2, base_memory=100)
+            == estimate + 100)
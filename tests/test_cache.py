@@ -0,0 +1,166 @@
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from movement_detector import CvVideo, PixelChangeFD, IntervalAggregatorMA
+from movement_detector.cache import (
+    ResultCache, video_fingerprint, parameters_hash
+)
+
+def test_fingerprint_independent_of_path(uniform_frame_values_video, tmp_path):
+    video = uniform_frame_values_video
+    copy_path = tmp_path / 'renamed.mp4'
+    shutil.copyfile(video.vid_path, copy_path)
+
+    assert video_fingerprint(video.vid_path) == video_fingerprint(copy_path)
+    assert video.fingerprint == video_fingerprint(copy_path)
+
+
+def test_parameters_hash():
+    assert (parameters_hash({'a': 1, 'b': [1, 2]})
+            == parameters_hash({'b': [1, 2], 'a': 1}))
+    assert parameters_hash({'a': 1}) != parameters_hash({'a': 2})
+    assert (parameters_hash({'f': lambda x: np.mean(x)})
+            != parameters_hash({'f': lambda x: 1 - np.mean(x)}))
+    assert parameters_hash({'f': np.mean}) != parameters_hash({'f': np.sum})
+
+
+def test_cache_lru_eviction(tmp_path):
+    src = tmp_path / 'result.csv'
+    src.write_text('x' * 100)
+    cache = ResultCache(cache_dir=tmp_path / 'cache', max_bytes=250)
+
+    cache.put(fingerprint='vid', parameters={'p': 1}, file_path=src)
+    cache.put(fingerprint='vid', parameters={'p': 2}, file_path=src)
+
+    assert len(cache.entries('vid')) == 2
+    assert cache.get(fingerprint='vid', parameters={'p': 1}) is not None
+
+    cache.put(fingerprint='vid', parameters={'p': 3}, file_path=src)
+
+    assert cache.total_size <= 250
+    assert cache.get(fingerprint='vid', parameters={'p': 1}) is not None
+    assert cache.get(fingerprint='vid', parameters={'p': 2}) is None
+    assert cache.get(fingerprint='vid', parameters={'p': 3}) is not None
+
+    reloaded = ResultCache(cache_dir=tmp_path / 'cache', max_bytes=250)
+
+    assert len(reloaded.entries('vid')) == 2
+
+
+def test_detector_cache(
+        uniform_frame_values_video, detector_kwargs, tmp_path, monkeypatch,
+):
+    video = uniform_frame_values_video
+    cache = ResultCache(cache_dir=tmp_path / 'cache')
+    detector = PixelChangeFD(video=video, cache=cache, **detector_kwargs)
+    detector.run()
+    os.remove(detector.meta_path)
+
+    renamed_path = video.vid_path[:-len('.mp4')] + '_renamed.mp4'
+    shutil.copyfile(video.vid_path, renamed_path)
+    renamed_video = CvVideo(file_path=renamed_path)
+
+    def fail_build(self):
+        raise AssertionError('Metadata should have been cached.')
+
+    with monkeypatch.context() as m:
+        m.setattr(PixelChangeFD, '_build_meta', fail_build)
+        renamed_detector = PixelChangeFD(
+            video=renamed_video, cache=cache, **detector_kwargs
+        )
+        renamed_detector.run()
+
+    assert cache.hits == 1
+    assert renamed_detector.meta_digest() == detector.meta_digest()
+
+    changed_kwargs = dict(detector_kwargs, movement_threshold=.1)
+    changed_detector = PixelChangeFD(
+        video=renamed_video, cache=cache, **changed_kwargs
+    )
+    changed_detector.run()
+
+    assert cache.misses == 2
+    assert len(cache.entries(video.fingerprint)) == 2
+
+    os.remove(renamed_detector.meta_path)
+    os.remove(renamed_path)
+
+
+def test_analyzer_cache(uniform_frame_values_video, detector_kwargs, tmp_path):
+    video = uniform_frame_values_video
+    cache = ResultCache(cache_dir=tmp_path / 'cache')
+    detector = PixelChangeFD(video=video, cache=cache, **detector_kwargs)
+    mean_analyzer = IntervalAggregatorMA(
+        detector=detector, intervals=[1], aggregation=np.mean, cache=cache,
+    )
+    mean_analysis = mean_analyzer.run()
+    sum_analyzer = IntervalAggregatorMA(
+        detector=detector, intervals=[1], aggregation=np.sum, cache=cache,
+    )
+    sum_analysis = sum_analyzer.run()
+
+    assert not np.allclose(mean_analysis.values, sum_analysis.values)
+
+    detector.set_freezing(10)
+    edited_analysis = IntervalAggregatorMA(
+        detector=detector, intervals=[1], aggregation=np.sum, cache=cache,
+    ).run()
+
+    assert edited_analysis.iloc[0] == sum_analysis.iloc[0] - 1
+
+    os.remove(str(mean_analyzer.analysis_path))
+    os.remove(str(detector.meta_path))
+
+
+def test_detector_cache_keeps_reviewed_meta(
+        uniform_frame_values_video, detector_kwargs, tmp_path
+):
+    video = uniform_frame_values_video
+    detector = PixelChangeFD(video=video, **detector_kwargs)
+    detector.run()
+    detector.set_freezing(0)
+    detector.save_meta()
+    cache = ResultCache(cache_dir=tmp_path / 'cache')
+
+    # the metadata on disk is loaded and cached, rather than rebuilt
+    cached_detector = PixelChangeFD(
+        video=video, cache=cache, **detector_kwargs
+    )
+    cached_detector.run()
+
+    assert cached_detector.meta(start=0, stop=1)['manual_set'].iloc[0]
+    assert cache.get(
+        fingerprint=video.fingerprint, parameters=detector.parameters
+    ) is not None
+
+    os.remove(detector.meta_path)
+
+
+def _put_results(cache_dir, src, worker, count):
+    cache = ResultCache(cache_dir=cache_dir)
+    for i in range(count):
+        cache.put(
+            fingerprint=f'vid{worker}', parameters={'p': i}, file_path=src
+        )
+
+
+def test_cache_shared_by_processes(tmp_path):
+    src = tmp_path / 'result.csv'
+    src.write_text('x')
+    cache_dir = tmp_path / 'cache'
+    with ProcessPoolExecutor(max_workers=4) as executor:
+        jobs = [
+            executor.submit(_put_results, cache_dir, src, worker, 10)
+            for worker in range(4)
+        ]
+        for job in jobs:
+            job.result()
+
+    cache = ResultCache(cache_dir=cache_dir)
+
+    for worker in range(4):
+        assert len(cache.entries(f'vid{worker}')) == 10
+    assert not list(cache_dir.glob('*.tmp'))
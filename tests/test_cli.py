@@ -0,0 +1,114 @@
+import json
+import os
+
+import pytest
+import numpy as np
+import pandas as pd
+
+from movement_detector.cli import run_batch, JobManifest, schedule_videos
+from movement_detector.telemetry import RunReport
+from movement_detector.analysis import IntervalAggregatorMA
+from movement_detector.utils import get_video_id, get_video_mapped_path
+
+
+@pytest.mark.parametrize(
+    'uniform_frame_values_video',
+    ([255, 0] * 15 + [0] * 30,),
+    indirect=True
+)
+def test_run_batch(uniform_frame_values_video, batch_settings, tmp_path):
+    vid_path = uniform_frame_values_video.vid_path
+    video_id = get_video_id(vid_path)
+    manifest_path = tmp_path / 'manifest.json'
+
+    with RunReport(path=tmp_path / 'report.jsonl') as report:
+        statuses = run_batch(
+            settings=batch_settings,
+            manifest_path=manifest_path,
+            vid_paths=[vid_path],
+            max_workers=1,
+            report=report,
+        )
+    meta_path = get_video_mapped_path(vid_path, 'meta', '.csv')
+    analysis_path = IntervalAggregatorMA.get_analysis_path(vid_path)
+    analysis = pd.read_csv(analysis_path)
+
+    assert statuses == {video_id: 'done'}
+    assert np.allclose(analysis['moving'], [0, 1], atol=.05)
+    with open(manifest_path) as f:
+        job = json.load(f)[video_id]
+    assert job['status'] == 'done'
+    assert job['peak_memory'] > 0
+    with open(tmp_path / 'report.jsonl') as f:
+        video, run = [json.loads(line) for line in f]
+    assert video['video'] == video_id
+    assert video['frames'] == len(uniform_frame_values_video)
+    assert not video['meta_reused']
+    assert video['detection_time'] > 0
+    assert run['statuses'] == {'done': 1}
+
+    # finished videos are skipped when resuming
+    statuses = run_batch(
+        settings=batch_settings,
+        manifest_path=manifest_path,
+        vid_paths=[vid_path],
+        max_workers=1,
+    )
+
+    assert statuses == {}
+
+    os.remove(str(analysis_path))
+    os.remove(str(analysis_path.with_suffix('.params')))
+    os.remove(str(meta_path))
+    os.remove(str(meta_path.with_suffix('.params')))
+
+
+def test_failed_videos_are_retried(uniform_frame_values_video, tmp_path):
+    vid_path = uniform_frame_values_video.vid_path
+    manifest = JobManifest(path=tmp_path / 'manifest.json')
+    manifest.mark_failed(vid_path=vid_path, error='error')
+
+    assert not JobManifest(path=manifest.path).is_done(vid_path=vid_path)
+
+    manifest.mark_done(vid_path=vid_path, duration=1.)
+
+    assert JobManifest(path=manifest.path).is_done(vid_path=vid_path)
+
+    # videos processed with other parameters are processed again
+    other = JobManifest(path=manifest.path, parameters='other')
+
+    assert not other.is_done(vid_path=vid_path)
+
+    # changed videos are processed again
+    with open(vid_path, 'ab') as f:
+        f.write(b'\0')
+
+    assert not JobManifest(path=manifest.path).is_done(vid_path=vid_path)
+
+
+def test_schedule_videos(uniform_frame_values_video, tmp_path):
+    vid_path = str(uniform_frame_values_video.vid_path)
+    missing_path = tmp_path / 'empty.mp4'
+    missing_path.touch()
+
+    assert schedule_videos([str(missing_path), vid_path]) == [
+        vid_path, str(missing_path)
+    ]
+
+
+def test_shared_manifest_merges_runners(uniform_frame_values_video, tmp_path):
+    vid_path = uniform_frame_values_video.vid_path
+    other_path = tmp_path / 'other.mp4'
+    other_path.touch()
+    path = tmp_path / 'manifest.json'
+    first = JobManifest(path=path, shared=True)
+    second = JobManifest(path=path, shared=True)
+
+    first.mark_done(vid_path=vid_path, duration=1.)
+    second.mark_done(vid_path=other_path, duration=1.)
+
+    manifest = JobManifest(path=path)
+
+    assert manifest.is_done(vid_path=vid_path)
+    assert manifest.is_done(vid_path=other_path)
+    assert sorted(os.listdir(str(tmp_path))) == ['manifest.json', 'other.mp4']
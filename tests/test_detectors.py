@@ -1,9 +1,17 @@
+import asyncio
+import json
 import os
+import time
 
 import pytest
 import numpy as np
+import pandas as pd
 
 from movement_detector import PixelChangeFD
+from movement_detector.utils import get_project_path
+from movement_detector.video import CvVideo, LiveVideo
+
+from tests.conftest import create_avi, grow_file
 
 # =============================== BASE =========================================
 
@@ -113,6 +121,35 @@ def test_manual_set(cls_and_kwargs, uniform_frame_values_video):
     assert meta.loc[20, 'moving']
 
 
+@pytest.mark.parametrize('cls_and_kwargs', classes_and_kwargs)
+def test_segments(cls_and_kwargs, uniform_frame_values_video):
+    video = uniform_frame_values_video
+    cls, kwargs = cls_and_kwargs
+
+    with Detector(cls=cls, video=video, **kwargs) as detector:
+        moving = detector.meta(start=0, stop=len(video))['moving'].values
+        segments = detector.segments()
+
+        assert segments.loc[0, 'start'] == 0
+        assert segments['stop'].iloc[-1] == len(video)
+        assert np.array_equal(segments['start'][1:], segments['stop'][:-1])
+        for _, segment in segments.iterrows():
+            assert np.all(
+                moving[segment['start']:segment['stop']] == segment['moving']
+            )
+
+        for index in (0, 10, 11, len(video) - 1):
+            if moving[index]:
+                detector.set_freezing(index)
+            else:
+                detector.set_moving(index)
+            updated = detector.segments()
+            detector._segment_starts = None
+            rebuilt = detector.segments()
+
+            assert updated.equals(rebuilt)
+
+
 # =========================== PixelChangeFD ====================================
 
 class PixelChangeDetector:
@@ -274,3 +311,291 @@ def test_manual_set(video_from_frames):
     assert meta.loc[1, 'manual_set']
     assert meta.loc[len(video) - 2, 'moving']
     assert meta.loc[len(video) - 2, 'manual_set']
+
+
+@pytest.mark.parametrize(
+    'uniform_frame_values_video',
+    ([255, 0] * 30 + [0] * 30,),
+    indirect=True
+)
+def test_run_in_background(uniform_frame_values_video):
+    video = uniform_frame_values_video
+    kwargs = {
+        'outlier_change_threshold': .2,
+        'flag_outliers_buffer': 2,
+        'movement_threshold': .6,
+        'freezing_buffer': 3,
+        'blur_ksize': 5,
+    }
+    with PixelChangeDetector(video=video, **kwargs) as detector:
+        expected = detector.meta(start=0, stop=len(video))
+    detector = PixelChangeFD(video=video, **kwargs)
+    detector.chunk_size = 20
+    last = len(video) - 1
+
+    def set_last_frame(chunk):
+        # the last frame is set manually before it is processed
+        if chunk.index[0] == 0:
+            detector.set_moving(last)
+
+    detector.add_listener(set_last_frame)
+    detection = detector.run_in_background()
+
+    assert len(detector.meta(start=0, stop=len(video))) == len(video)
+
+    detection.result()
+    meta = detector.meta(start=0, stop=len(video))
+
+    assert detector.meta_built
+    assert meta.loc[last, 'moving']
+    assert meta.loc[last, 'manual_set']
+    assert not meta['manual_set'][:last].any()
+    assert np.array_equal(meta['moving'][:last], expected['moving'][:last])
+    assert np.allclose(meta['change_ratio'], expected['change_ratio'])
+    os.remove(detector.meta_path)
+
+
+def test_run_in_background_failure(uniform_frame_values_video):
+    detector = PixelChangeFD(
+        video=uniform_frame_values_video,
+        outlier_change_threshold=.2,
+        flag_outliers_buffer=2,
+        movement_threshold=.6,
+        freezing_buffer=3,
+        blur_ksize=5,
+    )
+
+    def fail():
+        raise RuntimeError('decoding failed')
+
+    detector._build_meta = fail
+    detection = detector.run_in_background()
+
+    with pytest.raises(RuntimeError, match='decoding failed'):
+        detection.result()
+    assert not os.path.exists(detector.meta_path)
+
+
+@pytest.mark.parametrize('uniform_frame_values_video', ([0, 255] * 5,),
+                         indirect=True)
+def test_profiling(uniform_frame_values_video):
+    video = uniform_frame_values_video
+    cls, kwargs = classes_and_kwargs[0]
+    detector = cls(video=video, **kwargs)
+    assert detector.profile is None
+    detector.enable_profiling(save=True)
+    detector.run()
+
+    stats = detector.profile.stats()
+    assert list(stats.columns) == ['count', 'total_s', 'mean_ms', 'share']
+    assert stats.loc['decode', 'count'] == len(video)
+    assert stats.loc['cvtColor', 'count'] == len(video)
+    assert stats.loc['contours', 'count'] == len(video) - 1
+    assert stats.loc['meta_write', 'count'] == 1
+    assert np.isclose(stats['share'].sum(), 1)
+    with open(detector.profile_path) as f:
+        saved = json.load(f)
+    assert saved['dilate']['count'] == len(video) - 1
+    os.remove(detector.profile_path)
+    os.remove(detector.meta_path)
+
+
+@pytest.mark.parametrize('uniform_frame_values_video', ([0, 255] * 30,),
+                         indirect=True)
+def test_run_async(uniform_frame_values_video):
+    video = uniform_frame_values_video
+    cls, kwargs = classes_and_kwargs[0]
+    detector = cls(video=video, **kwargs)
+    detector.run()
+    expected = detector.meta(start=0, stop=len(video))
+    os.remove(detector.meta_path)
+    detector = cls(video=video, **kwargs)
+    events = []
+    loop = asyncio.new_event_loop()
+    try:
+        final = loop.run_until_complete(detector.run_async(
+            progress=events.append, progress_interval=.001,
+        ))
+    finally:
+        loop.close()
+
+    assert detector.meta_built
+    assert events[-1] == final
+    assert final.frames_done == final.frame_count == len(video)
+    assert final.eta == 0
+    assert all(a.frames_done <= b.frames_done
+               for a, b in zip(events, events[1:]))
+    meta = detector.meta(start=0, stop=len(video))
+    assert np.array_equal(meta['moving'], expected['moving'])
+    os.remove(detector.meta_path)
+
+
+@pytest.mark.parametrize('uniform_frame_values_video', ([0, 255] * 30,),
+                         indirect=True)
+def test_cancel(uniform_frame_values_video):
+    video = uniform_frame_values_video
+    cls, kwargs = classes_and_kwargs[0]
+    detector = cls(video=video, **kwargs)
+    detector.chunk_size = 10
+    detector.add_listener(lambda chunk: detector.cancel())
+    detector.run()
+
+    assert detector.cancelled
+    assert not detector.meta_built
+    assert not os.path.exists(detector.meta_path)
+    meta = detector.meta(start=0, stop=len(video))
+    done = meta['time'].notna()
+    assert 10 <= done.sum() < len(video)
+    assert meta['change_ratio'][done].notna().all()
+
+    # the task running the detection is cancelled
+    loop = asyncio.new_event_loop()
+    try:
+        task = loop.create_task(detector.run_async())
+        detector.add_listener(
+            lambda chunk: loop.call_soon_threadsafe(task.cancel)
+        )
+        with pytest.raises(asyncio.CancelledError):
+            loop.run_until_complete(task)
+    finally:
+        loop.close()
+
+    assert detector.cancelled
+    assert not os.path.exists(detector.meta_path)
+
+    # a cancellation while the metadata is being loaded is not lost
+    detector = cls(video=video, **kwargs)
+    load_or_create_meta = detector._load_or_create_meta
+
+    def slow_load_or_create_meta():
+        time.sleep(.1)
+        return load_or_create_meta()
+
+    detector._load_or_create_meta = slow_load_or_create_meta
+
+    async def cancel_early():
+        run = asyncio.ensure_future(detector.run_async())
+        await asyncio.sleep(0)
+        detector.cancel()
+        return await run
+
+    loop = asyncio.new_event_loop()
+    try:
+        final = loop.run_until_complete(cancel_early())
+    finally:
+        loop.close()
+
+    assert detector.cancelled
+    assert final.frames_done == 0
+    assert not os.path.exists(detector.meta_path)
+
+
+@pytest.mark.parametrize(
+    'uniform_frame_values_video',
+    ([255, 0] * 15 + [0] * 20 + [255, 0] * 5,),
+    indirect=True
+)
+def test_checkpoint(uniform_frame_values_video):
+    video = uniform_frame_values_video
+    kwargs = {
+        'outlier_change_threshold': .2,
+        'flag_outliers_buffer': 2,
+        'movement_threshold': .6,
+        'freezing_buffer': 3,
+        'blur_ksize': 5,
+    }
+    detector = PixelChangeFD(video=video, **kwargs)
+    detector.run()
+    expected = detector.meta(start=0, stop=len(video))
+    os.remove(detector.meta_path)
+
+    class Crash(Exception):
+        pass
+
+    def crash(chunk):
+        if chunk.index[0] > 0:
+            raise Crash
+
+    detector = PixelChangeFD(video=video, checkpoint_interval=7, **kwargs)
+    detector.chunk_size = 20
+    detector.add_listener(crash)
+    with pytest.raises(Crash):
+        detector.run()
+
+    assert os.path.exists(detector.checkpoint_path)
+    assert not os.path.exists(detector.meta_path)
+
+    # the detection resumes from the last checkpoint
+    detector = PixelChangeFD(video=video, checkpoint_interval=7, **kwargs)
+    detector.enable_profiling()
+    detector.run()
+    meta = detector.meta(start=0, stop=len(video))
+
+    assert detector.profile.stats().loc['decode', 'count'] == len(video) - 35
+    assert not os.path.exists(detector.checkpoint_path)
+    for field in detector.meta_fields:
+        assert np.array_equal(meta[field], expected[field]), field
+
+    # checkpoints of other parameters are not resumed
+    os.remove(detector.meta_path)
+    detector = PixelChangeFD(video=video, checkpoint_interval=7, **kwargs)
+    detector.chunk_size = 20
+    detector.add_listener(crash)
+    with pytest.raises(Crash):
+        detector.run()
+    kwargs['blur_ksize'] = 3
+    detector = PixelChangeFD(video=video, checkpoint_interval=7, **kwargs)
+
+    assert detector._load_checkpoint() is None
+
+    os.remove(detector.checkpoint_path)
+
+
+def test_run_live(tmp_path):
+    # the recording pauses several times while the decisions for the
+    # freezing frames are pending
+    frame_vals = [255, 0] * 5 + [0] * 90
+    kwargs = {
+        'outlier_change_threshold': .2,
+        'flag_outliers_buffer': 2,
+        'movement_threshold': .6,
+        'freezing_buffer': 60,
+        'blur_ksize': 5,
+    }
+    vid_path = get_project_path() / 'videos' / 'live.avi'
+    try:
+        create_avi(path=vid_path, uniform_frame_values=frame_vals)
+        detector = PixelChangeFD(video=CvVideo(file_path=vid_path), **kwargs)
+        detector.run()
+        expected = detector.meta(start=0, stop=len(frame_vals))
+        os.remove(detector.meta_path)
+        live_path = tmp_path / 'live.avi'
+        writer = grow_file(source=vid_path, path=live_path, parts=4, pause=.5)
+    finally:
+        if os.path.exists(vid_path):
+            os.remove(vid_path)
+    video = LiveVideo(source=live_path, poll_interval=.02, idle_timeout=1)
+    detector = PixelChangeFD(video=video, **kwargs)
+    chunks = []
+    detector.run_live(callback=chunks.append, window=5, latency_budget=.2)
+    writer.join()
+    decisions = pd.concat(chunks)
+    final = decisions[decisions['final']]
+    provisional = decisions[~decisions['final']]
+
+    # the frames waiting for more frames are passed within the budget
+    assert len(provisional)
+    assert provisional['moving'].all()
+    first = decisions[~decisions.index.duplicated()]
+    assert np.array_equal(first.index, np.arange(len(frame_vals)))
+    assert (first['latency'] < .4).all()
+    # each frame is passed at most once provisionally and once final
+    assert not provisional.index.duplicated().any()
+    assert not final.index.duplicated().any()
+    # the final decisions match the offline detection
+    assert np.array_equal(final.index, np.arange(len(frame_vals)))
+    assert np.array_equal(final['moving'], expected['moving'])
+    assert np.allclose(final['change_ratio'], expected['change_ratio'])
+    meta = detector.meta(start=0, stop=len(frame_vals))
+    for field in detector.meta_fields:
+        assert np.array_equal(meta[field], expected[field]), field
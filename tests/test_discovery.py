@@ -0,0 +1,95 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from movement_detector.discovery import VideoIndex
+
+
+def _write(path, content: bytes):
+    os.makedirs(str(path.parent), exist_ok=True)
+    with open(str(path), 'wb') as f:
+        f.write(content)
+
+
+def test_scan(tmp_path):
+    videos_path = tmp_path / 'videos'
+    index_path = tmp_path / 'discovery.json'
+    first = videos_path / 'a.mp4'
+    second = videos_path / 'day 2' / 'b.wmv'
+    _write(first, b'first')
+    _write(second, b'second')
+    _write(videos_path / 'notes.txt', b'not a video')
+
+    result = VideoIndex(index_path=index_path, videos_path=videos_path).scan()
+
+    assert result.new == sorted([str(first), str(second)])
+    assert result.changed == result.removed == result.unchanged == []
+
+    index = VideoIndex(index_path=index_path, videos_path=videos_path)
+    fingerprint = index.fingerprint(vid_path=first)
+    result = index.scan()
+
+    assert result.new == result.changed == result.removed == []
+    assert result.videos == sorted([str(first), str(second)])
+    assert set(index.entries) == {'a.mp4', 'day 2/b.wmv'}
+
+    _write(first, b'first, modified')
+    os.remove(str(second))
+    third = videos_path / 'c.mp4'
+    _write(third, b'third')
+
+    index = VideoIndex(index_path=index_path, videos_path=videos_path)
+    result = index.scan()
+
+    assert result.new == [str(third)]
+    assert result.changed == [str(first)]
+    assert result.removed == [str(second)]
+    assert result.unchanged == []
+    assert index.fingerprint(vid_path=first) != fingerprint
+    assert index.fingerprint(vid_path=second) is None
+
+
+def test_scan_symlink_cycle(tmp_path):
+    videos_path = tmp_path / 'videos'
+    video = videos_path / 'day 1' / 'a.mp4'
+    _write(video, b'first')
+    os.symlink(str(videos_path), str(videos_path / 'day 1' / 'all'))
+
+    result = VideoIndex(
+        index_path=tmp_path / 'discovery.json', videos_path=videos_path
+    ).scan()
+
+    assert result.videos == [str(video)]
+
+
+def _scan_folder(index_path, videos_path):
+    return VideoIndex(index_path=index_path, videos_path=videos_path).scan()
+
+
+def test_scans_shared_by_processes(tmp_path):
+    index_path = tmp_path / 'discovery.json'
+    videos_path = tmp_path / 'videos'
+    for i in range(20):
+        _write(videos_path / f'{i}.mp4', str(i).encode())
+    with ProcessPoolExecutor(max_workers=4) as executor:
+        jobs = [
+            executor.submit(_scan_folder, index_path, videos_path)
+            for _ in range(8)
+        ]
+        for job in jobs:
+            assert len(job.result().videos) == 20
+
+    assert len(VideoIndex(index_path=index_path).entries) == 20
+    assert not list(tmp_path.glob('*.tmp'))
+
+
+def test_scans_merged(tmp_path):
+    index_path = tmp_path / 'discovery.json'
+    first = VideoIndex(index_path=index_path, videos_path=tmp_path / 'a')
+    second = VideoIndex(index_path=index_path, videos_path=tmp_path / 'b')
+    _write(tmp_path / 'a' / 'a.mp4', b'first')
+    _write(tmp_path / 'b' / 'b.mp4', b'second')
+
+    first.scan()
+    second.scan()
+
+    assert set(VideoIndex(index_path=index_path).entries) == {'a.mp4', 'b.mp4'}
@@ -0,0 +1,67 @@
+import os
+import time
+
+from movement_detector.leases import Lease
+
+
+def test_lease(uniform_frame_values_video):
+    vid_path = uniform_frame_values_video.vid_path
+    first = Lease(vid_path=vid_path)
+    second = Lease(vid_path=vid_path)
+
+    assert first.acquire()
+    assert not second.acquire()
+
+    first.release()
+
+    assert not os.path.exists(first.path)
+    with second:
+        assert second.acquired
+        assert not first.acquire()
+
+    assert not os.path.exists(second.path)
+
+
+def test_stale_lease_is_taken_over(uniform_frame_values_video):
+    vid_path = uniform_frame_values_video.vid_path
+    crashed = Lease(vid_path=vid_path, ttl=10)
+    crashed.acquire()
+    crashed._stop_heartbeat.set()  # the runner stops refreshing the lease
+    stale_time = time.time() - 11
+    os.utime(crashed.path, (stale_time, stale_time))
+    recovering = Lease(vid_path=vid_path, ttl=10)
+
+    assert recovering.acquire()
+
+    # the crashed runner does not remove the new lease
+    crashed.release()
+
+    assert os.path.exists(recovering.path)
+
+    recovering.release()
+
+
+def test_heartbeat_keeps_lease(uniform_frame_values_video):
+    vid_path = uniform_frame_values_video.vid_path
+    with Lease(vid_path=vid_path, ttl=.3) as lease:
+        time.sleep(.6)
+        other = Lease(vid_path=vid_path, ttl=.3)
+
+        assert lease.acquired
+        assert not other.acquire()
+
+
+def test_heartbeat_survives_stale_check(uniform_frame_values_video):
+    vid_path = uniform_frame_values_video.vid_path
+    with Lease(vid_path=vid_path, ttl=.3) as lease:
+        # another runner moved the lease aside to check whether it is stale
+        moved_path = lease.path.with_name(lease.path.name + '.moved')
+        os.rename(lease.path, moved_path)
+        time.sleep(.25)
+        os.rename(moved_path, lease.path)
+        stale_time = time.time() - 1
+        os.utime(lease.path, (stale_time, stale_time))
+        time.sleep(.25)
+
+        assert lease._heartbeat.is_alive()
+        assert time.time() - os.path.getmtime(lease.path) < .3
@@ -0,0 +1,238 @@
+import os
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import numpy as np
+import pandas as pd
+import pygame
+import pytest
+
+from movement_detector import PixelChangeFD
+from md_interface.interface import Interface
+from md_interface.playback import PlaybackScheduler
+from md_interface.readahead import FrameReadAhead
+from md_interface.timeline import Timeline
+
+
+class FakeClock:
+    def __init__(self):
+        self.time = 0.
+
+    def __call__(self):
+        return self.time
+
+
+class FakeVideo:
+    """Video whose frames are filled with their index."""
+
+    def __init__(self, frame_count: int = 100):
+        self._frame_count = frame_count
+        self.decoded = []
+
+    def __len__(self):
+        return self._frame_count
+
+    def skip_to(self, i: int):
+        pass
+
+    def get_frame(self, i: int) -> np.ndarray:
+        self.decoded.append(i)
+        return np.full((2, 2), i)
+
+
+def wait_until(condition, timeout: float = 2.):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'condition not met in time'
+        time.sleep(.005)
+
+
+def buffered(read_ahead: FrameReadAhead) -> list:
+    with read_ahead._condition:
+        return sorted(read_ahead._frames)
+
+
+# ========================== PlaybackScheduler =================================
+
+def test_scheduler_drops_frames():
+    clock = FakeClock()
+    scheduler = PlaybackScheduler(frame_rate=10, clock=clock)
+    scheduler.start(frame_index=5)
+
+    assert scheduler.target_frame() == 5
+
+    clock.time = .09
+    assert scheduler.target_frame() == 5
+
+    # rendering stalled, the frames in between are skipped
+    clock.time = .35
+    assert scheduler.target_frame() == 8
+
+
+def test_scheduler_catches_up():
+    clock = FakeClock()
+    scheduler = PlaybackScheduler(frame_rate=8, clock=clock)
+    scheduler.start(frame_index=0)
+    for t in (.125, .25, 1.25, 1.375):  # one slow frame
+        clock.time = t
+        scheduler.frame_presented()
+
+    # the schedule does not drift after the slow frame
+    assert scheduler.target_frame() == 11
+    assert np.isclose(scheduler.achieved_frame_rate, 3 / 1.25)
+
+    # changing the frame rate does not move the current frame
+    scheduler.frame_rate = 16
+    assert scheduler.target_frame() == 11
+    clock.time = 1.5
+    assert scheduler.target_frame() == 13
+
+    scheduler.stop()
+    assert not scheduler.playing
+    assert np.isnan(scheduler.achieved_frame_rate)
+
+
+# ============================ FrameReadAhead ==================================
+
+def test_read_ahead_eviction():
+    read_ahead = FrameReadAhead(video=FakeVideo(), depth=4)
+    read_ahead.seek(0)
+    wait_until(lambda: buffered(read_ahead) == [0, 1, 2, 3])
+
+    # read frames are kept until the buffer is full
+    assert read_ahead.get(0)[0, 0] == 0
+    assert read_ahead.get(2)[0, 0] == 2
+    wait_until(lambda: buffered(read_ahead) == [2, 3, 4, 5])
+
+    read_ahead.stop()
+
+
+def test_read_ahead_seek():
+    video = FakeVideo()
+    read_ahead = FrameReadAhead(video=video, depth=4)
+    read_ahead.seek(0)
+    wait_until(lambda: buffered(read_ahead) == [0, 1, 2, 3])
+
+    read_ahead.seek(50, direction=-1)
+    wait_until(lambda: buffered(read_ahead) == [47, 48, 49, 50])
+    assert read_ahead.get(50)[0, 0] == 50
+
+    read_ahead.stop()
+
+
+def test_read_ahead_jumps_to_playback():
+    video = FakeVideo()
+    read_ahead = FrameReadAhead(video=video, depth=4)
+    read_ahead.seek(0)
+    wait_until(lambda: buffered(read_ahead) == [0, 1, 2, 3])
+
+    # the playback skipped ahead of the worker
+    frame = read_ahead.get(40, timeout=2.)
+
+    assert frame[0, 0] == 40
+    assert not set(video.decoded) & set(range(4, 40))
+
+    read_ahead.stop()
+
+
+def test_read_ahead_restart():
+    read_ahead = FrameReadAhead(video=FakeVideo(), depth=4)
+    read_ahead.seek(0)
+    wait_until(lambda: buffered(read_ahead) == [0, 1, 2, 3])
+    read_ahead.stop()
+
+    read_ahead.seek(10)
+    wait_until(lambda: buffered(read_ahead) == [10, 11, 12, 13])
+
+    read_ahead.stop()
+
+
+# =============================== Timeline =====================================
+
+class FakeDetector:
+    def __init__(self, frame_count: int):
+        self.video = FakeVideo(frame_count=frame_count)
+        self.metadata = pd.DataFrame(
+            np.nan,
+            index=range(frame_count),
+            columns=['moving', 'flagged', 'manual_set'],
+        )
+
+    def meta(self, start: int, stop: int, field):
+        return self.metadata.iloc[start:stop][field]
+
+
+def test_timeline():
+    detector = FakeDetector(frame_count=40)
+    timeline = Timeline(detector=detector, width=10, height=8)
+    timeline.update()
+
+    def column_colour(x: int, y: int = 4) -> tuple:
+        return tuple(timeline.surface.get_at((x, y)))[:3]
+
+    assert column_colour(0) == Timeline.loading_colour
+
+    # the first 20 frames arrive, 4 frames per column
+    detector.metadata.loc[:19, ['moving', 'flagged', 'manual_set']] = 0
+    detector.metadata.loc[:2, 'moving'] = 1
+    detector.metadata.loc[5, 'moving'] = 1
+    detector.metadata.loc[9, 'flagged'] = 1
+    timeline.update(start=0, stop=20)
+    version = timeline.version
+
+    assert column_colour(0) == Timeline.moving_colour
+    assert column_colour(1) == Timeline.freezing_colour
+    assert column_colour(2, y=0) == Timeline.flagged_colour
+    assert column_colour(2) == Timeline.freezing_colour
+    assert column_colour(5) == Timeline.loading_colour
+
+    # editing a frame only updates its column
+    detector.metadata.loc[13, 'manual_set'] = 1
+    timeline.update(start=13, stop=14)
+
+    assert timeline.version == version + 1
+    assert column_colour(3, y=7) == Timeline.manual_set_colour
+
+    assert timeline.frame_at(x=0) == 0
+    assert timeline.frame_at(x=5) == 20
+    assert timeline.frame_at(x=12) == 39
+
+
+# ============================== Interface =====================================
+
+@pytest.mark.parametrize(
+    'uniform_frame_values_video',
+    ([0] * 30,),
+    indirect=True
+)
+def test_playback_skips_in_read_ahead(
+        uniform_frame_values_video, detector_kwargs,
+):
+    detector = PixelChangeFD(
+        video=uniform_frame_values_video, **detector_kwargs
+    )
+    pygame.display.init()
+    interface = Interface(detector=detector)
+    clock = FakeClock()
+    interface._scheduler = PlaybackScheduler(frame_rate=10, clock=clock)
+    skipped = []
+    interface.video.skip_to = skipped.append
+    interface._read_ahead = FrameReadAhead(video=FakeVideo(frame_count=30))
+    interface._play_video = True
+    interface._scheduler.start(frame_index=0)
+    clock.time = .5
+    interface._advance_playback()
+
+    # the display thread leaves the decoding to the read-ahead
+    assert interface._frame_index == 5
+    assert skipped == []
+
+    interface._read_ahead = None
+    clock.time = .7
+    interface._advance_playback()
+
+    assert interface._frame_index == 7
+    assert skipped == [7]
+
+    pygame.display.quit()
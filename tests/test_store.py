@@ -0,0 +1,88 @@
+import os
+
+import pytest
+import numpy as np
+import pandas as pd
+
+from movement_detector import PixelChangeFD, IntervalAggregatorMA
+from movement_detector.store import SQLiteResultStore
+from movement_detector.utils import get_video_id
+
+
+@pytest.mark.parametrize(
+    'uniform_frame_values_video',
+    (
+            [255, 0] * 45       # 3 seconds movement
+            + [0] * 60          # 2 seconds freezing
+            + [255, 0] * 30,    # 2 second movement
+    ),
+    indirect=True
+)
+def test_store_results(uniform_frame_values_video, detector_kwargs, tmp_path):
+    video = uniform_frame_values_video
+    store = SQLiteResultStore(db_path=tmp_path / 'results.sqlite')
+    detector = PixelChangeFD(video=video, store=store, **detector_kwargs)
+    analyzer = IntervalAggregatorMA(
+        detector=detector,
+        intervals=[2, 4],
+        aggregation=np.mean,
+        store=store,
+    )
+    analysis = analyzer.run()
+    video_id = get_video_id(video.vid_path)
+
+    assert store.videos() == [video_id]
+
+    meta = store.read_meta(video_id=video_id)
+    expected = detector.meta(start=0, stop=len(video))
+
+    assert np.array_equal(meta.columns, detector.meta_fields)
+    assert np.array_equal(meta['moving'], expected['moving'])
+    assert np.allclose(meta['change_ratio'], expected['change_ratio'])
+
+    summary = store.analysis_summary(analyzer='IntervalAggregatorMA')
+
+    assert summary.index.tolist() == [video_id]
+    assert np.allclose(summary.loc[video_id].values, analysis.values)
+
+    freezing = store.freezing_summary(intervals=[0, 2, 4, video.vid_duration])
+
+    assert np.allclose(freezing.loc[video_id].values, 1 - analysis.values)
+
+    # rewriting a video's results replaces them
+    detector.save_meta()
+
+    assert len(store.read_meta(video_id=video_id)) == len(video)
+
+    store.close()
+    os.remove(str(analyzer.analysis_path))
+    os.remove(str(detector.meta_path))
+
+
+def test_store_analysis_without_intervals(tmp_path):
+    store = SQLiteResultStore(db_path=tmp_path / 'results.sqlite')
+    analysis = pd.DataFrame({'start': [0, 10], 'duration': [1., 2.]})
+    store.write_analysis(video_id='a.mp4', analyzer='A', analysis=analysis)
+
+    summary = store.analysis_summary(analyzer='A', statistic='duration')
+
+    assert summary.loc['a.mp4'].tolist() == [1., 2.]
+
+
+def test_store_analysis_configurations(tmp_path):
+    store = SQLiteResultStore(db_path=tmp_path / 'results.sqlite')
+    for parameters, value in (('p1', 1.), ('p2', 2.)):
+        analysis = pd.DataFrame({'moving': [value]})
+        store.write_analysis(
+            video_id='a.mp4',
+            analyzer='A',
+            analysis=analysis,
+            parameters=parameters,
+        )
+
+    for parameters, value in (('p1', 1.), ('p2', 2.)):
+        summary = store.analysis_summary(analyzer='A', parameters=parameters)
+        assert summary.loc['a.mp4'].tolist() == [value]
+
+    with pytest.raises(ValueError):
+        store.analysis_summary(analyzer='A')
@@ -0,0 +1,54 @@
+import json
+
+from movement_detector.telemetry import RunReport
+
+
+def test_run_report(tmp_path):
+    path = tmp_path / 'report.jsonl'
+    textfile_path = tmp_path / 'metrics' / 'movement_detector.prom'
+
+    with RunReport(path=path, textfile_path=textfile_path) as report:
+        report.record(
+            'a.mp4', 'done', duration=3., detection_time=2.,
+            analysis_time=1., frames=100, bytes_decoded=1000,
+            meta_reused=False, peak_memory=2 ** 20,
+        )
+        report.record(
+            'b.mp4', 'done', duration=.5, detection_time=0.,
+            analysis_time=.5, frames=0, bytes_decoded=0, meta_reused=True,
+            peak_memory=2 ** 19,
+        )
+        report.record('c.mp4', 'failed', error='error')
+
+    with open(path) as f:
+        lines = [json.loads(line) for line in f]
+
+    assert [line['type'] for line in lines] == ['video'] * 3 + ['run']
+    assert lines[0]['frames_per_s'] == 50
+    assert 'frames_per_s' not in lines[1]
+    assert lines[2]['error'] == 'error'
+    run = lines[-1]
+    assert run['videos'] == 3
+    assert run['statuses'] == {'done': 2, 'failed': 1}
+    assert run['frames'] == 100
+    assert run['detection_time'] == 2.
+    assert run['analysis_time'] == 1.5
+    assert run['frames_per_s'] == 50
+    assert run['cache_hits'] == 1
+    assert run['peak_memory'] == 2 ** 20
+    assert all(line['run'] == run['run'] for line in lines)
+
+    with open(textfile_path) as f:
+        metrics = f.read().splitlines()
+
+    assert 'movement_detector_videos{status="failed"} 1' in metrics
+    assert 'movement_detector_frames_decoded 100' in metrics
+    assert 'movement_detector_stage_seconds{stage="analysis"} 1.5' in metrics
+    assert '# TYPE movement_detector_cache_hits gauge' in metrics
+
+    # successive runs are appended
+    with RunReport(path=path):
+        pass
+
+    with open(path) as f:
+        assert len(f.readlines()) == 5
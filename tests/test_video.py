@@ -1,9 +1,11 @@
 import pytest
 import numpy as np
 
-from movement_detector.video import CvVideo
+from movement_detector.video import CvVideo, LiveVideo
 
-from tests.conftest import create_uniform_frames_video, extract_frames
+from tests.conftest import (
+    create_avi, create_uniform_frames_video, extract_frames, grow_file
+)
 
 # =============================== BASE =========================================
 
@@ -39,6 +41,13 @@ def test_base_video_methods(cls, tmp_path):
         assert np.all(f == frames[i])
     assert len(vid) == frame_count
     assert np.all(vid[:2] == frames[:2])
+    for i, f in enumerate(vid.iter_from(100), start=100):
+        assert np.all(f == frames[i])
+    assert i == frame_count - 1
+    # a seek that does not land on the expected time falls back to reading
+    for i, f in enumerate(vid.iter_from(100, last_time=-1.), start=100):
+        assert np.all(f == frames[i])
+    assert i == frame_count - 1
 
     # other
     assert np.all(vid.sum() == frames.astype('float32').sum(axis=0))
@@ -47,3 +56,33 @@ def test_base_video_methods(cls, tmp_path):
     assert np.all(vid.get_frame(0) == vid[0])
     assert np.all(vid.get_frame(frame_count - 1) == vid[frame_count - 1])
     assert np.isclose(vid.get_frame_time(frame_rate - 1), 1, atol=.04)
+
+
+def test_live_video(tmp_path):
+    np.random.seed(42)
+    frame_vals = np.random.randint(0, 255, (90,))
+    source = tmp_path / 'source.avi'
+    create_avi(path=source, uniform_frame_values=frame_vals)
+    expected = list(CvVideo(file_path=source))
+    expected_times = [
+        CvVideo(file_path=source).get_frame_time(i) for i in (0, 89)
+    ]
+
+    vid_path = tmp_path / 'live.avi'
+    writer = grow_file(source=source, path=vid_path, parts=6, pause=.1)
+    vid = LiveVideo(source=vid_path, poll_interval=.02, idle_timeout=.5)
+
+    assert vid.frame_shape == expected[0].shape
+    frames = []
+    times = []
+    for frame in vid:
+        frames.append(frame)
+        times.append(vid.get_frame_time())
+    writer.join()
+
+    assert len(frames) == len(vid) == len(expected)
+    for frame, expected_frame in zip(frames, expected):
+        assert np.array_equal(frame, expected_frame)
+    assert np.allclose([times[0], times[-1]], expected_times)
+    with pytest.raises(NotImplementedError):
+        vid.get_frame(0)
@@ -0,0 +1,124 @@
+import os
+
+import pytest
+
+from movement_detector.analysis import IntervalAggregatorMA
+from movement_detector.discovery import VideoIndex
+from movement_detector.utils import get_video_id, get_video_mapped_path
+from movement_detector.watch import FolderWatcher
+
+
+def test_poll_waits_for_stable_files(batch_settings, tmp_path):
+    videos_path = tmp_path / 'videos'
+    os.makedirs(str(videos_path))
+    index = VideoIndex(
+        index_path=tmp_path / 'discovery.json', videos_path=videos_path
+    )
+    watcher = FolderWatcher(
+        settings=batch_settings, index=index, stable_polls=2, max_workers=1,
+    )
+    vid_path = videos_path / 'a.mp4'
+    with open(str(vid_path), 'wb') as f:
+        f.write(b'partial')
+
+    watcher.poll()
+    watcher.poll()
+
+    assert watcher.queued == 0
+
+    # the file grows while being copied
+    with open(str(vid_path), 'ab') as f:
+        f.write(b' copy')
+    watcher.poll()
+    watcher.poll()
+
+    assert watcher.queued == 0
+
+    watcher.poll()
+
+    assert watcher.queued == 1
+
+    # queued files are not queued again
+    watcher.poll()
+
+    assert watcher.queued == 1
+
+
+def test_poll_defers_running_videos(batch_settings, tmp_path):
+    videos_path = tmp_path / 'videos'
+    os.makedirs(str(videos_path))
+    index = VideoIndex(
+        index_path=tmp_path / 'discovery.json', videos_path=videos_path
+    )
+    watcher = FolderWatcher(
+        settings=batch_settings, index=index, stable_polls=1, max_workers=1,
+    )
+    vid_path = videos_path / 'a.mp4'
+    with open(str(vid_path), 'wb') as f:
+        f.write(b'video')
+    # the video changed while a job was processing it
+    watcher._running[object()] = (str(vid_path), 0)
+
+    watcher.poll()
+    watcher.poll()
+
+    assert watcher.queued == 0
+
+    watcher._running.clear()
+    watcher.poll()
+
+    assert watcher.queued == 1
+
+
+@pytest.mark.parametrize(
+    'uniform_frame_values_video',
+    ([255, 0] * 15 + [0] * 30,),
+    indirect=True
+)
+def test_run(uniform_frame_values_video, batch_settings, tmp_path):
+    vid_path = uniform_frame_values_video.vid_path
+    watcher = FolderWatcher(
+        settings=batch_settings,
+        index=VideoIndex(index_path=tmp_path / 'discovery.json'),
+        poll_interval=0,
+        stable_polls=1,
+        max_workers=1,
+    )
+
+    statuses = watcher.run(max_polls=2)
+
+    assert statuses == {get_video_id(vid_path): 'done'}
+
+    analysis_path = IntervalAggregatorMA.get_analysis_path(vid_path)
+    assert os.path.exists(analysis_path)
+
+    os.remove(str(analysis_path))
+    os.remove(str(analysis_path.with_suffix('.params')))
+    meta_path = get_video_mapped_path(vid_path, 'meta', '.csv')
+    os.remove(str(meta_path))
+    os.remove(str(meta_path.with_suffix('.params')))
+
+
+def test_next_video_largest_that_fits(batch_settings, tmp_path):
+    watcher = FolderWatcher(
+        settings=batch_settings,
+        index=VideoIndex(index_path=tmp_path / 'discovery.json'),
+        max_workers=2,
+        memory_budget=100,
+    )
+    watcher._queue.extend(['small', 'large', 'medium'])
+    watcher._estimates.update({'small': 10, 'large': 90, 'medium': 50})
+
+    assert watcher._next_video() == ('large', 90)
+
+    watcher.budget.reserve(estimate=40)
+
+    assert watcher._next_video() == ('medium', 50)
+
+    watcher.budget.reserve(estimate=45)
+
+    assert watcher._next_video() == ('small', 10)
+
+    watcher.budget.reserve(estimate=10)
+
+    assert watcher._next_video() == (None, 0)